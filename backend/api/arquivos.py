@@ -1,6 +1,6 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from sqlalchemy.orm import Session, sessionmaker
-from backend.database import engine
+from sqlalchemy.orm import Session
+from backend.database import get_db
 from backend.models import Arquivo, Usuario
 from backend.api.auth import get_current_user
 from datetime import datetime
@@ -8,7 +8,6 @@ import os
 import shutil
 
 router = APIRouter()
-SessionLocal = sessionmaker(bind=engine)
 
 UPLOAD_DIR = "data/clientes"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -16,10 +15,9 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 @router.post("/upload")
 def upload_arquivo(
     file: UploadFile = File(...),
-    usuario: Usuario = Depends(get_current_user)
+    usuario: Usuario = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-
     nome_arquivo = file.filename
     caminho_final = os.path.join(UPLOAD_DIR, f"{usuario.id}_{nome_arquivo}")
 
@@ -39,8 +37,7 @@ def upload_arquivo(
     return {"mensagem": "Arquivo salvo com sucesso."}
 
 @router.get("/arquivos")
-def listar_arquivos(usuario: Usuario = Depends(get_current_user)):
-    db = SessionLocal()
+def listar_arquivos(usuario: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
     arquivos = db.query(Arquivo).filter(Arquivo.usuario_id == usuario.id).all()
     return [
         {
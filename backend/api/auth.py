@@ -1,15 +1,17 @@
 # backend/api/auth.py
 
 from fastapi import APIRouter, HTTPException, Depends
-from backend.database import get_db
+from backend.database import get_db, get_async_db
 from pydantic import BaseModel, EmailStr
-from sqlalchemy.orm import Session, sessionmaker
-from backend.database import engine
-from backend.models import Usuario
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models import Empresa, Usuario
+from backend.models.projecoes import perfil_empresa_slim, perfil_usuario_slim
 from backend.models.tokens import TokenAtivacao
+from backend.services.cache_usuario import obter_usuario
+from backend.services.senhas import pwd_context, gerar_hash, verificar_senha, metricas_senha  # noqa: F401 (pwd_context reexportado)
 from sqlalchemy import select
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
 from jose import jwt, JWTError
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 import secrets
@@ -19,8 +21,6 @@ import secrets
 # -------------------------------------------------
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 SECRET_KEY = "chave-super-secreta-do-mark"
 ALGORITHM = "HS256"
@@ -51,23 +51,22 @@ class CadastroGratuitoSchema(BaseModel):
 # -------------------------------------------------
 
 @router.post("/cadastro")
-def cadastrar_usuario(dados: CadastroSchema):
-    db: Session = SessionLocal()
+async def cadastrar_usuario(dados: CadastroSchema, db: AsyncSession = Depends(get_async_db)):
 
     # Verifica se o e-mail já existe
-    if db.execute(select(Usuario).where(Usuario.email == dados.email)).scalar_one_or_none():
+    if (await db.execute(select(Usuario).where(Usuario.email == dados.email))).scalar_one_or_none():
         raise HTTPException(status_code=400, detail="E-mail já cadastrado.")
 
     # Verifica se o token existe e está ativo
-    token_db = db.execute(
+    token_db = (await db.execute(
         select(TokenAtivacao).where(TokenAtivacao.token == dados.token_ativacao)
-    ).scalar_one_or_none()
+    )).scalar_one_or_none()
 
     if not token_db or not token_db.ativo:
         raise HTTPException(status_code=400, detail="Token de ativação inválido ou já utilizado.")
 
-    # Cria novo usuário
-    senha_hash = pwd_context.hash(dados.senha)
+    # Cria novo usuário (bcrypt no executor dedicado de senhas)
+    senha_hash = await gerar_hash(dados.senha)
     novo_usuario = Usuario(
         nome=dados.nome,
         email=dados.email,
@@ -80,8 +79,8 @@ def cadastrar_usuario(dados: CadastroSchema):
 
     # Marca o token como usado
     token_db.ativo = False
-    db.commit()
-    db.refresh(novo_usuario)
+    await db.commit()
+    await db.refresh(novo_usuario)
 
     return {"mensagem": "Usuário cadastrado com sucesso", "id": novo_usuario.id}
 
@@ -91,11 +90,10 @@ def cadastrar_usuario(dados: CadastroSchema):
 # -------------------------------------------------
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    db: Session = SessionLocal()
-    usuario = db.execute(
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    usuario = (await db.execute(
         select(Usuario).where(Usuario.email == form_data.username)
-    ).scalar_one_or_none()
+    )).scalar_one_or_none()
 
     # 1️⃣ E-mail não encontrado
     if not usuario:
@@ -105,12 +103,20 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
         )
 
     # 2️⃣ Senha incorreta
-    if not pwd_context.verify(form_data.password, usuario.senha_hash):
+    senha_ok, novo_hash = await verificar_senha(form_data.password, usuario.senha_hash)
+    if not senha_ok:
         raise HTTPException(
             status_code=401,
             detail="SENHA_INCORRETA"
         )
 
+    alterou = False
+
+    # 🔁 Custo do bcrypt mudou (BCRYPT_ROUNDS): regrava o hash de forma transparente
+    if novo_hash:
+        usuario.senha_hash = novo_hash
+        alterou = True
+
     # 3️⃣ Verifica se o plano do usuário expirou
     if (
         usuario.tipo_usuario != "admin"
@@ -118,8 +124,10 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
         and datetime.utcnow() > usuario.plano_expira_em
     ):
         usuario.plano_atual = "Gratuito"
-        db.commit()
-        db.refresh(usuario)
+        alterou = True
+
+    if alterou:
+        await db.commit()
 
     token = jwt.encode(
         {
@@ -148,35 +156,34 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
 # Helpers de autenticação
 # -------------------------------------------------
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> Usuario:
-    """
-    Usado em rotas que chamam diretamente get_current_user.
-    Faz também a verificação de expiração de plano.
-    """
+def _usuario_do_token(token: str, db: Session) -> Usuario:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = int(payload.get("sub"))
     except JWTError:
         raise HTTPException(status_code=401, detail="Token inválido ou expirado.")
 
-    db: Session = SessionLocal()
-    usuario = db.get(Usuario, user_id)
+    # 🔥 Cache curto por `sub`; plano vencido já vem como "Gratuito" (sem UPDATE).
+    #    A gravação do rebaixamento fica com tarefas/rebaixar_planos.py.
+    usuario = obter_usuario(db, user_id)
     if not usuario:
         raise HTTPException(status_code=401, detail="Usuário não encontrado.")
 
-    # 🔥 Verifica expiração de plano (teste ou plano pago com data)
-    if (
-        usuario.tipo_usuario != "admin"
-        and usuario.plano_expira_em is not None
-        and datetime.utcnow() > usuario.plano_expira_em
-    ):
-        usuario.plano_atual = "Gratuito"
-        db.commit()
-        db.refresh(usuario)
-
     return usuario
 
 
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> Usuario:
+    """
+    Usado em rotas que chamam diretamente get_current_user.
+    Faz também a verificação de expiração de plano.
+    Usa a mesma sessão do request (Depends(get_db)) que a rota.
+    """
+    return _usuario_do_token(token, db)
+
+
 def get_usuario_logado(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
@@ -185,27 +192,14 @@ def get_usuario_logado(
     Alias usado em outros módulos (empresa, usuario, etc.).
     Também faz a verificação de expiração de plano.
     """
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = int(payload.get("sub"))
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Token inválido ou expirado.")
+    return _usuario_do_token(token, db)
 
-    usuario = db.get(Usuario, user_id)
-    if not usuario:
-        raise HTTPException(status_code=401, detail="Usuário não encontrado.")
 
-    # 🔥 Verifica expiração de plano
-    if (
-        usuario.tipo_usuario != "admin"
-        and usuario.plano_expira_em is not None
-        and datetime.utcnow() > usuario.plano_expira_em
-    ):
-        usuario.plano_atual = "Gratuito"
-        db.commit()
-        db.refresh(usuario)
-
-    return usuario
+def get_usuario_admin(usuario: Usuario = Depends(get_current_user)) -> Usuario:
+    """Dependência para rotas internas (métricas etc.): só admin."""
+    if getattr(usuario, "is_admin", False) is True or getattr(usuario, "tipo_usuario", "") == "admin":
+        return usuario
+    raise HTTPException(status_code=403, detail="Acesso restrito a administradores.")
 
 
 # -------------------------------------------------
@@ -213,11 +207,36 @@ def get_usuario_logado(
 # -------------------------------------------------
 
 @router.get("/minha-conta")
-def minha_conta(usuario: Usuario = Depends(get_current_user)):
+def minha_conta(
+    resumo: bool = False,
+    usuario: Usuario = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
     """
     Retorna dados básicos do usuário logado e da empresa.
     Inclui plano_atual e plano_expira_em para o frontend saber do teste.
+    Com ?resumo=true a empresa vem só com nome/nicho (sem JSONs nem logo).
     """
+    if resumo:
+        empresa = (
+            db.query(Empresa)
+            .options(perfil_empresa_slim())
+            .filter(Empresa.usuario_id == usuario.id)
+            .first()
+        )
+        return {
+            "id": usuario.id,
+            "nome": usuario.nome,
+            "email": usuario.email,
+            "plano_atual": usuario.plano_atual,
+            "plano_expira_em": usuario.plano_expira_em,
+            "tipo_usuario": usuario.tipo_usuario,
+            "is_admin": usuario.tipo_usuario == "admin",
+            "empresa": {"id": empresa.id, "nome_empresa": empresa.nome_empresa, "nicho": empresa.nicho}
+            if empresa
+            else None,
+        }
+
     return {
         "id": usuario.id,
         "nome": usuario.nome,
@@ -249,18 +268,17 @@ def minha_conta(usuario: Usuario = Depends(get_current_user)):
 # -------------------------------------------------
 
 @router.post("/cadastro/gratuito")
-def cadastrar_usuario_gratuito(dados: CadastroGratuitoSchema):
+async def cadastrar_usuario_gratuito(dados: CadastroGratuitoSchema, db: AsyncSession = Depends(get_async_db)):
     """
     Cadastro sem token.
     Ganha 3 dias de acesso ao plano Profissional.
     Depois disso, será rebaixado automaticamente para 'Gratuito'.
     """
-    db: Session = SessionLocal()
 
-    if db.execute(select(Usuario).where(Usuario.email == dados.email)).scalar_one_or_none():
+    if (await db.execute(select(Usuario).where(Usuario.email == dados.email))).scalar_one_or_none():
         raise HTTPException(status_code=400, detail="E-mail já cadastrado.")
 
-    senha_hash = pwd_context.hash(dados.senha)
+    senha_hash = await gerar_hash(dados.senha)
     agora = datetime.utcnow()
 
     novo_usuario = Usuario(
@@ -274,8 +292,8 @@ def cadastrar_usuario_gratuito(dados: CadastroGratuitoSchema):
     )
 
     db.add(novo_usuario)
-    db.commit()
-    db.refresh(novo_usuario)
+    await db.commit()
+    await db.refresh(novo_usuario)
 
     return {
         "mensagem": "Usuário gratuito criado com sucesso. Você ganhou 3 dias do plano Profissional.",
@@ -290,11 +308,10 @@ def cadastrar_usuario_gratuito(dados: CadastroGratuitoSchema):
 # -------------------------------------------------
 
 @router.post("/admin/gerar_token")
-def gerar_token_admin(senha_admin: str):
+def gerar_token_admin(senha_admin: str, db: Session = Depends(get_db)):
     if senha_admin != "123456":
         raise HTTPException(status_code=401, detail="Acesso não autorizado.")
 
-    db: Session = SessionLocal()
     token_gerado = secrets.token_hex(8)  # 16 caracteres
 
     novo_token = TokenAtivacao(token=token_gerado)
@@ -305,11 +322,10 @@ def gerar_token_admin(senha_admin: str):
 
 
 @router.get("/admin/listar_tokens")
-def listar_tokens(senha_admin: str):
+def listar_tokens(senha_admin: str, db: Session = Depends(get_db)):
     if senha_admin != "123456":
         raise HTTPException(status_code=401, detail="Acesso não autorizado.")
 
-    db: Session = SessionLocal()
     tokens = db.query(TokenAtivacao).order_by(TokenAtivacao.id.desc()).all()
 
     return [
@@ -323,12 +339,11 @@ def listar_tokens(senha_admin: str):
 
 
 @router.get("/admin/usuarios")
-def listar_usuarios(senha_admin: str):
+def listar_usuarios(senha_admin: str, db: Session = Depends(get_db)):
     if senha_admin != "123456":
         raise HTTPException(status_code=401, detail="Acesso não autorizado.")
 
-    db: Session = SessionLocal()
-    usuarios = db.query(Usuario).order_by(Usuario.id.desc()).all()
+    usuarios = db.query(Usuario).options(perfil_usuario_slim()).order_by(Usuario.id.desc()).all()
 
     return [
         {
@@ -341,3 +356,9 @@ def listar_usuarios(senha_admin: str):
         }
         for u in usuarios
     ]
+
+
+@router.get("/admin/metricas_senha", dependencies=[Depends(get_usuario_admin)])
+def metricas_hash_senha():
+    """Fila/latência do executor de bcrypt (services/senhas.py). Só admin."""
+    return metricas_senha()
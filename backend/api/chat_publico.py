@@ -1,17 +1,33 @@
 # backend/api/chat_publico.py
 from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import HTMLResponse
-from backend.database import SessionLocal
+from fastapi.responses import HTMLResponse, StreamingResponse
+from backend.database import AsyncSessionLocal
 from backend.models import Empresa
+from backend.models.projecoes import perfil_empresa_chat_publico
 from pydantic import BaseModel
-from openai import OpenAI
 from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event, select
 import os
+import threading
+import time
+
+from backend.services.llm import chat, chat_stream
+from backend.services.cache_respostas import buscar_resposta, escopo_empresa, guardar_resposta
 
 router = APIRouter()
 
-# Cliente OpenAI (usa OPENAI_API_KEY do .env / Render)
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+CHAT_PUBLICO_MODELO = "gpt-4.1-mini"
+
+# ==== 🔹 Cache slug -> (empresa_id, contexto) ====
+# LRU por processo. Alterações feitas pelo ORM invalidam na hora; o TTL cobre
+# o que foi alterado por outro worker.
+CHAT_PUBLICO_CACHE_MAX = int(os.getenv("CHAT_PUBLICO_CACHE_MAX", "1024"))
+CHAT_PUBLICO_CACHE_TTL = float(os.getenv("CHAT_PUBLICO_CACHE_TTL", "300"))  # segundos
+
+_cache_contexto: "OrderedDict[str, Tuple[float, int, str]]" = OrderedDict()
+_cache_lock = threading.Lock()
 
 
 class RespostaChat(BaseModel):
@@ -78,53 +94,152 @@ def montar_contexto(empresa: Empresa) -> str:
     return "\n".join(partes)
 
 
-@router.get("/chat_publico/perguntar", response_model=RespostaChat)
-def perguntar(pergunta: str = Query(...), empresa: str = Query(...)):
+def _cache_ler(slug: str) -> Optional[Tuple[int, str]]:
+    with _cache_lock:
+        item = _cache_contexto.get(slug)
+        if not item:
+            return None
+        expira, empresa_id, contexto = item
+        if expira <= time.monotonic():
+            _cache_contexto.pop(slug, None)
+            return None
+        _cache_contexto.move_to_end(slug)
+        return empresa_id, contexto
+
+
+def _cache_guardar(slug: str, empresa_id: int, contexto: str) -> None:
+    with _cache_lock:
+        _cache_contexto[slug] = (time.monotonic() + CHAT_PUBLICO_CACHE_TTL, empresa_id, contexto)
+        _cache_contexto.move_to_end(slug)
+        while len(_cache_contexto) > CHAT_PUBLICO_CACHE_MAX:
+            _cache_contexto.popitem(last=False)
+
+
+def invalidar_contexto_publico(empresa_id: int) -> None:
+    with _cache_lock:
+        for slug in [s for s, item in _cache_contexto.items() if item[1] == empresa_id]:
+            _cache_contexto.pop(slug, None)
+
+
+@event.listens_for(Empresa, "after_update")
+@event.listens_for(Empresa, "after_delete")
+def _invalidar_ao_gravar_empresa(mapper, connection, target: Empresa) -> None:
+    invalidar_contexto_publico(target.id)
+
+
+async def _carregar_contexto(empresa: str) -> Tuple[int, str]:
     """
-    Endpoint simples para o widget público do site.
-    Recebe ?pergunta=...&empresa=Nome ou slug da empresa.
+    Resolve a empresa pelo slug gravado (índice único em empresas.slug) e
+    monta o contexto do atendente. Só o slug exato vale: o nome não é
+    convertido, porque nomes repetidos ganham _2, _3... e o slug calculado
+    do nome poderia ser o de OUTRA empresa. Acerto no cache não toca o banco.
+    A sessão é aberta e FECHADA aqui: a conexão volta ao pool antes da chamada
+    ao modelo (que pode levar segundos).
     """
-    if not pergunta.strip():
-        raise HTTPException(status_code=400, detail="Pergunta vazia.")
+    slug = (empresa or "").strip()
 
-    db = SessionLocal()
-    try:
-        # Tenta achar a empresa pelo nome aproximado ou slug
-        filtro = f"%{empresa.replace('_', ' ').strip()}%"
-        empresa_obj = (
-            db.query(Empresa)
-            .filter(Empresa.nome_empresa.ilike(filtro))
-            .first()
+    em_cache = _cache_ler(slug)
+    if em_cache:
+        return em_cache
+
+    async with AsyncSessionLocal() as db:
+        resultado = await db.execute(
+            select(Empresa).options(perfil_empresa_chat_publico()).where(Empresa.slug == slug)
         )
+        empresa_obj = resultado.scalars().first()
 
         if not empresa_obj:
             raise HTTPException(status_code=404, detail="Empresa não encontrada.")
 
-        contexto = montar_contexto(empresa_obj)
+        empresa_id, contexto = empresa_obj.id, montar_contexto(empresa_obj)
+
+    _cache_guardar(slug, empresa_id, contexto)
+    return empresa_id, contexto
+
+
+def _mensagens(contexto: str, pergunta: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": contexto},
+        {"role": "user", "content": pergunta},
+    ]
+
+
+@router.get("/chat_publico/perguntar", response_model=RespostaChat)
+async def perguntar(pergunta: str = Query(...), empresa: str = Query(...)):
+    """
+    Endpoint simples para o widget público do site.
+    Recebe ?pergunta=...&empresa=slug da empresa (o que o site gerado envia).
+    (Sites gerados antes do streaming ainda usam esta rota.)
+    """
+    if not pergunta.strip():
+        raise HTTPException(status_code=400, detail="Pergunta vazia.")
 
-        # Chamada usando a API nova
-        resposta_api = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[
-                {"role": "system", "content": contexto},
-                {"role": "user", "content": pergunta},
-            ],
+    empresa_id, contexto = await _carregar_contexto(empresa)
+
+    # Pergunta repetida para a mesma empresa: responde sem chamar o modelo
+    em_cache = await buscar_resposta(escopo_empresa(empresa_id, contexto), pergunta)
+    if em_cache is not None:
+        return RespostaChat(resposta=em_cache)
+
+    try:
+        # Chamada pelo gateway de LLM (pool, limites por empresa, retry)
+        texto = await chat(
+            _mensagens(contexto, pergunta),
+            modelo=CHAT_PUBLICO_MODELO,
+            tenant=f"empresa:{empresa_id}",
             temperature=0.4,
             max_tokens=400,
         )
-
-        texto = resposta_api.choices[0].message.content.strip()
+        await guardar_resposta(escopo_empresa(empresa_id, contexto), pergunta, texto)
         return RespostaChat(resposta=texto)
 
-    except HTTPException:
-        raise
     except Exception as e:
         # Retorna erro mas sem quebrar o site
         return RespostaChat(
             resposta=f"Desculpe, ocorreu um erro ao responder: {e}"
         )
-    finally:
-        db.close()
+
+
+@router.get("/chat_publico/perguntar/stream")
+async def perguntar_stream(pergunta: str = Query(...), empresa: str = Query(...)):
+    """
+    Mesma pergunta do widget, mas a resposta vem em pedaços (text/plain
+    chunked) conforme o modelo gera. Usado pelo modelo_site_cliente.html.
+    """
+    if not pergunta.strip():
+        raise HTTPException(status_code=400, detail="Pergunta vazia.")
+
+    empresa_id, contexto = await _carregar_contexto(empresa)
+    em_cache = await buscar_resposta(escopo_empresa(empresa_id, contexto), pergunta)
+
+    async def token_generator():
+        if em_cache is not None:
+            yield em_cache
+            return
+
+        partes: List[str] = []
+        try:
+            async for delta in chat_stream(
+                _mensagens(contexto, pergunta),
+                modelo=CHAT_PUBLICO_MODELO,
+                tenant=f"empresa:{empresa_id}",
+                temperature=0.4,
+                max_tokens=400,
+            ):
+                partes.append(delta)
+                yield delta
+        except Exception as e:
+            yield f"Desculpe, ocorreu um erro ao responder: {e}"
+            return
+
+        # só guarda resposta completa (sem erro no meio do stream)
+        await guardar_resposta(escopo_empresa(empresa_id, contexto), pergunta, "".join(partes))
+
+    return StreamingResponse(
+        token_generator(),
+        media_type="text/plain; charset=utf-8",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # 🔹 NOVA ROTA: página pública só com o chat MARK IA em tela cheia
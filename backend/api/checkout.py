@@ -8,6 +8,7 @@ from typing import Optional, Literal
 
 import httpx
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 from sqlalchemy import func
@@ -98,7 +99,13 @@ class CheckoutPlanoIn(BaseModel):
 
 
 @router.post("/plano")
-def checkout_plano(payload: CheckoutPlanoIn, db: Session = Depends(get_db)):
+async def checkout_plano(payload: CheckoutPlanoIn, db: Session = Depends(get_db)):
+    # bcrypt aguardado no executor de senhas; banco + Mercado Pago seguem na threadpool
+    senha_hash = await hash_senha(payload.senha)
+    return await run_in_threadpool(_checkout_plano, payload, senha_hash, db)
+
+
+def _checkout_plano(payload: CheckoutPlanoIn, senha_hash: str, db: Session):
     # 1) Busca plano
     plano = db.query(Plano).filter(Plano.id == int(payload.plano_id)).first()
     if not plano:
@@ -119,7 +126,7 @@ def checkout_plano(payload: CheckoutPlanoIn, db: Session = Depends(get_db)):
     usuario = Usuario(
         nome=(payload.nome or "").strip(),
         email=email_norm,
-        senha_hash=hash_senha(payload.senha),
+        senha_hash=senha_hash,
         plano_atual="Gratuito",
     )
     db.add(usuario)
@@ -8,13 +8,13 @@ from typing import Optional, Dict, Any
 import httpx
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, EmailStr
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 
-from backend.database import get_db
+from backend.database import get_async_db
 from backend.models import Usuario, Pagamento
 from backend.models.planos import Plano
-from backend.api.usuario import hash_senha
+from backend.services.senhas import gerar_hash
 
 router = APIRouter(prefix="/checkout_publico", tags=["Checkout Público"])
 
@@ -104,9 +104,9 @@ def _notification_url() -> Optional[str]:
 
 
 @router.post("/plano")
-async def checkout_plano_publico(payload: CheckoutPlanoIn, db: Session = Depends(get_db)):
+async def checkout_plano_publico(payload: CheckoutPlanoIn, db: AsyncSession = Depends(get_async_db)):
     # 1) Plano
-    plano = db.query(Plano).filter(Plano.id == int(payload.plano_id)).first()
+    plano = await db.get(Plano, int(payload.plano_id))
     if not plano or not getattr(plano, "ativo", True):
         raise HTTPException(status_code=404, detail="Plano não encontrado ou inativo.")
 
@@ -121,10 +121,10 @@ async def checkout_plano_publico(payload: CheckoutPlanoIn, db: Session = Depends
     # 2) Usuário (cria como pendente e SEM liberar plano pago)
     email_norm = _norm_email(str(payload.email))
     usuario = (
-        db.query(Usuario)
-        .filter(func.lower(func.trim(Usuario.email)) == email_norm)
-        .first()
-    )
+        await db.execute(
+            select(Usuario).where(func.lower(func.trim(Usuario.email)) == email_norm)
+        )
+    ).scalars().first()
 
     if usuario:
         # Regra correta:
@@ -137,14 +137,14 @@ async def checkout_plano_publico(payload: CheckoutPlanoIn, db: Session = Depends
         usuario = Usuario(
             nome=(payload.nome or "").strip(),
             email=email_norm,
-            senha_hash=hash_senha(payload.senha),
+            senha_hash=await gerar_hash(payload.senha),
             tipo_usuario="pendente",
             plano_atual="Gratuito",
             data_criacao=datetime.utcnow(),
         )
         db.add(usuario)
-        db.commit()
-        db.refresh(usuario)
+        await db.commit()
+        await db.refresh(usuario)
 
     # 3) Cupom
     valor_final = float(valor_base)
@@ -165,8 +165,8 @@ async def checkout_plano_publico(payload: CheckoutPlanoIn, db: Session = Depends
         data_pagamento=datetime.utcnow(),
     )
     db.add(pagamento)
-    db.commit()
-    db.refresh(pagamento)
+    await db.commit()
+    await db.refresh(pagamento)
 
     # 5) external_reference no formato que o seu webhook já entende (plano:{id}|periodo:{x}|user:{id}|pag:{id})
     external_reference = (
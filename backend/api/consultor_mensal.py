@@ -3,17 +3,24 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel
+from collections import OrderedDict
 from datetime import datetime
 import random
+import threading
 
 from backend.database import get_db
 from backend.api.auth import get_usuario_logado
 from backend.models import Empresa
 from backend.models.consultor_mensal import ConsultorMensal
-from backend.services.inteligencia_mercado import obter_insumos
+from backend.services.inteligencia_mercado import obter_insumos_com_chave
+from backend.services.memo_pacotes import chave_memo, obter_ou_gerar
+from backend.utils.seeds import seed_estavel
 
 router = APIRouter(prefix="/consultor-mensal", tags=["Consultor Mensal"])
 
+# Suba quando mudar a lógica de geração: invalida o memo de pacotes
+VERSAO_GERADOR = 2
+
 
 # =========================
 # Schemas
@@ -35,8 +42,8 @@ def _get_usuario_id(usuario) -> int:
 # Helpers de geração
 # =========================
 def _seed(empresa_id: int, mes_ano: str, empresa_nome: str, nicho: str, extra: str = "") -> int:
-    base = f"{empresa_id}|{mes_ano}|{empresa_nome}|{nicho}|{extra}"
-    return abs(hash(base)) % (10**9)
+    # BLAKE2: mesma seed em todos os workers (hash() muda por processo)
+    return seed_estavel(empresa_id, mes_ano, empresa_nome, nicho, extra)
 
 
 def _mes_nome_pt(mes_ano: str) -> str:
@@ -300,19 +307,47 @@ def _gerar_dica_branding(rng: random.Random, tema_base: str, numero: int):
     }
 
 
-def _gerar_pacote(
-    empresa_id: int,
-    mes_ano: str,
-    empresa_nome: str,
-    nicho: str,
-    versao: int = 1
-):
-    seed = _seed(empresa_id, mes_ano, empresa_nome, nicho, extra=str(versao))
-    rng = random.Random(seed)
+# =========================
+# Pipeline em 2 etapas
+# =========================
+# 1) Esqueleto por nicho+mês (insumos, intros, temas, dados): igual para
+#    todas as empresas do nicho; fica em cache (memória + memo em disco).
+# 2) Personalização por empresa (seed dela): foco do mês, CTA, hashtags,
+#    legenda com o nome, dicas de branding. Barata.
+# Assim a geração em massa do início do mês escala com o nº de nichos.
+# LRU em memória (rotas síncronas: várias threads da threadpool ao mesmo tempo)
+_esqueletos: "OrderedDict[str, dict]" = OrderedDict()
+_esqueletos_lock = threading.Lock()
+_ESQUELETOS_MAX = 512
+
+
+def _obter_esqueleto(mes_ano: str, nicho: str, insumos, chave_insumos) -> dict:
+    chave = chave_memo(VERSAO_GERADOR, mes_ano, nicho, *chave_insumos)
+
+    with _esqueletos_lock:
+        esqueleto = _esqueletos.get(chave)
+        if esqueleto is not None:
+            _esqueletos.move_to_end(chave)
+            return esqueleto
+
+    # montagem/leitura do disco fora do lock; duas threads no mesmo nicho
+    # geram o mesmo esqueleto (determinístico), sem problema
+    esqueleto = obter_ou_gerar(
+        "consultor_nicho", mes_ano, chave,
+        lambda: _montar_esqueleto(mes_ano, nicho, insumos),
+    )
+    with _esqueletos_lock:
+        _esqueletos[chave] = esqueleto
+        _esqueletos.move_to_end(chave)
+        while len(_esqueletos) > _ESQUELETOS_MAX:
+            _esqueletos.popitem(last=False)
+    return esqueleto
+
 
+def _montar_esqueleto(mes_ano: str, nicho: str, insumos) -> dict:
+    """Etapa 1: tudo que NÃO depende da empresa."""
     mes_pt = _mes_nome_pt(mes_ano)
     datas = _datas_relevantes_por_mes(mes_ano)
-    insumos = obter_insumos(mes_ano=mes_ano, nicho=nicho)
 
     resumo_executivo = (
         f"📌 Planejamento do mês: {mes_pt}\n\n"
@@ -326,133 +361,189 @@ def _gerar_pacote(
 
     for slug, titulo in _blocos_padrao():
         tema_base = _limpar_emoji(titulo)
-        foco_nome = None
-        temas_reais: list[str] = []
-        intro = ""
 
-        # 🎯 CAMPANHAS, DATAS E EVENTOS
+        # 🎯 CAMPANHAS, DATAS E EVENTOS: uma variante por data do mês
+        # (a empresa sorteia o foco na etapa 2)
         if slug == "campanhas_datas_eventos":
-            foco = rng.choice(datas)
-            foco_nome = foco[0]
-
-            intro = (
-                f"📌 Neste mês ({mes_pt}), o {foco_nome} costuma puxar atenção "
-                f"e intenção de compra. Sua empresa pode aproveitar isso com "
-                f"conteúdo educativo + oferta clara + prova social."
-            )
-
-            temas_reais = [foco_nome]
+            variantes = [
+                {
+                    "intro": (
+                        f"📌 Neste mês ({mes_pt}), o {foco_nome} costuma puxar atenção "
+                        f"e intenção de compra. Sua empresa pode aproveitar isso com "
+                        f"conteúdo educativo + oferta clara + prova social."
+                    ),
+                    "temas": [foco_nome],
+                }
+                for foco_nome, _ in datas
+            ]
 
         # 🚀 TENDÊNCIAS E NOVIDADES
         elif slug == "tendencias_novidades":
-            intro = (
-                f"🚀 Tendências reais do mês no nicho de {nicho}. "
-                f"Esses assuntos estão chamando atenção e podem virar "
-                f"posts, Reels e Stories facilmente."
-            )
-
-            temas_reais = insumos.tendencias
+            variantes = [{
+                "intro": (
+                    f"🚀 Tendências reais do mês no nicho de {nicho}. "
+                    f"Esses assuntos estão chamando atenção e podem virar "
+                    f"posts, Reels e Stories facilmente."
+                ),
+                "temas": insumos.tendencias,
+            }]
 
         # 📊 DADOS E ESTATÍSTICAS
         elif slug == "dados_estatisticas":
-            intro = (
-                f"📊 Dados e estatísticas ajudam o cliente a confiar mais. "
-                f"Use esses números como gancho de autoridade nos seus conteúdos."
-            )
-
-            temas_reais = [
-                dado.get("titulo", "Dado relevante do mês")
-                for dado in insumos.dados_estatisticas
-            ]
+            variantes = [{
+                "intro": (
+                    f"📊 Dados e estatísticas ajudam o cliente a confiar mais. "
+                    f"Use esses números como gancho de autoridade nos seus conteúdos."
+                ),
+                "temas": [
+                    dado.get("titulo", "Dado relevante do mês")
+                    for dado in insumos.dados_estatisticas
+                ],
+            }]
 
         # 🔥 PRODUTOS / SERVIÇOS EM ALTA
         elif slug == "produtos_servicos_alta":
-            intro = (
-                f"🔥 Produtos e serviços que estão em alta neste mês. "
-                f"Você pode usar essas ideias para criar conteúdo, "
-                f"ofertas e combos estratégicos."
-            )
-
-            temas_reais = insumos.produtos_em_alta
+            variantes = [{
+                "intro": (
+                    f"🔥 Produtos e serviços que estão em alta neste mês. "
+                    f"Você pode usar essas ideias para criar conteúdo, "
+                    f"ofertas e combos estratégicos."
+                ),
+                "temas": insumos.produtos_em_alta,
+            }]
 
         # 🏷️ PROMOÇÕES E OFERTAS
         elif slug == "promocoes_ofertas":
-            intro = (
-                f"🏷️ Formatos de promoções que fazem sentido para este mês. "
-                f"O foco é gerar demanda sem desvalorizar seu produto ou serviço."
-            )
-
-            temas_reais = insumos.promocoes_ofertas
+            variantes = [{
+                "intro": (
+                    f"🏷️ Formatos de promoções que fazem sentido para este mês. "
+                    f"O foco é gerar demanda sem desvalorizar seu produto ou serviço."
+                ),
+                "temas": insumos.promocoes_ofertas,
+            }]
 
         # 🧠 BRANDING E POSICIONAMENTO
         elif slug == "branding_posicionamento":
-            intro = (
-                f"🧠 Ajustes de branding e posicionamento para este mês. "
-                f"Pequenas mudanças que aumentam percepção de valor."
-            )
-
-            temas_reais = insumos.branding_posicionamento
+            variantes = [{
+                "intro": (
+                    f"🧠 Ajustes de branding e posicionamento para este mês. "
+                    f"Pequenas mudanças que aumentam percepção de valor."
+                ),
+                "temas": insumos.branding_posicionamento,
+            }]
 
         # 🏆 PROVA SOCIAL E AUTORIDADE
         elif slug == "prova_social_autoridade":
-            intro = (
-                f"🏆 Ideias para mostrar resultado, bastidores e confiança. "
-                f"Use isso para fortalecer sua autoridade sem parecer forçado."
-            )
-
-            temas_reais = insumos.prova_social_autoridade
+            variantes = [{
+                "intro": (
+                    f"🏆 Ideias para mostrar resultado, bastidores e confiança. "
+                    f"Use isso para fortalecer sua autoridade sem parecer forçado."
+                ),
+                "temas": insumos.prova_social_autoridade,
+            }]
 
         # 🤝 RELACIONAMENTO E COMUNIDADE
         else:
-            intro = (
-                f"🤝 Conteúdos para gerar conversa, engajamento e vínculo "
-                f"com sua audiência ao longo do mês."
-            )
+            variantes = [{
+                "intro": (
+                    f"🤝 Conteúdos para gerar conversa, engajamento e vínculo "
+                    f"com sua audiência ao longo do mês."
+                ),
+                "temas": insumos.relacionamento_comunidade,
+            }]
+
+        for variante in variantes:
+            # 🔢 Quantidade dinâmica de cards
+            temas_reais = [t for t in variante.pop("temas") if t and t.strip()]
+            qtd = max(3, min(len(temas_reais), 10)) if temas_reais else 3
+            temas_cards = temas_reais[:qtd] if temas_reais else [tema_base]
+
+            itens = []
+            for i, tema_real in enumerate(temas_cards, start=1):
+                dado_texto = ""
+                dado_fonte = ""
+                if slug == "dados_estatisticas" and i <= len(insumos.dados_estatisticas):
+                    dado_texto = insumos.dados_estatisticas[i - 1].get("texto", "")
+                    dado_fonte = insumos.dados_estatisticas[i - 1].get("fonte", "")
+                itens.append({"tema_real": tema_real, "dado_texto": dado_texto, "dado_fonte": dado_fonte})
+            variante["itens"] = itens
 
-            temas_reais = insumos.relacionamento_comunidade
+        blocos.append({
+            "slug": slug,
+            "titulo": titulo,
+            "tema_base": tema_base,
+            "variantes": variantes,
+        })
 
-        # 🔢 Quantidade dinâmica de cards
-        temas_reais = [t for t in temas_reais if t and t.strip()]
-        qtd = max(3, min(len(temas_reais), 10)) if temas_reais else 3
-        temas_cards = temas_reais[:qtd] if temas_reais else [tema_base]
+    return {"resumo_executivo": resumo_executivo, "blocos": blocos}
 
-        # 🎯 Geração dos conteúdos (AGORA COM TEMA REAL)
-        conteudos = []
-        for i, tema_real in enumerate(temas_cards, start=1):
-            dado_texto = ""
-            dado_fonte = ""
-
-            if slug == "dados_estatisticas" and i <= len(insumos.dados_estatisticas):
-                dado_texto = insumos.dados_estatisticas[i - 1].get("texto", "")
-                dado_fonte = insumos.dados_estatisticas[i - 1].get("fonte", "")
-
-
-            conteudos.append(
-                _gerar_item_conteudo_real(
-                    rng=rng,
-                    empresa_nome=empresa_nome,
-                    nicho=nicho,
-                    tema_real=tema_real,
-                    numero=i,
-                    mes_ano=mes_ano,
-                    dado_texto=dado_texto,
-                    dado_fonte=dado_fonte,
-                )
-            )
 
+def _gerar_pacote(
+    empresa_id: int,
+    mes_ano: str,
+    empresa_nome: str,
+    nicho: str,
+    versao: int = 1
+):
+    seed = _seed(empresa_id, mes_ano, empresa_nome, nicho, extra=str(versao))
+    # chave_insumos = (mês, nicho, versão do arquivo): identifica os insumos sem serializá-los
+    insumos, chave_insumos = obter_insumos_com_chave(mes_ano=mes_ano, nicho=nicho)
+
+    # Mesmo seed + mesmos insumos => mesmo pacote: vira leitura do memo em disco
+    chave = chave_memo(VERSAO_GERADOR, seed, empresa_id, mes_ano, empresa_nome, nicho, versao, *chave_insumos)
+    pacote = obter_ou_gerar(
+        "consultor", mes_ano, chave,
+        lambda: _personalizar_pacote(
+            _obter_esqueleto(mes_ano, nicho, insumos, chave_insumos), empresa_id, mes_ano, empresa_nome, nicho, versao, seed
+        ),
+    )
+    pacote["atualizado_em"] = datetime.utcnow().isoformat()
+    return pacote
 
 
+def _personalizar_pacote(
+    esqueleto: dict,
+    empresa_id: int,
+    mes_ano: str,
+    empresa_nome: str,
+    nicho: str,
+    versao: int,
+    seed: int,
+):
+    """Etapa 2: aplica a empresa (nome + seed) sobre o esqueleto do nicho."""
+    rng = random.Random(seed)
+
+    blocos = []
+    for bloco in esqueleto["blocos"]:
+        variantes = bloco["variantes"]
+        variante = rng.choice(variantes) if len(variantes) > 1 else variantes[0]
+
+        # 🎯 Geração dos conteúdos (AGORA COM TEMA REAL)
+        conteudos = [
+            _gerar_item_conteudo_real(
+                rng=rng,
+                empresa_nome=empresa_nome,
+                nicho=nicho,
+                tema_real=item["tema_real"],
+                numero=i,
+                mes_ano=mes_ano,
+                dado_texto=item["dado_texto"],
+                dado_fonte=item["dado_fonte"],
+            )
+            for i, item in enumerate(variante["itens"], start=1)
+        ]
+
         # 🧠 Branding complementar (continua como você pediu)
         branding_qtd = min(3, max(2, len(conteudos) // 4))
         branding = [
-            _gerar_dica_branding(rng, tema_base, i)
+            _gerar_dica_branding(rng, bloco["tema_base"], i)
             for i in range(1, branding_qtd + 1)
         ]
 
         blocos.append({
-            "slug": slug,
-            "titulo": titulo,
-            "intro": intro,
+            "slug": bloco["slug"],
+            "titulo": bloco["titulo"],
+            "intro": variante["intro"],
             "favorito": False,
             "conteudos": conteudos,
             "branding": branding,
@@ -464,7 +555,7 @@ def _gerar_pacote(
         "nicho": nicho,
         "mes_ano": mes_ano,
         "versao": versao,
-        "resumo_executivo": resumo_executivo,
+        "resumo_executivo": esqueleto["resumo_executivo"],
         "blocos": blocos,
         "atualizado_em": datetime.utcnow().isoformat(),
     }
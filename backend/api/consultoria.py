@@ -1,14 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm import Session
 from typing import List, Dict, Any
-from backend.database import engine
+from backend.database import get_db
 from backend.models import Consultoria, Usuario
 from backend.api.auth import get_current_user
 from datetime import datetime
 
 router = APIRouter()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # -------------------------
 # Schemas
@@ -26,12 +25,10 @@ class ConsultoriaSchema(BaseModel):
 # Iniciar consultoria
 # -------------------------
 @router.post("/consultoria/iniciar")
-def iniciar_consultoria(usuario: Usuario = Depends(get_current_user)):
-    db: Session = SessionLocal()
+def iniciar_consultoria(usuario: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
     consultoria = db.query(Consultoria).filter(Consultoria.usuario_id == usuario.id).first()
 
     if consultoria:
-        db.close()
         raise HTTPException(status_code=400, detail="Consultoria já iniciada.")
 
     nova = Consultoria(
@@ -44,7 +41,6 @@ def iniciar_consultoria(usuario: Usuario = Depends(get_current_user)):
     db.add(nova)
     db.commit()
     db.refresh(nova)
-    db.close()
     return {"mensagem": "Consultoria iniciada com sucesso!"}
 
 
@@ -52,8 +48,7 @@ def iniciar_consultoria(usuario: Usuario = Depends(get_current_user)):
 # Atualizar progresso completo
 # -------------------------
 @router.put("/consultoria/progresso")
-def atualizar_progresso(dados: ProgressoSchema, usuario: Usuario = Depends(get_current_user)):
-    db: Session = SessionLocal()
+def atualizar_progresso(dados: ProgressoSchema, usuario: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
     try:
         consultoria = db.query(Consultoria).filter(Consultoria.usuario_id == usuario.id).first()
         if not consultoria:
@@ -70,58 +65,44 @@ def atualizar_progresso(dados: ProgressoSchema, usuario: Usuario = Depends(get_c
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
 
 
 # -------------------------
 # Consultar progresso completo
 # -------------------------
 @router.get("/consultoria/progresso")
-def consultar_progresso(usuario: Usuario = Depends(get_current_user)):
-    db: Session = SessionLocal()
-    try:
-        consultoria = db.query(Consultoria).filter(Consultoria.usuario_id == usuario.id).first()
-        if not consultoria:
-            raise HTTPException(status_code=404, detail="Consultoria não iniciada.")
-        return consultoria.progresso or {}
-    finally:
-        db.close()
+def consultar_progresso(usuario: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
+    consultoria = db.query(Consultoria).filter(Consultoria.usuario_id == usuario.id).first()
+    if not consultoria:
+        raise HTTPException(status_code=404, detail="Consultoria não iniciada.")
+    return consultoria.progresso or {}
 
 
 # -------------------------
 # Consultar status geral da consultoria
 # -------------------------
 @router.get("/consultoria")
-def consultar_consultoria(usuario: Usuario = Depends(get_current_user)):
-    db: Session = SessionLocal()
-    try:
-        consultoria = db.query(Consultoria).filter(Consultoria.usuario_id == usuario.id).first()
-        if not consultoria:
-            raise HTTPException(status_code=404, detail="Consultoria não iniciada.")
-        return {
-            "etapa_atual": consultoria.etapa_atual,
-            "etapas_concluidas": consultoria.etapas_concluidas,
-            "data_inicio": consultoria.data_inicio
-        }
-    finally:
-        db.close()
+def consultar_consultoria(usuario: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
+    consultoria = db.query(Consultoria).filter(Consultoria.usuario_id == usuario.id).first()
+    if not consultoria:
+        raise HTTPException(status_code=404, detail="Consultoria não iniciada.")
+    return {
+        "etapa_atual": consultoria.etapa_atual,
+        "etapas_concluidas": consultoria.etapas_concluidas,
+        "data_inicio": consultoria.data_inicio
+    }
 
 
 # -------------------------
 # Atualizar etapa atual
 # -------------------------
 @router.put("/consultoria/etapa")
-def atualizar_etapa(dados: ConsultoriaSchema, usuario: Usuario = Depends(get_current_user)):
-    db: Session = SessionLocal()
-    try:
-        consultoria = db.query(Consultoria).filter(Consultoria.usuario_id == usuario.id).first()
-        if not consultoria:
-            raise HTTPException(status_code=404, detail="Consultoria não encontrada.")
+def atualizar_etapa(dados: ConsultoriaSchema, usuario: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
+    consultoria = db.query(Consultoria).filter(Consultoria.usuario_id == usuario.id).first()
+    if not consultoria:
+        raise HTTPException(status_code=404, detail="Consultoria não encontrada.")
 
-        consultoria.etapa_atual = dados.etapa_atual
-        consultoria.etapas_concluidas = dados.etapas_concluidas
-        db.commit()
-        return {"mensagem": "Etapa da consultoria atualizada com sucesso."}
-    finally:
-        db.close()
+    consultoria.etapa_atual = dados.etapa_atual
+    consultoria.etapas_concluidas = dados.etapas_concluidas
+    db.commit()
+    return {"mensagem": "Etapa da consultoria atualizada com sucesso."}
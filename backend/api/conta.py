@@ -1,6 +1,7 @@
 # backend/api/conta.py
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 from typing import Optional
@@ -13,13 +14,9 @@ from datetime import datetime, timedelta
 import secrets
 from backend.models.senha_reset import SenhaResetToken
 
-# Se no seu auth.py já existir pwd_context, vamos reutilizar.
-# Caso não exista, vamos criar aqui (mais seguro deixar local).
-try:
-    from backend.api.auth import pwd_context  # type: ignore
-except Exception:
-    from passlib.context import CryptContext
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt roda no executor dedicado de senhas (não disputa a threadpool das rotas):
+# as rotas que usam são async e só o banco/e-mail vai para a threadpool
+from backend.services.senhas import gerar_hash, verificar_senha
 
 router = APIRouter(prefix="/conta", tags=["Minha Conta"])
 
@@ -83,7 +80,7 @@ def atualizar_email(
 
 
 @router.put("/me/senha")
-def atualizar_senha(
+async def atualizar_senha(
     payload: UpdateSenhaRequest,
     db: Session = Depends(get_db),
     usuario_logado: Usuario = Depends(get_usuario_logado),
@@ -103,19 +100,23 @@ def atualizar_senha(
         raise HTTPException(status_code=500, detail="Usuário sem hash de senha cadastrado (configuração inválida).")
 
     # Confere senha atual
-    if not pwd_context.verify(senha_atual, senha_hash):
+    senha_ok, _ = await verificar_senha(senha_atual, senha_hash)
+    if not senha_ok:
         raise HTTPException(status_code=400, detail="Senha atual incorreta.")
 
-    novo_hash = pwd_context.hash(senha_nova)
+    novo_hash = await gerar_hash(senha_nova)
 
-    # Atualiza no campo correto
-    if hasattr(usuario_logado, "senha_hash"):
-        usuario_logado.senha_hash = novo_hash
-    else:
-        usuario_logado.hashed_password = novo_hash
+    def gravar():
+        # Atualiza no campo correto
+        if hasattr(usuario_logado, "senha_hash"):
+            usuario_logado.senha_hash = novo_hash
+        else:
+            usuario_logado.hashed_password = novo_hash
 
-    db.add(usuario_logado)
-    db.commit()
+        db.add(usuario_logado)
+        db.commit()
+
+    await run_in_threadpool(gravar)
 
     return {"ok": True, "msg": "Senha atualizada com sucesso."}
 
@@ -160,7 +161,14 @@ def _enviar_email_reset(email_destino: str, codigo: str):
 
 
 @router.post("/esqueci-senha")
-def esqueci_senha(payload: EsqueciSenhaRequest, db: Session = Depends(get_db)):
+async def esqueci_senha(payload: EsqueciSenhaRequest, db: Session = Depends(get_db)):
+    # Gera código e hash antes de olhar o banco (mesmo custo exista ou não o e-mail)
+    codigo = _gerar_codigo_6_digitos()
+    codigo_hash = await gerar_hash(codigo)
+    return await run_in_threadpool(_esqueci_senha, payload, codigo, codigo_hash, db)
+
+
+def _esqueci_senha(payload: EsqueciSenhaRequest, codigo: str, codigo_hash: str, db: Session):
     email = payload.email.strip().lower()
 
     # Importante: não revelar se o e-mail existe (segurança).
@@ -169,9 +177,6 @@ def esqueci_senha(payload: EsqueciSenhaRequest, db: Session = Depends(get_db)):
     if not usuario:
         return {"ok": True, "msg": "Se este e-mail estiver cadastrado, você receberá um código em instantes."}
 
-    # Gera código e salva hash
-    codigo = _gerar_codigo_6_digitos()
-    codigo_hash = pwd_context.hash(codigo)
     expires_at = datetime.utcnow() + timedelta(minutes=15)
 
     token = SenhaResetToken(
@@ -190,14 +195,32 @@ def esqueci_senha(payload: EsqueciSenhaRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/redefinir-senha")
-def redefinir_senha(payload: RedefinirSenhaRequest, db: Session = Depends(get_db)):
-    email = payload.email.strip().lower()
+async def redefinir_senha(payload: RedefinirSenhaRequest, db: Session = Depends(get_db)):
     codigo = (payload.codigo or "").strip()
     senha_nova = payload.senha_nova or ""
 
     if len(senha_nova) < 6:
         raise HTTPException(status_code=400, detail="A nova senha deve ter pelo menos 6 caracteres.")
 
+    # banco na threadpool, bcrypt aguardado no executor de senhas
+    usuario, token = await run_in_threadpool(_usuario_e_token_reset, payload.email, db)
+
+    # Valida código
+    codigo_ok, _ = await verificar_senha(codigo, token.codigo_hash)
+    if not codigo_ok:
+        raise HTTPException(status_code=400, detail="Código inválido ou expirado.")
+
+    # Atualiza senha do usuário
+    novo_hash = await gerar_hash(senha_nova)
+    await run_in_threadpool(_gravar_senha_redefinida, usuario, token, novo_hash, db)
+
+    return {"ok": True, "msg": "Senha redefinida com sucesso. Agora você já pode fazer login."}
+
+
+def _usuario_e_token_reset(email: str, db: Session):
+    """Usuário + token de reset válido mais recente (ou 400 genérico)."""
+    email = email.strip().lower()
+
     usuario = db.query(Usuario).filter(Usuario.email == email).first()
     if not usuario:
         # Mantém resposta genérica (não revelar)
@@ -220,13 +243,10 @@ def redefinir_senha(payload: RedefinirSenhaRequest, db: Session = Depends(get_db
         db.commit()
         raise HTTPException(status_code=400, detail="Código inválido ou expirado.")
 
-    # Valida código
-    if not pwd_context.verify(codigo, token.codigo_hash):
-        raise HTTPException(status_code=400, detail="Código inválido ou expirado.")
+    return usuario, token
 
-    # Atualiza senha do usuário
-    novo_hash = pwd_context.hash(senha_nova)
 
+def _gravar_senha_redefinida(usuario: Usuario, token: SenhaResetToken, novo_hash: str, db: Session) -> None:
     if hasattr(usuario, "senha_hash"):
         usuario.senha_hash = novo_hash
     elif hasattr(usuario, "hashed_password"):
@@ -241,5 +261,3 @@ def redefinir_senha(payload: RedefinirSenhaRequest, db: Session = Depends(get_db
     db.add(token)
     db.commit()
 
-    return {"ok": True, "msg": "Senha redefinida com sucesso. Agora você já pode fazer login."}
-
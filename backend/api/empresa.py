@@ -5,11 +5,15 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 
 from backend.database import get_db  # ✅ use Depends(get_db) em vez de SessionLocal direto
-from backend.models import Empresa, Usuario, CardMarketing
+from backend.models import Empresa, Usuario, CardMarketing, salvar_com_slug_unico
+from backend.models.marketing import stmt_inserir_cards
+from backend.models.projecoes import perfil_empresa_slim
 from backend.api.auth import get_current_user
 
-# ✅ Import para geração do site do cliente
-from backend.api.site_cliente import gerar_site_cliente, DadosSiteCliente
+# ✅ Import para geração do site do cliente (em fila, fora do request)
+from backend.api.site_cliente import DadosSiteCliente
+from backend.services.fila_sites import enfileirar_site
+from backend.services.logos import armazenar_logo
 
 
 router = APIRouter(prefix="/empresa", tags=["Empresa"])
@@ -117,33 +121,41 @@ def salvar_empresa(
     usuario: Usuario = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    empresa = db.query(Empresa).filter(Empresa.usuario_id == usuario.id).first()
-    if not empresa:
-        empresa = Empresa(usuario_id=usuario.id)
-
-    empresa.nome_empresa = dados.nome_empresa
-    empresa.descricao = dados.descricao
-    empresa.nicho = dados.nicho
-    empresa.logo_url = dados.logo_url
-    empresa.funcionarios = [f.dict() for f in dados.funcionarios]
-    empresa.produtos = [p.dict() for p in dados.produtos]
-    empresa.redes_sociais = dados.redes_sociais
-    empresa.informacoes_adicionais = dados.informacoes_adicionais
-    empresa.cnpj = dados.cnpj
-    empresa.rua = dados.rua
-    empresa.numero = dados.numero
-    empresa.bairro = dados.bairro
-    empresa.cidade = dados.cidade
-    empresa.cep = dados.cep
-    empresa.atualizado_em = datetime.utcnow()
-
-    db.add(empresa)
-    db.commit()
+    # data:image/...;base64 vira arquivo em data/logos + URL curta
+    logo_url = armazenar_logo(dados.logo_url)
+
+    def aplicar():
+        # refeito do zero se o slug colidir com uma gravação simultânea
+        empresa = db.query(Empresa).filter(Empresa.usuario_id == usuario.id).first()
+        if not empresa:
+            empresa = Empresa(usuario_id=usuario.id)
+
+        empresa.nome_empresa = dados.nome_empresa
+        empresa.descricao = dados.descricao
+        empresa.nicho = dados.nicho
+        empresa.logo_url = logo_url
+        empresa.funcionarios = [f.dict() for f in dados.funcionarios]
+        empresa.produtos = [p.dict() for p in dados.produtos]
+        empresa.redes_sociais = dados.redes_sociais
+        empresa.informacoes_adicionais = dados.informacoes_adicionais
+        empresa.cnpj = dados.cnpj
+        empresa.rua = dados.rua
+        empresa.numero = dados.numero
+        empresa.bairro = dados.bairro
+        empresa.cidade = dados.cidade
+        empresa.cep = dados.cep
+        empresa.atualizado_em = datetime.utcnow()
+        db.add(empresa)
+        return empresa
+
+    empresa = salvar_com_slug_unico(db, aplicar)
     db.refresh(empresa)
 
-    # ✅ Gera o site HTML do cliente automaticamente (sem quebrar o salvamento se falhar)
+    # ✅ Agenda o site HTML do cliente (sem quebrar o salvamento se falhar).
+    # Status em GET /site_cliente/status/{site_job_id}
+    site_job_id = None
     try:
-        gerar_site_cliente(DadosSiteCliente(
+        site_job_id = enfileirar_site(DadosSiteCliente(
             usuario_id=usuario.id,
             bio="",
             agendamento_ativo=False,
@@ -151,9 +163,9 @@ def salvar_empresa(
             informacoes_adicionais=dados.informacoes_adicionais
         ))
     except Exception as e:
-        print(f"Erro ao gerar site do cliente: {e}")
+        print(f"Erro ao agendar site do cliente: {e}")
 
-    return {"mensagem": "Dados da empresa salvos com sucesso."}
+    return {"mensagem": "Dados da empresa salvos com sucesso.", "site_job_id": site_job_id}
 
 
 @router.get("")
@@ -186,6 +198,9 @@ def atualizar_empresa(
     if "produtos" in payload and payload["produtos"] is not None:
         payload["produtos"] = [p.dict() for p in payload["produtos"]]
 
+    if "logo_url" in payload:
+        payload["logo_url"] = armazenar_logo(payload["logo_url"])
+
     for campo, valor in payload.items():
         setattr(empresa, campo, valor)
 
@@ -208,10 +223,35 @@ def listar_empresas_selecao(
     ✅ Retorna lista com {id, nome, nicho}.
     Mesmo que hoje você tenha 1 empresa por usuário, retorna lista para já suportar múltiplas no futuro.
     """
-    empresas = db.query(Empresa).filter(Empresa.usuario_id == usuario.id).all()
+    empresas = (
+        db.query(Empresa)
+        .options(perfil_empresa_slim())
+        .filter(Empresa.usuario_id == usuario.id)
+        .all()
+    )
     return [empresa_to_selecao(e) for e in empresas]
 
 
+@router.get("/resumo")
+def obter_empresa_resumo(
+    usuario: Usuario = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    ✅ Visão enxuta (id, nome, nicho, slug) para telas que não precisam de
+    funcionários/produtos/redes/logo. Não carrega as colunas pesadas.
+    """
+    empresa = (
+        db.query(Empresa)
+        .options(perfil_empresa_slim())
+        .filter(Empresa.usuario_id == usuario.id)
+        .first()
+    )
+    if not empresa:
+        raise HTTPException(status_code=404, detail="Empresa não encontrada.")
+    return {**empresa_to_selecao(empresa), "slug": empresa.slug}
+
+
 # -------------------------
 # ✅ Geração automática de cards de marketing (seu legado)
 # -------------------------
@@ -245,22 +285,24 @@ def gerar_cards_marketing(
             }
         ]
 
-        for item in exemplo_cards:
-            card = CardMarketing(
-                usuario_id=usuario.id,
-                titulo=item["titulo"],
-                descricao=item["descricao"],
-                fonte=item["fonte"],
-                ideias_conteudo=item["ideias_conteudo"],
-                tipo=item["tipo"],
-                mes_referencia=mes_atual,
-                favorito=False,
-                eh_atualizacao=False,
-                criado_em=datetime.utcnow(),
-                atualizado_em=datetime.utcnow()
-            )
-            db.add(card)
-
+        agora = datetime.utcnow()
+        # ON CONFLICT DO NOTHING: dois cliques ao mesmo tempo não dão 500
+        db.execute(stmt_inserir_cards([
+            {
+                "usuario_id": usuario.id,
+                "titulo": item["titulo"],
+                "descricao": item["descricao"],
+                "fonte": item["fonte"],
+                "ideias_conteudo": item["ideias_conteudo"],
+                "tipo": item["tipo"],
+                "mes_referencia": mes_atual,
+                "favorito": False,
+                "eh_atualizacao": False,
+                "criado_em": agora,
+                "atualizado_em": agora,
+            }
+            for item in exemplo_cards
+        ]))
         db.commit()
 
     return {"mensagem": "Cards de marketing gerados com sucesso."}
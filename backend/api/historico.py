@@ -1,23 +1,20 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from sqlalchemy.orm import Session, sessionmaker
-from backend.database import engine
+from sqlalchemy.orm import Session
+from backend.database import get_db
 from backend.models import HistoricoMark, Usuario
 from backend.api.auth import get_current_user
 from datetime import datetime
 from typing import List
 
 router = APIRouter()
-SessionLocal = sessionmaker(bind=engine)
 
 class MensagemSchema(BaseModel):
     remetente: str  # 'usuario' ou 'mark'
     mensagem: str
 
 @router.post("/historico")
-def salvar_mensagem(dados: MensagemSchema, usuario: Usuario = Depends(get_current_user)):
-    db: Session = SessionLocal()
-
+def salvar_mensagem(dados: MensagemSchema, usuario: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
     nova = HistoricoMark(
         usuario_id=usuario.id,
         remetente=dados.remetente,
@@ -26,14 +23,11 @@ def salvar_mensagem(dados: MensagemSchema, usuario: Usuario = Depends(get_curren
     )
     db.add(nova)
     db.commit()
-    db.close()
     return {"mensagem": "Mensagem registrada no histórico."}
 
 @router.get("/historico")
-def obter_historico(usuario: Usuario = Depends(get_current_user)):
-    db: Session = SessionLocal()
+def obter_historico(usuario: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
     mensagens = db.query(HistoricoMark).filter(HistoricoMark.usuario_id == usuario.id).order_by(HistoricoMark.data_envio).all()
-    db.close()
 
     return [
         {
@@ -3,6 +3,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 import random
@@ -10,11 +11,16 @@ import re
 
 from backend.database import get_db
 from backend.api.auth import get_usuario_logado  # ajuste se seu projeto usa outro caminho
-from backend.models import IdeiasMensais, Empresa  # Empresa precisa existir no seu models/__init__.py
+from backend.models import IdeiasMensais, IdeiasCardEstado, Empresa  # Empresa precisa existir no seu models/__init__.py
+from backend.services.memo_pacotes import chave_memo, obter_ou_gerar
+from backend.utils.seeds import seed_estavel
 
 
 router = APIRouter(prefix="/ideias", tags=["Central de Ideias"])
 
+# Suba quando mudar a lógica de geração: invalida o memo de pacotes
+VERSAO_GERADOR = 2  # 2: pacote com indice_cards
+
 
 # =========================
 # Helpers
@@ -62,6 +68,9 @@ def _ideias_conteudo_lote(empresa_nome: str, nicho: str, titulo_campanha: str, s
         "Mitos e verdades", "Erro comum + solução", "Passo a passo"
     ]
 
+    # dict.fromkeys: remove repetidas mantendo a ordem (set muda de ordem por processo)
+    hashtags = list(dict.fromkeys(hashtags_base + [f"#{_slugify(empresa_nome)}"]))
+
     itens = []
     for i in range(3):
         tema = rnd.choice(temas)
@@ -77,7 +86,7 @@ def _ideias_conteudo_lote(empresa_nome: str, nicho: str, titulo_campanha: str, s
             "criativo_estatico": f"Arte com título forte + 3 bullets sobre {titulo_campanha} (visual limpo e chamativo).",
             "criativo_video": f"Reels de 12–20s: abertura com dor do público, 2 dicas rápidas e CTA final.",
             "legenda": legenda,
-            "hashtags": rnd.sample(list(set(hashtags_base + [f"#{_slugify(empresa_nome)}"])), k=min(8, len(set(hashtags_base + [f"#{_slugify(empresa_nome)}"]))))
+            "hashtags": rnd.sample(hashtags, k=min(8, len(hashtags)))
         }
         itens.append(item)
 
@@ -190,9 +199,20 @@ def _gerar_pacote_mes(empresa: Empresa, mes_ano: str, setor: str | None):
     empresa_nome = dados["nome"]
     nicho = dados["nicho"]
 
-    # Seed estável por empresa+mes para evitar “mudar tudo” do nada
-    seed_base = abs(hash(f"{empresa.id}-{mes_ano}-{empresa_nome}-{nicho}")) % (10**9)
+    # Seed estável por empresa+mes (igual em todos os workers) para evitar “mudar tudo” do nada
+    seed_base = seed_estavel(empresa.id, mes_ano, empresa_nome, nicho)
+
+    # Mesmo seed => mesmo pacote: regerar vira leitura do memo em disco
+    chave = chave_memo(VERSAO_GERADOR, seed_base, empresa.id, mes_ano, empresa_nome, nicho, setor)
+    pacote = obter_ou_gerar(
+        "ideias", mes_ano, chave,
+        lambda: _montar_pacote_mes(empresa.id, mes_ano, setor, empresa_nome, nicho, seed_base),
+    )
+    pacote["criado_em"] = datetime.utcnow().isoformat()
+    return pacote
 
+
+def _montar_pacote_mes(empresa_id: int, mes_ano: str, setor: str | None, empresa_nome: str, nicho: str, seed_base: int):
     categorias = []
     for cat in _categorias_base():
         # 2 cards por categoria = 16 cards. Se quiser mais, é só subir para 3.
@@ -202,16 +222,48 @@ def _gerar_pacote_mes(empresa: Empresa, mes_ano: str, setor: str | None):
         categorias.append({"slug": cat["slug"], "titulo": cat["titulo"], "cards": cards})
 
     return {
-        "empresa_id": empresa.id,
+        "empresa_id": empresa_id,
         "mes_ano": mes_ano,
         "setor": setor,
         "empresa_nome": empresa_nome,
         "nicho": nicho,
         "categorias": categorias,
+        "indice_cards": _indexar_cards(categorias),
         "criado_em": datetime.utcnow().isoformat()
     }
 
+
+def _info_card(card: dict, categoria: int, posicao: int) -> dict:
+    """O que favoritar/gerar-mais precisam do card, sem abrir o pacote todo."""
+    limites = card.get("limites") or {}
+    return {
+        "categoria": categoria,
+        "posicao": posicao,
+        "titulo": card.get("titulo", "Campanha"),
+        "lotes_conteudo": len(card.get("conteudos", [])),
+        "lotes_branding": len(card.get("branding", [])),
+        "max_lotes_conteudo": limites.get("max_lotes_conteudo", 5),
+        "max_lotes_branding": limites.get("max_lotes_branding", 5),
+    }
+
+
+def _indexar_cards(categorias: list) -> dict:
+    """card_id -> posição + metadados (vai dentro do pacote como `indice_cards`)."""
+    indice = {}
+    for ci, cat in enumerate(categorias):
+        for ki, card in enumerate(cat.get("cards", [])):
+            indice[card["id"]] = _info_card(card, ci, ki)
+    return indice
+
+
 def _achar_card(conteudo: dict, card_id: str):
+    info = (conteudo.get("indice_cards") or {}).get(card_id)
+    if info:
+        try:
+            return conteudo["categorias"][info["categoria"]]["cards"][info["posicao"]]
+        except (IndexError, KeyError):
+            pass
+    # pacotes antigos (sem índice): varredura
     for cat in conteudo.get("categorias", []):
         for card in cat.get("cards", []):
             if card.get("id") == card_id:
@@ -219,6 +271,62 @@ def _achar_card(conteudo: dict, card_id: str):
     return None
 
 
+def _localizar_card(db: Session, empresa_id: int, mes_ano: str, card_id: str):
+    """
+    (ideias_id, info do card, empresa_nome, nicho) lendo só os caminhos JSON
+    necessários (indice_cards -> card_id), não o pacote inteiro.
+    """
+    linha = db.query(
+        IdeiasMensais.id,
+        IdeiasMensais.conteudo[("indice_cards", card_id)],
+        IdeiasMensais.conteudo["empresa_nome"],
+        IdeiasMensais.conteudo["nicho"],
+    ).filter(
+        IdeiasMensais.empresa_id == empresa_id,
+        IdeiasMensais.mes_ano == mes_ano
+    ).first()
+
+    if not linha:
+        raise HTTPException(status_code=404, detail="Pacote do mês não encontrado. Gere primeiro.")
+
+    ideias_id, info, empresa_nome, nicho = linha
+    if info is None:
+        # pacote gerado antes do índice: varre uma vez
+        reg = db.get(IdeiasMensais, ideias_id)
+        for ci, cat in enumerate(reg.conteudo.get("categorias", [])):
+            for ki, card in enumerate(cat.get("cards", [])):
+                if card.get("id") == card_id:
+                    info = _info_card(card, ci, ki)
+        if info is None:
+            raise HTTPException(status_code=404, detail="Card não encontrado.")
+
+    return ideias_id, info, empresa_nome or "Sua Empresa", nicho or "Negócio"
+
+
+def _conteudo_com_estado(db: Session, reg: IdeiasMensais) -> dict:
+    """Pacote (imutável) + estado por card (favorito / lotes extras)."""
+    estados = db.query(IdeiasCardEstado).filter(IdeiasCardEstado.ideias_id == reg.id).all()
+    conteudo = reg.conteudo
+    if not estados:
+        return conteudo
+
+    conteudo = {**conteudo, "categorias": [
+        {**cat, "cards": [dict(card) for card in cat.get("cards", [])]}
+        for cat in conteudo.get("categorias", [])
+    ]}
+    for estado in estados:
+        card = _achar_card(conteudo, estado.card_id)
+        if not card:
+            continue
+        if estado.favorito is not None:
+            card["favorito"] = estado.favorito
+        if estado.conteudos_extra:
+            card["conteudos"] = list(card.get("conteudos", [])) + list(estado.conteudos_extra)
+        if estado.branding_extra:
+            card["branding"] = list(card.get("branding", [])) + list(estado.branding_extra)
+    return conteudo
+
+
 # =========================
 # Schemas
 # =========================
@@ -260,7 +368,7 @@ def obter_ideias_mes(
     if not reg:
         raise HTTPException(status_code=404, detail="Nenhuma ideia encontrada para este mês.")
 
-    return {"empresa_id": empresa_id, "mes_ano": mes_ano, "setor": reg.setor, "conteudo": reg.conteudo}
+    return {"empresa_id": empresa_id, "mes_ano": mes_ano, "setor": reg.setor, "conteudo": _conteudo_com_estado(db, reg)}
 
 
 @router.post("/gerar")
@@ -281,7 +389,7 @@ def gerar_ideias_mes(
         IdeiasMensais.mes_ano == mes_ano
     ).first()
     if existente:
-        return {"status": "ja_existia", "empresa_id": body.empresa_id, "mes_ano": mes_ano, "conteudo": existente.conteudo}
+        return {"status": "ja_existia", "empresa_id": body.empresa_id, "mes_ano": mes_ano, "conteudo": _conteudo_com_estado(db, existente)}
 
     conteudo = _gerar_pacote_mes(empresa, mes_ano, body.setor)
 
@@ -303,7 +411,7 @@ def gerar_ideias_mes(
             IdeiasMensais.mes_ano == mes_ano
         ).first()
         if reg:
-            return {"status": "ja_existia", "empresa_id": body.empresa_id, "mes_ano": mes_ano, "conteudo": reg.conteudo}
+            return {"status": "ja_existia", "empresa_id": body.empresa_id, "mes_ano": mes_ano, "conteudo": _conteudo_com_estado(db, reg)}
         raise
 
     db.refresh(novo)
@@ -316,52 +424,47 @@ def gerar_mais_por_card(
     db: Session = Depends(get_db),
     usuario=Depends(get_usuario_logado),
 ):
-    reg = db.query(IdeiasMensais).filter(
-        IdeiasMensais.empresa_id == body.empresa_id,
-        IdeiasMensais.mes_ano == body.mes_ano
-    ).first()
-
-    if not reg:
-        raise HTTPException(status_code=404, detail="Pacote do mês não encontrado. Gere primeiro.")
-
-    conteudo = reg.conteudo
-    card = _achar_card(conteudo, body.card_id)
-    if not card:
-        raise HTTPException(status_code=404, detail="Card não encontrado.")
-
-    empresa_nome = conteudo.get("empresa_nome", "Sua Empresa")
-    nicho = conteudo.get("nicho", "Negócio")
-    titulo = card.get("titulo", "Campanha")
-    seed_base = abs(hash(f"{body.empresa_id}-{body.mes_ano}-{body.card_id}-{empresa_nome}-{nicho}")) % (10**9)
-
     tipo = (body.tipo or "").strip().lower()
     if tipo not in ("conteudo", "branding"):
         raise HTTPException(status_code=400, detail="Tipo inválido. Use 'conteudo' ou 'branding'.")
 
+    ideias_id, info, empresa_nome, nicho = _localizar_card(db, body.empresa_id, body.mes_ano, body.card_id)
+    titulo = info.get("titulo", "Campanha")
+    seed_base = seed_estavel(body.empresa_id, body.mes_ano, body.card_id, empresa_nome, nicho)
+
+    # garante a linha do card e trava só ela (dois cliques não geram o mesmo lote)
+    db.execute(
+        insert(IdeiasCardEstado)
+        .values(ideias_id=ideias_id, card_id=body.card_id, conteudos_extra=[], branding_extra=[])
+        .on_conflict_do_nothing(constraint="uq_ideias_card")
+    )
+    estado = db.query(IdeiasCardEstado).filter(
+        IdeiasCardEstado.ideias_id == ideias_id,
+        IdeiasCardEstado.card_id == body.card_id
+    ).with_for_update().one()
+
     if tipo == "conteudo":
-        lotes = card.get("conteudos", [])
-        max_lotes = (card.get("limites") or {}).get("max_lotes_conteudo", 5)
-        prox_lote = len(lotes) + 1
-        if prox_lote > max_lotes:
+        extras = list(estado.conteudos_extra or [])
+        prox_lote = info.get("lotes_conteudo", 1) + len(extras) + 1
+        if prox_lote > info.get("max_lotes_conteudo", 5):
+            db.rollback()
             raise HTTPException(status_code=400, detail="Limite mensal de lotes de conteúdo atingido para este card.")
-        lotes.append(_ideias_conteudo_lote(empresa_nome, nicho, titulo, seed_base, lote=prox_lote))
-        card["conteudos"] = lotes
+        extras.append(_ideias_conteudo_lote(empresa_nome, nicho, titulo, seed_base, lote=prox_lote))
+        estado.conteudos_extra = extras
 
     if tipo == "branding":
-        lotes = card.get("branding", [])
-        max_lotes = (card.get("limites") or {}).get("max_lotes_branding", 5)
-        prox_lote = len(lotes) + 1
-        if prox_lote > max_lotes:
+        extras = list(estado.branding_extra or [])
+        prox_lote = info.get("lotes_branding", 1) + len(extras) + 1
+        if prox_lote > info.get("max_lotes_branding", 5):
+            db.rollback()
             raise HTTPException(status_code=400, detail="Limite mensal de lotes de branding atingido para este card.")
-        lotes.append(_dicas_branding_lote(nicho, titulo, seed_base, lote=prox_lote))
-        card["branding"] = lotes
+        extras.append(_dicas_branding_lote(nicho, titulo, seed_base, lote=prox_lote))
+        estado.branding_extra = extras
 
-    reg.conteudo = conteudo
-    db.add(reg)
     db.commit()
-    db.refresh(reg)
 
-    return {"status": "ok", "empresa_id": body.empresa_id, "mes_ano": body.mes_ano, "conteudo": reg.conteudo}
+    reg = db.get(IdeiasMensais, ideias_id)
+    return {"status": "ok", "empresa_id": body.empresa_id, "mes_ano": body.mes_ano, "conteudo": _conteudo_com_estado(db, reg)}
 
 
 @router.post("/favoritar")
@@ -370,24 +473,19 @@ def favoritar_card(
     db: Session = Depends(get_db),
     usuario=Depends(get_usuario_logado),
 ):
-    reg = db.query(IdeiasMensais).filter(
-        IdeiasMensais.empresa_id == body.empresa_id,
-        IdeiasMensais.mes_ano == body.mes_ano
-    ).first()
-
-    if not reg:
-        raise HTTPException(status_code=404, detail="Pacote do mês não encontrado. Gere primeiro.")
-
-    conteudo = reg.conteudo
-    card = _achar_card(conteudo, body.card_id)
-    if not card:
-        raise HTTPException(status_code=404, detail="Card não encontrado.")
-
-    card["favorito"] = bool(body.favorito)
-
-    reg.conteudo = conteudo
-    db.add(reg)
+    ideias_id, _info, _nome, _nicho = _localizar_card(db, body.empresa_id, body.mes_ano, body.card_id)
+
+    # upsert de uma linha pequena; o pacote não é lido nem regravado
+    favorito = bool(body.favorito)
+    db.execute(
+        insert(IdeiasCardEstado)
+        .values(ideias_id=ideias_id, card_id=body.card_id, favorito=favorito,
+                conteudos_extra=[], branding_extra=[], atualizado_em=datetime.utcnow())
+        .on_conflict_do_update(
+            constraint="uq_ideias_card",
+            set_={"favorito": favorito, "atualizado_em": datetime.utcnow()},
+        )
+    )
     db.commit()
-    db.refresh(reg)
 
-    return {"status": "ok", "favorito": card["favorito"], "empresa_id": body.empresa_id, "mes_ano": body.mes_ano}
+    return {"status": "ok", "favorito": favorito, "empresa_id": body.empresa_id, "mes_ano": body.mes_ano}
@@ -1,18 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from openai import AsyncOpenAI
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 
 import os
 import json
+import time
 from datetime import datetime
 
-from backend.database import get_db
-from backend.models import Empresa, HistoricoMark
+from backend.database import get_async_db, AsyncSessionLocal
+from backend.models import Empresa, HistoricoMark, MemoriaMark
+from backend.models.projecoes import perfil_empresa_mark
+from backend.services.llm import chat, chat_stream
+from backend.services.cache_respostas import buscar_resposta, guardar_resposta
 
 router = APIRouter()
 
@@ -22,22 +26,19 @@ router = APIRouter()
 BACKEND_DIR = Path(__file__).resolve().parent.parent
 PROJECT_DIR = BACKEND_DIR.parent
 
-CAMINHO_HISTORICO = PROJECT_DIR / "memory" / "mark.json"
 CAMINHO_INSTRUCOES = BACKEND_DIR / "comandos" / "mark_instrucoes.txt"
 CAMINHO_PERFIL = PROJECT_DIR / "memory" / "perfil_matheus.json"
 
-CAMINHO_HISTORICO.parent.mkdir(parents=True, exist_ok=True)
-
 # ---------------------------------------------------------
-# OPENAI CLIENT
+# MODELO (chamadas passam pelo gateway backend/services/llm.py)
 # ---------------------------------------------------------
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("Variável de ambiente OPENAI_API_KEY não definida.")
+MARK_MODEL_DEFAULT = os.getenv("MARK_MODEL", "gpt-4o-mini")
 
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+# Quantos turnos anteriores do PRÓPRIO usuário entram no contexto
+MARK_MEMORIA_TURNOS = int(os.getenv("MARK_MEMORIA_TURNOS", "5"))
 
-MARK_MODEL_DEFAULT = os.getenv("MARK_MODEL", "gpt-4o-mini")
+# /responder_simples não tem empresa: usa um escopo próprio no cache de respostas
+ESCOPO_MARK_SIMPLES = "mark:simples"
 
 
 # ---------------------------------------------------------
@@ -114,17 +115,16 @@ def carregar_perfil_matheus() -> Optional[Dict[str, Any]]:
         return None
 
 
-def empresa_to_dict(empresa: Empresa) -> Dict[str, Any]:
+def empresa_to_dict(empresa: Empresa, incluir_logo: bool = True) -> Dict[str, Any]:
     if not empresa:
         return {}
 
-    return {
+    dados = {
         "id": empresa.id,
         "usuario_id": empresa.usuario_id,
         "nome_empresa": empresa.nome_empresa,
         "descricao": empresa.descricao,
         "nicho": empresa.nicho,
-        "logo_url": empresa.logo_url,
         "funcionarios": empresa.funcionarios,
         "produtos": empresa.produtos,
         "redes_sociais": empresa.redes_sociais,
@@ -137,6 +137,10 @@ def empresa_to_dict(empresa: Empresa) -> Dict[str, Any]:
         "cep": empresa.cep,
         "atualizado_em": empresa.atualizado_em.isoformat() if empresa.atualizado_em else None,
     }
+    # perfil_empresa_mark não carrega logo_url (não vai para o prompt)
+    if incluir_logo:
+        dados["logo_url"] = empresa.logo_url
+    return dados
 
 
 def filtrar_dados_empresa(empresa_bruta: Any) -> Dict[str, Any]:
@@ -169,42 +173,88 @@ def filtrar_dados_empresa(empresa_bruta: Any) -> Dict[str, Any]:
     return empresa
 
 
-def carregar_historico_json() -> List[Dict[str, str]]:
-    if not CAMINHO_HISTORICO.exists():
-        return []
-    try:
-        return json.loads(CAMINHO_HISTORICO.read_text(encoding="utf-8"))
-    except Exception:
+async def carregar_memoria(
+    db: AsyncSession, usuario_id: Optional[int], limite: int = MARK_MEMORIA_TURNOS
+) -> List[Dict[str, str]]:
+    """
+    Últimos `limite` turnos do usuário (mais antigo primeiro), via índice
+    (usuario_id, id). Sem usuario_id não há memória: nada é compartilhado.
+    """
+    if usuario_id is None or limite <= 0:
         return []
 
+    resultado = await db.execute(
+        select(MemoriaMark.pergunta, MemoriaMark.resposta)
+        .where(MemoriaMark.usuario_id == usuario_id)
+        .order_by(MemoriaMark.id.desc())
+        .limit(limite)
+    )
+    return [
+        {"pergunta": pergunta, "resposta": resposta}
+        for pergunta, resposta in reversed(resultado.all())
+    ]
+
+
+async def salvar_memoria(
+    db: AsyncSession, usuario_id: Optional[int], pergunta: str, resposta: str
+) -> None:
+    """Acrescenta um turno (um INSERT, sem reescrever nada)."""
+    if usuario_id is None or not resposta:
+        return
 
-def salvar_historico_json(historico: List[Dict[str, str]]) -> None:
     try:
-        CAMINHO_HISTORICO.write_text(
-            json.dumps(historico, indent=2, ensure_ascii=False),
-            encoding="utf-8",
-        )
-    except Exception:
-        pass
+        db.add(MemoriaMark(usuario_id=usuario_id, pergunta=pergunta, resposta=resposta))
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        print("[ERRO salvar_memoria MARK]:", e)
 
 
-def obter_empresa_do_usuario(db: Session, usuario_id: Optional[int]) -> Dict[str, Any]:
-    query = db.query(Empresa)
+async def obter_empresa_do_usuario(db: AsyncSession, usuario_id: Optional[int]) -> Dict[str, Any]:
+    query = select(Empresa).options(perfil_empresa_mark())
     if usuario_id is not None:
-        query = query.filter(Empresa.usuario_id == usuario_id)
+        query = query.where(Empresa.usuario_id == usuario_id)
 
-    empresa = query.order_by(Empresa.atualizado_em.desc()).first()
+    resultado = await db.execute(query.order_by(Empresa.atualizado_em.desc()).limit(1))
+    empresa = resultado.scalars().first()
     if not empresa:
         return {}
 
-    return filtrar_dados_empresa(empresa_to_dict(empresa))
+    return filtrar_dados_empresa(empresa_to_dict(empresa, incluir_logo=False))
+
+
+# ---------------------------------------------------------
+# CACHE DO PROMPT
+# ---------------------------------------------------------
+# Camada 1: instruções + perfil (arquivos), relidos só quando o mtime muda.
+# Camada 2: bloco "Dados reais da empresa" já serializado, por usuario_id,
+#           guardado junto com (id, atualizado_em) da empresa. Cada chamada
+#           confere essa versão com um SELECT de 2 colunas: edição feita em
+#           QUALQUER worker troca o atualizado_em e o próximo acesso remonta.
+#           Os mapper events abaixo só adiantam isso no worker que gravou.
+# O prefixo system fica byte a byte idêntico entre chamadas, o que permite
+# o cache de prompt do provedor.
+# Rede de segurança para gravações que não mexem em atualizado_em (nenhuma
+# rota do MARK lê a logo, a única coluna gravada assim hoje)
+MARK_CACHE_EMPRESA_TTL = float(os.getenv("MARK_CACHE_EMPRESA_TTL", "300"))  # segundos
+
+_cache_prefixo: Dict[str, Any] = {"chave": None, "mensagens": []}
+_cache_contexto_empresa: Dict[Optional[int], Tuple[float, Any, Dict[str, str]]] = {}
+
+
+def _mtime(caminho: Path) -> Optional[int]:
+    try:
+        return caminho.stat().st_mtime_ns
+    except OSError:
+        return None
 
 
-def montar_mensagens_base(texto: str, usuario_id: Optional[int], db: Session) -> List[Dict[str, str]]:
-    mensagens: List[Dict[str, str]] = []
+def mensagens_sistema_fixas() -> List[Dict[str, str]]:
+    chave = (_mtime(CAMINHO_INSTRUCOES), _mtime(CAMINHO_PERFIL))
+    if _cache_prefixo["chave"] == chave:
+        return _cache_prefixo["mensagens"]
 
-    instrucao = carregar_instrucoes_mark()
-    mensagens.append({"role": "system", "content": instrucao})
+    mensagens: List[Dict[str, str]] = [{"role": "system", "content": carregar_instrucoes_mark()}]
 
     perfil = carregar_perfil_matheus()
     if perfil:
@@ -215,27 +265,65 @@ def montar_mensagens_base(texto: str, usuario_id: Optional[int], db: Session) ->
             }
         )
 
-    empresa = obter_empresa_do_usuario(db, usuario_id)
+    _cache_prefixo["chave"] = chave
+    _cache_prefixo["mensagens"] = mensagens
+    return mensagens
+
+
+async def versao_empresa(db: AsyncSession, usuario_id: Optional[int]) -> Optional[Tuple[Any, ...]]:
+    """(id, atualizado_em) da empresa que obter_empresa_do_usuario escolheria."""
+    query = select(Empresa.id, Empresa.atualizado_em)
+    if usuario_id is not None:
+        query = query.where(Empresa.usuario_id == usuario_id)
+
+    linha = (await db.execute(query.order_by(Empresa.atualizado_em.desc()).limit(1))).first()
+    return tuple(linha) if linha else None
+
+
+async def mensagem_contexto_empresa(db: AsyncSession, usuario_id: Optional[int]) -> Dict[str, str]:
+    versao = await versao_empresa(db, usuario_id)
+    item = _cache_contexto_empresa.get(usuario_id)
+    if item and item[0] > time.monotonic() and item[1] == versao:
+        return item[2]
+
+    empresa = await obter_empresa_do_usuario(db, usuario_id)
     if empresa:
-        mensagens.append(
-            {
-                "role": "system",
-                "content": "Dados reais da empresa:\n" + json.dumps(empresa, ensure_ascii=False),
-            }
-        )
+        mensagem = {
+            "role": "system",
+            "content": "Dados reais da empresa:\n" + json.dumps(empresa, ensure_ascii=False),
+        }
     else:
-        mensagens.append(
-            {
-                "role": "system",
-                "content": (
-                    "Nenhum dado de empresa encontrado para este usuário. "
-                    "Peça para preencher o módulo Empresa."
-                ),
-            }
-        )
+        mensagem = {
+            "role": "system",
+            "content": (
+                "Nenhum dado de empresa encontrado para este usuário. "
+                "Peça para preencher o módulo Empresa."
+            ),
+        }
+
+    _cache_contexto_empresa[usuario_id] = (time.monotonic() + MARK_CACHE_EMPRESA_TTL, versao, mensagem)
+    return mensagem
+
 
-    historico = carregar_historico_json()
-    for item in historico[-5:]:
+def invalidar_contexto_empresa(usuario_id: Optional[int]) -> None:
+    _cache_contexto_empresa.pop(usuario_id, None)
+    # a entrada "sem usuario_id" aponta para a empresa mais recente de qualquer um
+    _cache_contexto_empresa.pop(None, None)
+
+
+@event.listens_for(Empresa, "after_insert")
+@event.listens_for(Empresa, "after_update")
+@event.listens_for(Empresa, "after_delete")
+def _invalidar_contexto_ao_gravar(mapper, connection, target: Empresa) -> None:
+    invalidar_contexto_empresa(target.usuario_id)
+
+
+async def montar_mensagens_base(texto: str, usuario_id: Optional[int], db: AsyncSession) -> List[Dict[str, str]]:
+    mensagens: List[Dict[str, str]] = list(mensagens_sistema_fixas())
+    mensagens.append(await mensagem_contexto_empresa(db, usuario_id))
+
+    historico = await carregar_memoria(db, usuario_id)
+    for item in historico:
         mensagens.append({"role": "user", "content": item["pergunta"]})
         mensagens.append({"role": "assistant", "content": item["resposta"]})
 
@@ -243,16 +331,20 @@ def montar_mensagens_base(texto: str, usuario_id: Optional[int], db: Session) ->
     return mensagens
 
 
-async def chamar_openai(mensagens: List[Dict[str, str]], modelo: Optional[str] = None) -> str:
+async def chamar_openai(
+    mensagens: List[Dict[str, str]],
+    modelo: Optional[str] = None,
+    usuario_id: Optional[int] = None,
+) -> str:
     modelo_usado = modelo or MARK_MODEL_DEFAULT
     try:
-        resposta = await client.chat.completions.create(
-            model=modelo_usado,
-            messages=mensagens,
+        return await chat(
+            mensagens,
+            modelo=modelo_usado,
+            tenant=usuario_id,
             temperature=0.4,
             timeout=30,
         )
-        return (resposta.choices[0].message.content or "").strip()
     except Exception as e:
         return (
             "[ERRO IA] Error code: 401 - "
@@ -261,25 +353,30 @@ async def chamar_openai(mensagens: List[Dict[str, str]], modelo: Optional[str] =
 
 
 # =====================================================================
-# 🔥 ENDPOINT /responder — salva JSON + BANCO
+# 🔥 ENDPOINT /responder — salva memória + histórico no BANCO
 # =====================================================================
 @router.post("/responder")
-async def responder_mark(entrada: EntradaMARK, db: Session = Depends(get_db)):
+async def responder_mark(entrada: EntradaMARK, db: AsyncSession = Depends(get_async_db)):
 
     texto = (entrada.mensagem or "").strip()
     if not texto:
         return {"resposta": "Envie uma mensagem válida."}
 
-    mensagens = montar_mensagens_base(texto, entrada.usuario_id, db)
-    resposta_texto = await chamar_openai(mensagens, entrada.modelo)
-
-    historico = carregar_historico_json()
-    historico.append({"pergunta": texto, "resposta": resposta_texto})
-    historico = historico[-50:]
-    salvar_historico_json(historico)
+    mensagens = await montar_mensagens_base(texto, entrada.usuario_id, db)
+    # devolve a conexão ao pool antes do modelo (pode levar segundos);
+    # o commit do histórico abaixo pega outra
+    await db.commit()
+    resposta_texto = await chamar_openai(mensagens, entrada.modelo, entrada.usuario_id)
 
     if entrada.usuario_id:
         try:
+            db.add(
+                MemoriaMark(
+                    usuario_id=entrada.usuario_id,
+                    pergunta=texto,
+                    resposta=resposta_texto,
+                )
+            )
             db.add(
                 HistoricoMark(
                     usuario_id=entrada.usuario_id,
@@ -294,19 +391,19 @@ async def responder_mark(entrada: EntradaMARK, db: Session = Depends(get_db)):
                     mensagem=resposta_texto,
                 )
             )
-            db.commit()
+            await db.commit()
         except SQLAlchemyError as e:
-            db.rollback()
+            await db.rollback()
             print("[ERRO SALVAR DB responder_mark]:", e)
 
     return {"resposta": resposta_texto}
 
 
 # =====================================================================
-# 🔥 ENDPOINT /stream — salva JSON (DB via /registrar_historico)
+# 🔥 ENDPOINT /stream — salva memória (histórico via /registrar_historico)
 # =====================================================================
 @router.post("/stream")
-async def stream_mark(entrada: EntradaMARK, db: Session = Depends(get_db)):
+async def stream_mark(entrada: EntradaMARK, db: AsyncSession = Depends(get_async_db)):
 
     texto = (entrada.mensagem or "").strip()
     if not texto:
@@ -316,7 +413,9 @@ async def stream_mark(entrada: EntradaMARK, db: Session = Depends(get_db)):
 
         return StreamingResponse(vazio(), media_type="text/plain")
 
-    mensagens = montar_mensagens_base(texto, entrada.usuario_id, db)
+    mensagens = await montar_mensagens_base(texto, entrada.usuario_id, db)
+    # a sessão do request acaba aqui: a conexão não fica presa durante o stream
+    await db.close()
     modelo_usado = entrada.modelo or MARK_MODEL_DEFAULT
 
     async def token_generator():
@@ -324,29 +423,24 @@ async def stream_mark(entrada: EntradaMARK, db: Session = Depends(get_db)):
         full = ""
 
         try:
-            stream = await client.chat.completions.create(
-                model=modelo_usado,
-                messages=mensagens,
+            async for delta in chat_stream(
+                mensagens,
+                modelo=modelo_usado,
+                tenant=entrada.usuario_id,
                 temperature=0.4,
-                stream=True,
                 timeout=60,
-            )
-
-            async for chunk in stream:
-                delta = chunk.choices[0].delta.content or ""
-                if delta:
-                    full += delta
-                    yield delta
+            ):
+                full += delta
+                yield delta
 
         except Exception as e:
             erro = f"[ERRO IA] Error code: 401 - {e}"
             yield erro
 
-        # Atualiza JSON de contexto (independente de salvar em banco)
-        historico = carregar_historico_json()
-        historico.append({"pergunta": texto, "resposta": full})
-        historico = historico[-50:]
-        salvar_historico_json(historico)
+        # Atualiza a memória do usuário (sessão própria: a do request pode
+        # já ter sido fechada quando o streaming termina)
+        async with AsyncSessionLocal() as sessao:
+            await salvar_memoria(sessao, entrada.usuario_id, texto, full)
 
     return StreamingResponse(token_generator(), media_type="text/plain")
 
@@ -355,7 +449,7 @@ async def stream_mark(entrada: EntradaMARK, db: Session = Depends(get_db)):
 # 🔥 ENDPOINT /registrar_historico — chamado pelo HTML após stream
 # =====================================================================
 @router.post("/registrar_historico")
-async def registrar_historico(payload: RegistrarHistoricoPayload, db: Session = Depends(get_db)):
+async def registrar_historico(payload: RegistrarHistoricoPayload, db: AsyncSession = Depends(get_async_db)):
     """
     Salva no banco a pergunta e a resposta do MARK.
     Chamado pelo HTML após terminar o streaming.
@@ -378,10 +472,10 @@ async def registrar_historico(payload: RegistrarHistoricoPayload, db: Session =
                 mensagem=payload.resposta,
             )
         )
-        db.commit()
+        await db.commit()
         return {"ok": True}
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         print("[ERRO registrar_historico]", e)
         raise HTTPException(status_code=500, detail="Erro ao salvar histórico no banco.")
 
@@ -392,20 +486,21 @@ async def registrar_historico(payload: RegistrarHistoricoPayload, db: Session =
 @router.get("/historico_v2")
 async def listar_historico_mark(
     busca: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Lista o histórico de conversas salvas na tabela historico_mark.
     """
 
     try:
-        query = db.query(HistoricoMark)
+        query = select(HistoricoMark)
 
         if busca:
             like = f"%{busca}%"
-            query = query.filter(HistoricoMark.mensagem.ilike(like))
+            query = query.where(HistoricoMark.mensagem.ilike(like))
 
-        registros = query.order_by(HistoricoMark.data_envio.desc()).limit(300).all()
+        resultado = await db.execute(query.order_by(HistoricoMark.data_envio.desc()).limit(300))
+        registros = resultado.scalars().all()
 
         retorno = []
         for h in registros:
@@ -449,8 +544,15 @@ async def responder_simples(entrada: EntradaSimples):
     if not texto:
         return {"resposta": "Envie uma mensagem para teste."}
 
+    em_cache = await buscar_resposta(ESCOPO_MARK_SIMPLES, texto)
+    if em_cache is not None:
+        return {"resposta": em_cache}
+
     mensagens = [
         {"role": "system", "content": "Você é o MARK."},
         {"role": "user", "content": texto},
     ]
-    return {"resposta": await chamar_openai(mensagens)}
+    resposta = await chamar_openai(mensagens)
+    if not resposta.startswith("[ERRO IA]"):
+        await guardar_resposta(ESCOPO_MARK_SIMPLES, texto, resposta)
+    return {"resposta": resposta}
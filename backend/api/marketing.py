@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from backend.database import get_db
 from backend.models import CardMarketing, Usuario
+from backend.models.marketing import stmt_inserir_cards
 from datetime import datetime
 from typing import List
 from pydantic import BaseModel
@@ -114,24 +115,28 @@ def gerar_cards(
         },
     ]
 
-    for e in exemplo:
-        novo_card = CardMarketing(
-            usuario_id=usuario.id,
-            titulo=e["titulo"],
-            descricao=e["descricao"],
-            fonte=e["fonte"],
-            ideias_conteudo=e["ideias_conteudo"],
-            tipo=e["tipo"],
-            mes_referencia=input.mes,
-            favorito=False,
-            eh_atualizacao=False,
-            criado_em=datetime.utcnow(),
-            atualizado_em=datetime.utcnow(),
-        )
-        db.add(novo_card)
+    agora = datetime.utcnow()
+    linhas = [
+        {
+            "usuario_id": usuario.id,
+            "titulo": e["titulo"],
+            "descricao": e["descricao"],
+            "fonte": e["fonte"],
+            "ideias_conteudo": e["ideias_conteudo"],
+            "tipo": e["tipo"],
+            "mes_referencia": input.mes,
+            "favorito": False,
+            "eh_atualizacao": False,
+            "criado_em": agora,
+            "atualizado_em": agora,
+        }
+        for e in exemplo
+    ]
 
+    # chamar de novo no mesmo mês não duplica (nem quebra no índice único)
+    resultado = db.execute(stmt_inserir_cards(linhas))
     db.commit()
-    return {"mensagem": f"{len(exemplo)} cards gerados com sucesso."}
+    return {"mensagem": f"{resultado.rowcount or 0} cards gerados com sucesso."}
 
 
 @router.get("/marketing/populares")
@@ -10,9 +10,10 @@ from typing import Optional, Dict, Any
 
 import httpx
 from fastapi import APIRouter, Request, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.database import get_db
+from backend.database import get_async_db
 from backend.models import Pagamento, Usuario
 from backend.models.planos import Plano
 from backend.utils.email_utils import enviar_email
@@ -177,7 +178,7 @@ def webhook_up():
 
 
 @router.post("/webhook")
-async def mercado_pago_webhook(request: Request, db: Session = Depends(get_db)):
+async def mercado_pago_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Webhook de pagamentos.
     Fluxo:
@@ -221,24 +222,20 @@ async def mercado_pago_webhook(request: Request, db: Session = Depends(get_db)):
 
     # 1️⃣ Curso
     if isinstance(pag_id, int):
-        pagamento = db.query(PagamentoCurso).filter(
-            PagamentoCurso.id == pag_id
-        ).first()
+        pagamento = await db.scalar(select(PagamentoCurso).where(PagamentoCurso.id == pag_id))
 
     # 2️⃣ Plano (somente se NÃO for curso)
     if not pagamento and isinstance(pag_id, int):
-        pagamento = db.query(Pagamento).filter(
-            Pagamento.id == pag_id
-        ).first()
+        pagamento = await db.scalar(select(Pagamento).where(Pagamento.id == pag_id))
 
 
     # 2) fallback: por mp_payment_id (se existir no model)
     if not pagamento and hasattr(Pagamento, "mp_payment_id"):
-        pagamento = db.query(Pagamento).filter(Pagamento.mp_payment_id == str(payment_id)).first()
+        pagamento = await db.scalar(select(Pagamento).where(Pagamento.mp_payment_id == str(payment_id)))
 
     # 3) fallback: por external_reference (se existir campo no model)
     if not pagamento and external_reference and hasattr(Pagamento, "mp_external_reference"):
-        pagamento = db.query(Pagamento).filter(Pagamento.mp_external_reference == external_reference).first()
+        pagamento = await db.scalar(select(Pagamento).where(Pagamento.mp_external_reference == external_reference))
 
     if not pagamento:
         return {
@@ -263,17 +260,17 @@ async def mercado_pago_webhook(request: Request, db: Session = Depends(get_db)):
     if status != "approved":
         # mantém "pending", "rejected", "cancelled" etc
         pagamento.status = status
-        db.commit()
+        await db.commit()
         return {"ok": True, "status": status, "pagamento_id": pagamento.id}
 
     # -------------------------
     # APPROVED -> LIBERAÇÃO
     # -------------------------
     pagamento.status = "pago"
-    db.commit()
-    db.refresh(pagamento)
+    await db.commit()
+    await db.refresh(pagamento)
 
-    usuario = db.query(Usuario).filter(Usuario.id == pagamento.usuario_id).first()
+    usuario = await db.scalar(select(Usuario).where(Usuario.id == pagamento.usuario_id))
     if not usuario:
         return {"ok": True, "warning": "usuario_nao_encontrado", "pagamento_id": pagamento.id}
 
@@ -299,7 +296,7 @@ async def mercado_pago_webhook(request: Request, db: Session = Depends(get_db)):
         # resolve nome do plano
         plano_nome = None
         if isinstance(plano_id, int):
-            p = db.query(Plano).filter(Plano.id == plano_id).first()
+            p = await db.scalar(select(Plano).where(Plano.id == plano_id))
             if p and p.nome:
                 plano_nome = p.nome
 
@@ -321,7 +318,7 @@ async def mercado_pago_webhook(request: Request, db: Session = Depends(get_db)):
                 setattr(usuario, campo, expira)
                 break
 
-        db.commit()
+        await db.commit()
 
         _email_plano_aprovado(usuario, plano_nome, periodo)
 
@@ -349,7 +346,7 @@ async def mercado_pago_webhook(request: Request, db: Session = Depends(get_db)):
             }
 
         # Confirma se o curso existe (e opcionalmente se está ativo)
-        curso = db.query(Curso).filter(Curso.id == curso_id).first()
+        curso = await db.scalar(select(Curso).where(Curso.id == curso_id))
         if not curso:
             return {
                 "ok": True,
@@ -360,10 +357,9 @@ async def mercado_pago_webhook(request: Request, db: Session = Depends(get_db)):
             }
 
         # Idempotência: não duplica compra se webhook repetir
-        ja = (
-            db.query(CompraCurso)
-            .filter(CompraCurso.usuario_id == usuario.id, CompraCurso.curso_id == curso_id)
-            .first()
+        ja = await db.scalar(
+            select(CompraCurso)
+            .where(CompraCurso.usuario_id == usuario.id, CompraCurso.curso_id == curso_id)
         )
         if ja:
             return {
@@ -393,8 +389,8 @@ async def mercado_pago_webhook(request: Request, db: Session = Depends(get_db)):
             data_compra=datetime.utcnow(),
         )
         db.add(compra)
-        db.commit()
-        db.refresh(compra)
+        await db.commit()
+        await db.refresh(compra)
 
         return {
             "ok": True,
@@ -413,7 +409,7 @@ async def mercado_pago_webhook(request: Request, db: Session = Depends(get_db)):
 async def reprocessar_pagamento_mp(
     payment_id: str,
     usuario: Usuario = Depends(get_usuario_logado),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Reprocessa um pagamento do Mercado Pago (somente admin), reconcilia com o banco
@@ -470,16 +466,16 @@ async def reprocessar_pagamento_mp(
         PagModel = PagamentoCurso
 
         if isinstance(pag_id, int):
-            pagamento = db.query(PagModel).filter(PagModel.id == pag_id).first()
+            pagamento = await db.scalar(select(PagModel).where(PagModel.id == pag_id))
 
         if not pagamento:
             # tenta por payment_id em campos conhecidos
             if hasattr(PagModel, "codigo_externo"):
-                pagamento = db.query(PagModel).filter(PagModel.codigo_externo == str(payment_id)).first()
+                pagamento = await db.scalar(select(PagModel).where(PagModel.codigo_externo == str(payment_id)))
 
         # fallback: tenta por external_reference se existir campo (nem sempre existe no model)
         if (not pagamento) and external_reference and hasattr(PagModel, "mp_external_reference"):
-            pagamento = db.query(PagModel).filter(PagModel.mp_external_reference == external_reference).first()
+            pagamento = await db.scalar(select(PagModel).where(PagModel.mp_external_reference == external_reference))
 
     else:
         # PLANO
@@ -487,17 +483,17 @@ async def reprocessar_pagamento_mp(
         PagModel = Pagamento
 
         if isinstance(pag_id, int):
-            pagamento = db.query(PagModel).filter(PagModel.id == pag_id).first()
+            pagamento = await db.scalar(select(PagModel).where(PagModel.id == pag_id))
 
         if not pagamento:
             if hasattr(PagModel, "codigo_externo"):
-                pagamento = db.query(PagModel).filter(PagModel.codigo_externo == str(payment_id)).first()
+                pagamento = await db.scalar(select(PagModel).where(PagModel.codigo_externo == str(payment_id)))
 
         if not pagamento and hasattr(PagModel, "mp_payment_id"):
-            pagamento = db.query(PagModel).filter(PagModel.mp_payment_id == str(payment_id)).first()
+            pagamento = await db.scalar(select(PagModel).where(PagModel.mp_payment_id == str(payment_id)))
 
         if (not pagamento) and external_reference and hasattr(PagModel, "mp_external_reference"):
-            pagamento = db.query(PagModel).filter(PagModel.mp_external_reference == external_reference).first()
+            pagamento = await db.scalar(select(PagModel).where(PagModel.mp_external_reference == external_reference))
 
     if not pagamento:
         return {
@@ -532,7 +528,7 @@ async def reprocessar_pagamento_mp(
     # =========================
     if status != "approved":
         pagamento.status = status
-        db.commit()
+        await db.commit()
         return {
             "ok": True,
             "status": status,
@@ -548,8 +544,8 @@ async def reprocessar_pagamento_mp(
     if hasattr(pagamento, "confirmado_em") and getattr(pagamento, "confirmado_em", None) is None:
         pagamento.confirmado_em = datetime.utcnow()
 
-    db.commit()
-    db.refresh(pagamento)
+    await db.commit()
+    await db.refresh(pagamento)
 
     # =========================
     # 8) Liberação de PLANO
@@ -560,11 +556,11 @@ async def reprocessar_pagamento_mp(
 
         plano_nome = None
         if isinstance(plano_id, int):
-            p = db.query(Plano).filter(Plano.id == plano_id).first()
+            p = await db.scalar(select(Plano).where(Plano.id == plano_id))
             if p and getattr(p, "nome", None):
                 plano_nome = p.nome
 
-        usuario_pag = db.query(Usuario).filter(Usuario.id == pagamento.usuario_id).first()
+        usuario_pag = await db.scalar(select(Usuario).where(Usuario.id == pagamento.usuario_id))
         if not usuario_pag:
             return {"ok": False, "warning": "usuario_nao_encontrado", "pagamento_id": pagamento.id}
 
@@ -582,7 +578,7 @@ async def reprocessar_pagamento_mp(
                 setattr(usuario_pag, campo, expira)
                 break
 
-        db.commit()
+        await db.commit()
         return {
             "ok": True,
             "liberado": "plano",
@@ -603,7 +599,7 @@ async def reprocessar_pagamento_mp(
         if not isinstance(curso_id, int):
             return {"ok": False, "warning": "curso_id_invalido", "ref": ref, "pagamento_id": pagamento.id}
 
-        curso = db.query(Curso).filter(Curso.id == curso_id).first()
+        curso = await db.scalar(select(Curso).where(Curso.id == curso_id))
         if not curso:
             return {"ok": False, "warning": "curso_nao_encontrado", "curso_id": curso_id, "pagamento_id": pagamento.id}
 
@@ -611,10 +607,10 @@ async def reprocessar_pagamento_mp(
         if not isinstance(usuario_id, int):
             return {"ok": False, "warning": "usuario_id_invalido", "ref": ref, "pagamento_id": pagamento.id}
 
-        ja = db.query(CompraCurso).filter(
-            CompraCurso.usuario_id == usuario_id,
-            CompraCurso.curso_id == curso_id
-        ).first()
+        ja = await db.scalar(
+            select(CompraCurso)
+            .where(CompraCurso.usuario_id == usuario_id, CompraCurso.curso_id == curso_id)
+        )
         if ja:
             return {
                 "ok": True,
@@ -646,8 +642,8 @@ async def reprocessar_pagamento_mp(
             data_compra=datetime.utcnow(),
         )
         db.add(compra)
-        db.commit()
-        db.refresh(compra)
+        await db.commit()
+        await db.refresh(compra)
 
         return {
             "ok": True,
@@ -1,14 +1,13 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from sqlalchemy.orm import Session, sessionmaker
-from backend.database import engine
+from sqlalchemy.orm import Session
+from backend.database import get_db
 from backend.models import Orcamento, Usuario
 from backend.api.auth import get_current_user
 from datetime import datetime
 from typing import List, Dict
 
 router = APIRouter()
-SessionLocal = sessionmaker(bind=engine)
 
 class OrcamentoSchema(BaseModel):
     dados_cliente: Dict
@@ -16,9 +15,7 @@ class OrcamentoSchema(BaseModel):
     texto_orcamento: str
 
 @router.post("/orcamento")
-def criar_orcamento(dados: OrcamentoSchema, usuario: Usuario = Depends(get_current_user)):
-    db: Session = SessionLocal()
-
+def criar_orcamento(dados: OrcamentoSchema, usuario: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
     novo = Orcamento(
         usuario_id=usuario.id,
         dados_cliente=dados.dados_cliente,
@@ -28,14 +25,11 @@ def criar_orcamento(dados: OrcamentoSchema, usuario: Usuario = Depends(get_curre
     )
     db.add(novo)
     db.commit()
-    db.close()
     return {"mensagem": "Orçamento criado com sucesso!"}
 
 @router.get("/orcamento")
-def listar_orcamentos(usuario: Usuario = Depends(get_current_user)):
-    db: Session = SessionLocal()
+def listar_orcamentos(usuario: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
     orcamentos = db.query(Orcamento).filter(Orcamento.usuario_id == usuario.id).all()
-    db.close()
 
     return [
         {
@@ -1,14 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
 from pydantic import BaseModel
-from sqlalchemy.orm import Session, sessionmaker
-from backend.database import engine
+from sqlalchemy.orm import Session
+from backend.database import get_db
 from backend.models import Pagamento, Usuario
 from backend.models.curso import PagamentoCurso, CompraCurso
 from backend.api.auth import get_current_user
 from datetime import datetime
 
 router = APIRouter()
-SessionLocal = sessionmaker(bind=engine)
 
 # ------------------- Pagamentos de Plano -------------------
 
@@ -19,8 +18,7 @@ class PagamentoSchema(BaseModel):
     gateway: str
 
 @router.post("/pagamento")
-def registrar_pagamento(dados: PagamentoSchema, usuario: Usuario = Depends(get_current_user)):
-    db: Session = SessionLocal()
+def registrar_pagamento(dados: PagamentoSchema, usuario: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
     novo = Pagamento(
         usuario_id=usuario.id,
         plano=dados.plano,
@@ -31,14 +29,11 @@ def registrar_pagamento(dados: PagamentoSchema, usuario: Usuario = Depends(get_c
     )
     db.add(novo)
     db.commit()
-    db.close()
     return {"mensagem": "Pagamento registrado com sucesso!"}
 
 @router.get("/pagamento")
-def listar_pagamentos(usuario: Usuario = Depends(get_current_user)):
-    db: Session = SessionLocal()
+def listar_pagamentos(usuario: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
     pagamentos = db.query(Pagamento).filter(Pagamento.usuario_id == usuario.id).all()
-    db.close()
     return [
         {
             "plano": p.plano,
@@ -52,13 +47,6 @@ def listar_pagamentos(usuario: Usuario = Depends(get_current_user)):
 
 # ------------------- Confirmação de Curso -------------------
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/confirmar")
 def confirmar_pagamento(
     pagamento_id: int = Body(...),
@@ -1,11 +1,20 @@
 # backend/api/site_cliente.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from backend.database import SessionLocal
+from backend.api.auth import get_usuario_admin
 from backend.models import Empresa
-from jinja2 import Template
+from backend.models.projecoes import perfil_empresa_site
+from backend.utils.arquivos import escrever_atomico
+from backend.services.fila_sites import enfileirar_site, metricas_fila_sites, status_job
+from backend.services.sites_estaticos import gravar_versoes_estaticas, versoes_estaticas_ok
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 from pathlib import Path
+from typing import Any, Dict, Optional
+import hashlib
+import json
 import os
+import threading
 
 router = APIRouter()
 
@@ -15,6 +24,10 @@ RAIZ_PROJETO = Path(__file__).resolve().parents[2]  # .../backend/api -> .../bac
 CAMINHO_MODELO = RAIZ_PROJETO / "templates_html" / "modelo_site_cliente.html"
 PASTA_SAIDA = RAIZ_PROJETO / "data" / "sites_gerados"
 
+# Hash das entradas do último render de cada site (fora de /sites: não é público)
+PASTA_HASHES = RAIZ_PROJETO / "data" / "sites_hashes"
+PASTA_BYTECODE = RAIZ_PROJETO / "data" / "cache_jinja"
+
 
 class DadosSiteCliente(BaseModel):
     usuario_id: int
@@ -24,15 +37,123 @@ class DadosSiteCliente(BaseModel):
     informacoes_adicionais: str | None = None
 
 
-def _slug_nome(nome: str) -> str:
+# ==== 🔹 Template compilado (uma vez por processo) ====
+# O Environment guarda o template compilado em memória e o bytecode em disco
+# (workers novos não recompilam). auto_reload: se o modelo mudar no disco,
+# recompila sozinho.
+_ambiente: Optional[Environment] = None
+_ambiente_lock = threading.Lock()
+
+
+def _obter_ambiente() -> Environment:
+    global _ambiente
+    if _ambiente is None:
+        with _ambiente_lock:
+            if _ambiente is None:
+                PASTA_BYTECODE.mkdir(parents=True, exist_ok=True)
+                _ambiente = Environment(
+                    loader=FileSystemLoader(str(CAMINHO_MODELO.parent)),
+                    bytecode_cache=FileSystemBytecodeCache(str(PASTA_BYTECODE)),
+                    auto_reload=True,
+                )
+    return _ambiente
+
+
+def obter_template():
+    if not CAMINHO_MODELO.exists():
+        raise HTTPException(status_code=500, detail="Modelo de site não encontrado.")
+    return _obter_ambiente().get_template(CAMINHO_MODELO.name)
+
+
+# ==== 🔹 Dados do render ====
+def montar_dados_render(empresa: Empresa, dados: DadosSiteCliente) -> Dict[str, Any]:
+    """Tudo que o modelo usa. Também é a entrada do hash incremental."""
+    # só o slug persistido (único): calculado pelo nome poderia ser o de outra empresa
+    slug_empresa = empresa.slug
+    if not slug_empresa:
+        raise HTTPException(
+            status_code=409,
+            detail="Empresa sem slug. Rode backend/comandos/gerar_slugs_empresas.py.",
+        )
+
+    return {
+        # Dados da empresa
+        "nome_empresa": getattr(empresa, "nome_empresa", "") or "",
+        "nicho": getattr(empresa, "nicho", "") or "",
+        "descricao": getattr(empresa, "descricao", "") or "",
+        "logo_url": getattr(empresa, "logo_url", "") or "",
+        "whatsapp": getattr(empresa, "whatsapp", "") or "",
+        "instagram": getattr(empresa, "instagram", "") or "",
+        "facebook": getattr(empresa, "facebook", "") or "",
+        "tiktok": getattr(empresa, "tiktok", "") or "",
+        "youtube": getattr(empresa, "youtube", "") or "",
+        "rua": getattr(empresa, "rua", "") or "",
+        "numero": getattr(empresa, "numero", "") or "",
+        "bairro": getattr(empresa, "bairro", "") or "",
+        "cidade": getattr(empresa, "cidade", "") or "",
+        "cep": getattr(empresa, "cep", "") or "",
+        "cnpj": getattr(empresa, "cnpj", "") or "",
+
+        # Dados extras específicos do módulo Página e Chat do Cliente
+        "bio": dados.bio or "",
+        "informacoes_adicionais": dados.informacoes_adicionais or "",
+        "agendamento_ativo": dados.agendamento_ativo,
+        "horarios_disponiveis": dados.horarios_disponiveis or [],
+
+        # Usado pelo chat público para identificar a empresa
+        "empresa_slug": slug_empresa,
+    }
+
+
+def hash_entrada(dados_render: Dict[str, Any]) -> str:
     """
-    Gera um slug simples: tudo minúsculo, espaços viram underscore.
-    Ex.: 'Restaurante do Judas' -> 'restaurante_do_judas'
+    Hash dos dados + versão do modelo (mtime/tamanho). Mesmo hash => mesmo HTML.
     """
-    nome = (nome or "").strip().lower().replace(" ", "_")
-    # Evita caracteres estranhos em nome de arquivo
-    permitidos = "abcdefghijklmnopqrstuvwxyz0123456789_-"
-    return "".join(ch for ch in nome if ch in permitidos) or "site"
+    stat = CAMINHO_MODELO.stat()
+    h = hashlib.sha256()
+    h.update(f"{stat.st_mtime_ns}:{stat.st_size}".encode())
+    h.update(json.dumps(dados_render, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _ler_hash(slug: str) -> Optional[str]:
+    try:
+        return (PASTA_HASHES / f"{slug}.sha256").read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+
+def renderizar_site(dados_render: Dict[str, Any], forcar: bool = False) -> Dict[str, Any]:
+    """
+    Renderiza e grava o site a partir dos dados já montados (sem banco).
+    Pula o render quando o hash das entradas é igual ao da última geração.
+    """
+    slug_empresa = dados_render["empresa_slug"]
+    nome_arquivo = f"{slug_empresa}.html"
+    caminho_saida = PASTA_SAIDA / nome_arquivo
+
+    template = obter_template()
+    assinatura = hash_entrada(dados_render)
+
+    alterado = (
+        forcar
+        or not caminho_saida.exists()
+        or _ler_hash(slug_empresa) != assinatura
+        or not versoes_estaticas_ok(caminho_saida)
+    )
+    if alterado:
+        conteudo = template.render(**dados_render).encode("utf-8")
+        escrever_atomico(caminho_saida, conteudo)
+        # .gz/.br + ETag (hash do conteúdo) para a entrega em /sites
+        gravar_versoes_estaticas(caminho_saida, conteudo)
+        # hash gravado por último: se cair no meio, o próximo render refaz
+        escrever_atomico(PASTA_HASHES / f"{slug_empresa}.sha256", assinatura.encode("utf-8"))
+
+    return {
+        "caminho": caminho_saida,
+        "arquivo": nome_arquivo,
+        "alterado": alterado,
+    }
 
 
 def gerar_site_cliente(dados: DadosSiteCliente):
@@ -42,72 +163,55 @@ def gerar_site_cliente(dados: DadosSiteCliente):
     """
     db = SessionLocal()
     try:
-        empresa = db.query(Empresa).filter(Empresa.usuario_id == dados.usuario_id).first()
+        empresa = (
+            db.query(Empresa)
+            .options(perfil_empresa_site())
+            .filter(Empresa.usuario_id == dados.usuario_id)
+            .first()
+        )
         if not empresa:
             raise HTTPException(status_code=404, detail="Empresa não encontrada para este usuário.")
 
-        if not CAMINHO_MODELO.exists():
-            raise HTTPException(status_code=500, detail="Modelo de site não encontrado.")
-
-        with CAMINHO_MODELO.open("r", encoding="utf-8") as f:
-            template = Template(f.read())
-
-        slug_empresa = _slug_nome(getattr(empresa, "nome_empresa", "site"))
-
-        # Renderiza o HTML com TODOS os dados que o modelo usa
-        site_renderizado = template.render(
-            # Dados da empresa
-            nome_empresa=getattr(empresa, "nome_empresa", "") or "",
-            nicho=getattr(empresa, "nicho", "") or "",
-            descricao=getattr(empresa, "descricao", "") or "",
-            logo_url=getattr(empresa, "logo_url", "") or "",
-            whatsapp=getattr(empresa, "whatsapp", "") or "",
-            instagram=getattr(empresa, "instagram", "") or "",
-            facebook=getattr(empresa, "facebook", "") or "",
-            tiktok=getattr(empresa, "tiktok", "") or "",
-            youtube=getattr(empresa, "youtube", "") or "",
-            rua=getattr(empresa, "rua", "") or "",
-            numero=getattr(empresa, "numero", "") or "",
-            bairro=getattr(empresa, "bairro", "") or "",
-            cidade=getattr(empresa, "cidade", "") or "",
-            cep=getattr(empresa, "cep", "") or "",
-            cnpj=getattr(empresa, "cnpj", "") or "",
-
-            # Dados extras específicos do módulo Página e Chat do Cliente
-            bio=dados.bio or "",
-            informacoes_adicionais=dados.informacoes_adicionais or "",
-            agendamento_ativo=dados.agendamento_ativo,
-            horarios_disponiveis=dados.horarios_disponiveis or [],
-
-            # Usado pelo chat público para identificar a empresa
-            empresa_slug=slug_empresa,
-        )
-
-        # Garante que a pasta de saída exista
-        PASTA_SAIDA.mkdir(parents=True, exist_ok=True)
-
-        nome_arquivo = f"{slug_empresa}.html"
-        caminho_saida = PASTA_SAIDA / nome_arquivo
-
-        with caminho_saida.open("w", encoding="utf-8") as f_out:
-            f_out.write(site_renderizado)
+        dados_render = montar_dados_render(empresa, dados)
+    finally:
+        db.close()
 
-        # Se você configurar SITES_BASE_URL no Render, montamos a URL pública
-        # Ex.: SITES_BASE_URL=https://mivmark-backend.onrender.com/sites
-        base_url = os.getenv("SITES_BASE_URL")
-        url_publica = f"{base_url.rstrip('/')}/{nome_arquivo}" if base_url else None
+    resultado = renderizar_site(dados_render)
+    nome_arquivo = resultado["arquivo"]
 
-        return {
-            "mensagem": "Site gerado com sucesso!",
-            "caminho": str(caminho_saida),
-            "arquivo": nome_arquivo,
-            "url_publica": url_publica,
-        }
+    # Se você configurar SITES_BASE_URL no Render, montamos a URL pública
+    # Ex.: SITES_BASE_URL=https://mivmark-backend.onrender.com/sites
+    base_url = os.getenv("SITES_BASE_URL")
+    url_publica = f"{base_url.rstrip('/')}/{nome_arquivo}" if base_url else None
 
-    finally:
-        db.close()
+    return {
+        "mensagem": "Site gerado com sucesso!" if resultado["alterado"] else "Site já estava atualizado.",
+        "caminho": str(resultado["caminho"]),
+        "arquivo": nome_arquivo,
+        "url_publica": url_publica,
+        "alterado": resultado["alterado"],
+    }
 
 
 @router.post("/site_cliente/gerar")
 def api_gerar_site_cliente(dados: DadosSiteCliente):
     return gerar_site_cliente(dados)
+
+
+@router.post("/site_cliente/agendar")
+def api_agendar_site_cliente(dados: DadosSiteCliente):
+    """Versão em fila do /site_cliente/gerar: responde na hora com o id do job."""
+    return {"job_id": enfileirar_site(dados)}
+
+
+@router.get("/site_cliente/status/{job_id}")
+def api_status_site_cliente(job_id: str):
+    status = status_job(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return status
+
+
+@router.get("/site_cliente/metricas", dependencies=[Depends(get_usuario_admin)])
+def api_metricas_site_cliente():
+    return metricas_fila_sites()
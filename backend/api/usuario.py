@@ -6,16 +6,16 @@ import string
 
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 
-from passlib.context import CryptContext  # 🔐 para hash de senha
-
 from backend.database import get_db
 from backend.models import Usuario, Diagnostico
 from backend.models.tokens import TokenAtivacao
 from backend.api.auth import get_usuario_logado
 from backend.utils.email_utils import enviar_email
+from backend.services.senhas import gerar_hash
 
 router = APIRouter(prefix="/usuario", tags=["Usuários"])
 
@@ -23,12 +23,12 @@ router = APIRouter(prefix="/usuario", tags=["Usuários"])
 # CONTEXTO DE SENHA
 # =========================
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def hash_senha(senha: str) -> str:
-    """Gera o hash seguro da senha."""
-    return pwd_context.hash(senha)
+async def hash_senha(senha: str) -> str:
+    """
+    Gera o hash seguro da senha (bcrypt no executor dedicado de senhas).
+    Async de propósito: a rota espera sem prender uma thread da threadpool.
+    """
+    return await gerar_hash(senha)
 
 
 # =========================
@@ -64,10 +64,16 @@ def gerar_senha_temporaria(tamanho: int = 8) -> str:
 # =========================
 
 @router.post("/cadastro-gratuito")
-def cadastro_gratuito(dados: CadastroGratuito, db: Session = Depends(get_db)):
+async def cadastro_gratuito(dados: CadastroGratuito, db: Session = Depends(get_db)):
     """
     Cria usuário e libera 3 dias de acesso ao plano Profissional.
     """
+    # bcrypt aguardado no executor de senhas; banco + e-mail seguem na threadpool
+    senha_hash = await hash_senha(dados.senha)
+    return await run_in_threadpool(_cadastro_gratuito, dados, senha_hash, db)
+
+
+def _cadastro_gratuito(dados: CadastroGratuito, senha_hash: str, db: Session):
 
     usuario_existente = db.query(Usuario).filter(Usuario.email == dados.email).first()
     if usuario_existente:
@@ -79,7 +85,7 @@ def cadastro_gratuito(dados: CadastroGratuito, db: Session = Depends(get_db)):
         nome=dados.nome,
         email=dados.email,
         # 🔐 agora salvando a senha já com HASH bcrypt
-        senha_hash=hash_senha(dados.senha),
+        senha_hash=senha_hash,
         plano_atual="Profissional",
         plano_expira_em=agora + timedelta(days=3),
     )
@@ -250,19 +256,22 @@ def ativar_token(token: str, db: Session = Depends(get_db)):
 
 
 @router.post("/esqueci-senha")
-def esqueci_senha(dados: EsqueciSenhaRequest, db: Session = Depends(get_db)):
+async def esqueci_senha(dados: EsqueciSenhaRequest, db: Session = Depends(get_db)):
     """
     Gera uma nova senha temporária, SALVA com hash e envia por e-mail.
     """
+    nova_senha = gerar_senha_temporaria(10)
+    senha_hash = await hash_senha(nova_senha)
+    return await run_in_threadpool(_esqueci_senha, dados, nova_senha, senha_hash, db)
+
 
+def _esqueci_senha(dados: EsqueciSenhaRequest, nova_senha: str, senha_hash: str, db: Session):
     usuario = db.query(Usuario).filter(Usuario.email == dados.email).first()
     if not usuario:
         raise HTTPException(status_code=404, detail="Nenhum usuário encontrado com esse e-mail.")
 
-    nova_senha = gerar_senha_temporaria(10)
-
     # 🔐 salva a senha temporária já com hash, compatível com o /login
-    usuario.senha_hash = hash_senha(nova_senha)
+    usuario.senha_hash = senha_hash
     db.commit()
     db.refresh(usuario)
 
@@ -1,13 +1,29 @@
+import sys
+
 from apscheduler.schedulers.blocking import BlockingScheduler
 from backend.comandos.gerar_cards_automatico import gerar_atualizacoes
+from backend.tarefas.rebaixar_planos import rebaixar_planos_expirados
+from backend.tarefas.pregerar_pacotes_mes import pregerar_pacotes_mes
 
 def job_diario():
     print("⏰ Executando geração automática de cards...")
     gerar_atualizacoes()
 
+def job_planos():
+    rebaixar_planos_expirados()
+
+def job_pacotes_mes():
+    print("⏰ Pré-gerando ideias/consultor (mês atual pendente + próximo perto da virada)...")
+    pregerar_pacotes_mes()
+
 scheduler = BlockingScheduler()
-scheduler.add_job(job_diario, 'cron', hour=6)  # Executa todo dia às 6h da manhã
+scheduler.add_job(job_diario, 'cron', hour=6)  # Executa todo dia às 6h da manhã (retoma do checkpoint do dia)
+scheduler.add_job(job_planos, 'interval', minutes=10)  # Rebaixa planos vencidos (fora do caminho de leitura)
+scheduler.add_job(job_pacotes_mes, 'cron', hour=20)  # Todo dia: pula quem já tem pacote; recupera dias perdidos
 
 if __name__ == "__main__":
     print("📅 Agendador de cards iniciado...")
+    if "--since-checkpoint" in sys.argv:
+        print("⏩ Retomando a última geração de cards que não terminou...")
+        gerar_atualizacoes(desde_checkpoint=True)
     scheduler.start()
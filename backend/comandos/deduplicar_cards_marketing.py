@@ -0,0 +1,40 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from sqlalchemy import text
+
+from backend.database import engine
+
+
+def deduplicar_cards_marketing():
+    """
+    Prepara bancos já existentes para o índice único de cards
+    (usuario_id, mes_referencia, titulo), que create_all não cria em tabela
+    antiga. Remove títulos repetidos no mesmo usuário/mês mantendo, nesta
+    ordem, o card favoritado e o mais antigo. Pode rodar mais de uma vez.
+    """
+    with engine.begin() as conn:
+        removidos = conn.execute(text("""
+            DELETE FROM cards_marketing
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY usuario_id, mes_referencia, titulo
+                        ORDER BY COALESCE(favorito, false) DESC, id
+                    ) AS ordem
+                    FROM cards_marketing
+                ) repetidos
+                WHERE ordem > 1
+            )
+        """)).rowcount
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_card_usuario_mes_titulo "
+            "ON cards_marketing (usuario_id, mes_referencia, titulo)"
+        ))
+    print(f"✅ Índice único de cards pronto ({removidos or 0} duplicados removidos).")
+
+
+if __name__ == "__main__":
+    deduplicar_cards_marketing()
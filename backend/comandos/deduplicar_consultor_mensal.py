@@ -0,0 +1,40 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from sqlalchemy import text
+
+from backend.database import engine
+
+
+def deduplicar_consultor_mensal():
+    """
+    Prepara bancos antigos para o índice único uq_consultor_mensal
+    (usuario_id, empresa_id, mes_ano), usado pelo INSERT ... ON CONFLICT da
+    pré-geração mensal. Remove pacotes repetidos do mesmo mês mantendo o
+    atualizado por último. Pode rodar mais de uma vez.
+    """
+    with engine.begin() as conn:
+        removidos = conn.execute(text("""
+            DELETE FROM consultor_mensal
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY usuario_id, empresa_id, mes_ano
+                        ORDER BY atualizado_em DESC NULLS LAST, id DESC
+                    ) AS ordem
+                    FROM consultor_mensal
+                ) repetidos
+                WHERE ordem > 1
+            )
+        """)).rowcount
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_consultor_mensal "
+            "ON consultor_mensal (usuario_id, empresa_id, mes_ano)"
+        ))
+    print(f"✅ Índice único do consultor pronto ({removidos or 0} duplicados removidos).")
+
+
+if __name__ == "__main__":
+    deduplicar_consultor_mensal()
@@ -0,0 +1,51 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend.database import SessionLocal
+from backend.models import Empresa
+from backend.services.logos import armazenar_logo
+
+
+def extrair_logos(tamanho_lote: int = 100):
+    """
+    Migra logos antigas (data:image/...;base64 em empresas.logo_url) para
+    data/logos/ e troca o valor pela URL curta. Commit por lote; pode rodar
+    mais de uma vez (só pega quem ainda está em base64).
+    """
+    db = SessionLocal()
+    total = falhas = 0
+    ultimo_id = 0
+    try:
+        while True:
+            empresas = (
+                db.query(Empresa)
+                .filter(Empresa.id > ultimo_id, Empresa.logo_url.like("data:image%"))
+                .order_by(Empresa.id)
+                .limit(tamanho_lote)
+                .all()
+            )
+            if not empresas:
+                break
+
+            for empresa in empresas:
+                ultimo_id = empresa.id
+                try:
+                    empresa.logo_url = armazenar_logo(empresa.logo_url)
+                    total += 1
+                except Exception as e:
+                    falhas += 1
+                    print(f"[ERRO] empresa {empresa.id}: {getattr(e, 'detail', e)}")
+
+            db.commit()
+            # solta os blobs da memória antes do próximo lote
+            db.expunge_all()
+    finally:
+        db.close()
+
+    print(f"✅ Logos extraídas: {total} | falhas: {falhas}")
+
+
+if __name__ == "__main__":
+    extrair_logos()
@@ -1,23 +1,39 @@
 import sys
 import os
 import json
-from datetime import datetime, timedelta
+import argparse
+import asyncio
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
 
 
 # 🔹 Garante que o diretório raiz esteja no caminho
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
 from backend.database import engine
-from backend.models import Usuario, CardMarketing
+from backend.models.marketing import stmt_inserir_cards
 from sqlalchemy.orm import sessionmaker
 
-from openai import OpenAI
 from dotenv import load_dotenv  # ✅ para ler o .env
 
 # 🔹 Carrega variáveis do .env
 load_dotenv()
 
-# ⚙️ Cliente OpenAI
+from backend.services.llm import chat, chat_sync, fechar_cliente_async  # noqa: E402 (depois do load_dotenv)
+from backend.utils.lotes import iterar_usuarios_com_empresa  # noqa: E402
+from backend.services.checkpoints import (  # noqa: E402
+    abrir_execucao,
+    concluir_itens,
+    finalizar_execucao,
+    itens_concluidos,
+    liberar_itens,
+    renovar_lease,
+    reservar_itens,
+    ultima_execucao_pendente,
+)
+
+# ⚙️ OpenAI (as chamadas passam pelo gateway backend/services/llm.py)
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_KEY:
     print("❌ ERRO: OPENAI_API_KEY não encontrada nas variáveis de ambiente nem no .env.")
@@ -25,18 +41,21 @@ if not OPENAI_KEY:
     print("   OPENAI_API_KEY=suachave_aqui")
     raise SystemExit(1)
 
-client = OpenAI(api_key=OPENAI_KEY)
-
 SessionLocal = sessionmaker(bind=engine)
 
+MODELO_CARDS = "gpt-4.1-mini"  # pode trocar para o modelo que você já usa
+# Quantos nichos são gerados ao mesmo tempo (o gateway ainda aplica o limite global)
+CARDS_CONCORRENCIA = int(os.getenv("CARDS_CONCORRENCIA", "8"))
+# Linhas por INSERT (cada lote é um commit: se cair no meio, o que foi já fica salvo)
+CARDS_LOTE = int(os.getenv("CARDS_LOTE", "1000"))
+# Checkpoints: validade da reserva de um nicho (renovada antes de cada
+# gravação; outra instância só pega o nicho depois que ela vence)
+JOB_CARDS = "cards_diarios"
+CARDS_LEASE = int(os.getenv("CARDS_LEASE", "900"))
 
-def buscar_novidades_do_nicho(nicho: str, mes: str):
-    """
-    Chama o GPT pedindo 10 ideias de cards em formato de LISTA JSON.
-    Retorna uma lista de dicionários prontos para salvar no banco.
-    """
 
-    prompt = f"""
+def _prompt_novidades(nicho: str, mes: str) -> str:
+    return f"""
 Você é um especialista em marketing digital.
 
 Gere EXATAMENTE 10 cards para uma Central de Marketing que apresenta
@@ -77,14 +96,9 @@ Retorne APENAS uma LISTA JSON, SEM explicações antes ou depois, assim:
 ]
 """
 
-    resposta = client.chat.completions.create(
-        model="gpt-4.1-mini",  # pode trocar para o modelo que você já usa
-        temperature=0.3,
-        messages=[{"role": "user", "content": prompt}],
-    )
-
-    conteudo = resposta.choices[0].message.content.strip()
 
+def _interpretar_cards(conteudo: str, nicho: str):
+    """Extrai a LISTA JSON da resposta e devolve só os cards válidos."""
     # 🔍 Debug opcional
     print("==== RESPOSTA BRUTA DO GPT (primeiros 1000 caracteres) ====")
     print(conteudo[:1000])
@@ -140,92 +154,316 @@ Retorne APENAS uma LISTA JSON, SEM explicações antes ou depois, assim:
         return []
 
 
-def gerar_atualizacoes():
+def buscar_novidades_do_nicho(nicho: str, mes: str):
     """
-    Percorre todos os usuários, verifica o nicho da empresa e gera cards
-    para o mês atual, sem duplicar títulos no mesmo mês.
+    Chama o GPT pedindo 10 ideias de cards em formato de LISTA JSON.
+    Retorna uma lista de dicionários prontos para salvar no banco.
     """
+    conteudo = chat_sync(
+        [{"role": "user", "content": _prompt_novidades(nicho, mes)}],
+        modelo=MODELO_CARDS,
+        temperature=0.3,
+    )
+    return _interpretar_cards(conteudo, nicho)
+
+
+async def buscar_novidades_do_nicho_async(nicho: str, mes: str):
+    """Mesmo que buscar_novidades_do_nicho, sem bloquear o loop."""
+    conteudo = await chat(
+        [{"role": "user", "content": _prompt_novidades(nicho, mes)}],
+        modelo=MODELO_CARDS,
+        temperature=0.3,
+    )
+    return _interpretar_cards(conteudo, nicho)
+
+
+# =========================
+# Geração por nicho
+# =========================
+
+def _chave_nicho(nicho: str) -> str:
+    """'  Pet  Shop ' e 'pet shop' caem no mesmo grupo."""
+    return " ".join((nicho or "").split()).lower()
+
+
+def _agrupar_por_nicho(usuarios):
+    """
+    Usuários (com empresa) -> {chave: {"nicho": grafia mais comum, "usuarios": [ids]}}
+    """
+    grupos = {}
+    grafias = {}
+    for usuario in usuarios:
+        usuario_id = usuario.id
+        nicho = usuario.empresa.nicho if usuario.empresa else None
+        chave = _chave_nicho(nicho)
+        if not chave:
+            print(f"- Usuário {usuario_id} sem empresa ou nicho configurado. Pulando...")
+            continue
+        grupos.setdefault(chave, {"nicho": None, "usuarios": []})["usuarios"].append(usuario_id)
+        grafias.setdefault(chave, Counter())[nicho.strip()] += 1
+
+    for chave, grupo in grupos.items():
+        grupo["nicho"] = grafias[chave].most_common(1)[0][0]
+    return grupos
+
+
+# =========================
+# Gravação em lote
+# =========================
+
+def _linhas_cards(usuario_id: int, cards: list, mes: str, agora: datetime):
+    for card in cards:
+        yield {
+            "usuario_id": usuario_id,
+            "titulo": card["titulo"],
+            "descricao": card["descricao"],
+            "fonte": card["fonte"],
+            "ideias_conteudo": card["ideias_conteudo"],
+            "tipo": card["tipo"],
+            "mes_referencia": mes,
+            "favorito": False,
+            "eh_atualizacao": True,
+            "criado_em": agora,
+            "atualizado_em": agora,
+        }
+
+
+def _inserir_lote(db, periodo: str, linhas, usuarios) -> int:
+    """
+    Um INSERT multi-VALUES ... ON CONFLICT DO NOTHING + checkpoint dos
+    usuários do lote, no mesmo commit. Retorna quantos cards entraram.
+    """
+    if not linhas:
+        return 0
+    resultado = db.execute(stmt_inserir_cards(linhas))
+    concluir_itens(db, JOB_CARDS, periodo, [f"usuario:{u}" for u in usuarios], commit=False)
+    db.commit()
+    return resultado.rowcount or 0
+
+
+def _distribuir_nicho(db, periodo: str, mes: str, grupo: dict, novidades: list, concluidos: set, agora: datetime, item: str):
+    """
+    Grava os cards do nicho para cada usuário ainda não concluído no período.
+    Renova a lease do nicho antes de cada lote; se ela foi perdida, para.
+    Retorna (cards inseridos, terminou).
+    """
+    # títulos repetidos na mesma resposta viram um card só
+    novidades = list({card["titulo"]: card for card in novidades}.values())
+    usuarios = [u for u in grupo["usuarios"] if f"usuario:{u}" not in concluidos]
+    print(f"📦 Nicho '{grupo['nicho']}': {len(novidades)} cards para {len(usuarios)} usuário(s)")
+
+    total = 0
+    lote, usuarios_lote = [], []
+    for posicao, usuario_id in enumerate(usuarios, start=1):
+        lote.extend(_linhas_cards(usuario_id, novidades, mes, agora))
+        usuarios_lote.append(usuario_id)
+        if len(lote) >= CARDS_LOTE or posicao == len(usuarios):
+            if not renovar_lease(db, JOB_CARDS, periodo, item, CARDS_LEASE):
+                print(f"[ERRO] Nicho '{grupo['nicho']}': reserva perdida no meio da gravação.")
+                return total, False
+            total += _inserir_lote(db, periodo, lote, usuarios_lote)
+            lote, usuarios_lote = [], []
+    return total, True
+
+
+# =========================
+# Banco fora do event loop
+# =========================
+# Cada passo abre a PRÓPRIA sessão (Session não é segura entre tarefas) e
+# roda em thread (asyncio.to_thread): enquanto um nicho grava, as chamadas
+# ao modelo dos outros seguem no loop.
+
+def _reservar_nicho(periodo: str, item: str) -> bool:
+    db = SessionLocal()
+    try:
+        return bool(reservar_itens(db, JOB_CARDS, periodo, [item], CARDS_LEASE))
+    finally:
+        db.close()
 
+
+def _liberar_nicho(periodo: str, item: str, erro: str) -> None:
     db = SessionLocal()
+    try:
+        liberar_itens(db, JOB_CARDS, periodo, [item], erro=erro)
+    finally:
+        db.close()
+
 
+def _gravar_nicho(periodo: str, mes: str, grupo: dict, novidades: list, concluidos: set, agora: datetime, item: str):
+    """Distribui os cards do nicho e, se terminou, marca o nicho. Retorna (cards, terminou)."""
+    db = SessionLocal()
     try:
-        usuarios = db.query(Usuario).all()
+        cards, terminou = _distribuir_nicho(db, periodo, mes, grupo, novidades, concluidos, agora, item)
+        if terminou:
+            concluir_itens(db, JOB_CARDS, periodo, [item])
+        return cards, terminou
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
-        hoje = datetime.now()
-        # 👉 Mês atual no formato YYYY-MM
-        mes = hoje.strftime("%Y-%m")
 
-        print("=======================================")
-        print(f"🗓  Gerando cards automáticos para o mês: {mes}")
-        print("=======================================")
+async def _processar_nichos(periodo: str, mes: str, grupos: dict, pendentes: list, concluidos: set, estado: dict):
+    """
+    Um nicho por vez por vaga (no máximo CARDS_CONCORRENCIA em paralelo):
+    reserva (lease) logo antes de gerar, renova antes de cada gravação e
+    marca o checkpoint. Nicho reservado por outra instância fica com ela.
+    Só a chamada ao modelo roda no loop; o banco vai para threads.
+    """
+    agora = datetime.now()
+    semaforo = asyncio.Semaphore(CARDS_CONCORRENCIA)
+
+    async def processar(chave: str):
+        item = f"nicho:{chave}"
+        nicho = grupos[chave]["nicho"]
+        async with semaforo:
+            # a lease cobre só esta chamada + a gravação deste nicho
+            if not await asyncio.to_thread(_reservar_nicho, periodo, item):
+                estado["outra_instancia"] += 1
+                return
+            estado["em_maos"].add(item)
+
+            inicio = time.perf_counter()
+            try:
+                novidades = await buscar_novidades_do_nicho_async(nicho, mes)
+            except Exception as e:
+                print(f"[ERRO] Nicho '{nicho}': {e}")
+                novidades = []
+            estado["gerados"][chave] = (novidades, time.perf_counter() - inicio)
 
-        for user in usuarios:
-            if not getattr(user, "empresa", None) or not getattr(
-                user.empresa, "nicho", None
-            ):
-                print(
-                    f"- Usuário {user.id} sem empresa ou nicho configurado. Pulando..."
+            if not novidades:
+                print(f"⚠️ Nenhum card retornado pelo GPT para o nicho '{nicho}'.")
+                await asyncio.to_thread(_liberar_nicho, periodo, item, "sem cards")
+            else:
+                cards, terminou = await asyncio.to_thread(
+                    _gravar_nicho, periodo, mes, grupos[chave], novidades, concluidos, agora, item
                 )
-                continue
+                estado["total_cards"] += cards
+                if not terminou:
+                    estado["outra_instancia"] += 1
+            estado["em_maos"].discard(item)
 
-            nicho = user.empresa.nicho
-            print(f"\n👤 Usuário {user.id} | Nicho: {nicho}")
+    inicio = time.perf_counter()
+    try:
+        await asyncio.gather(*(processar(chave) for chave in pendentes))
+    finally:
+        # o cliente HTTP é deste loop; asyncio.run de amanhã cria outro
+        await fechar_cliente_async()
+    estado["t_geracao"] = time.perf_counter() - inicio
+
+
+def _percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+def _relatorio(mes: str, grupos: dict, gerados: dict, total_cards: int, t_geracao: float, t_total: float):
+    latencias = [segundos for _cards, segundos in gerados.values()]
+    usuarios = sum(len(g["usuarios"]) for g in grupos.values())
+    sem_cards = sum(1 for cards, _s in gerados.values() if not cards)
+
+    print("\n📊 Relatório")
+    print(f"- Mês:                 {mes}")
+    print(f"- Usuários com nicho:  {usuarios}")
+    print(f"- Nichos (chamadas):   {len(grupos)} ({sem_cards} sem cards)")
+    print(f"- Cards criados:       {total_cards}")
+    print(f"- Geração + gravação:  {t_geracao:.1f}s (concorrência {CARDS_CONCORRENCIA})")
+    print(
+        f"- Latência por nicho:  p50 {_percentil(latencias, 0.5):.1f}s | "
+        f"p95 {_percentil(latencias, 0.95):.1f}s | máx {max(latencias, default=0):.1f}s"
+    )
+    print(f"- Tempo total:         {t_total:.1f}s ({(usuarios / t_total) if t_total else 0:.1f} usuários/s)")
 
-            novidades = buscar_novidades_do_nicho(nicho, mes)
 
-            if not novidades:
-                print(f"⚠️ Nenhum card retornado pelo GPT para o usuário {user.id}.")
-                continue
+def gerar_atualizacoes(desde_checkpoint: bool = False):
+    """
+    Agrupa os usuários pelo nicho (normalizado) da empresa, gera os cards UMA
+    vez por nicho+mês (em paralelo, com limite) e distribui para todos os
+    usuários do nicho, sem duplicar títulos no mesmo mês.
+
+    Progresso por nicho/usuário fica em progresso_jobs (período = dia):
+    rodar de novo no mesmo dia pula o que já foi feito, e várias instâncias
+    dividem os nichos por reserva. `desde_checkpoint=True` retoma a última
+    execução que não terminou (mesmo de um dia anterior).
+    """
 
-            novos_cards = 0
-
-            for card in novidades:
-                existe = (
-                    db.query(CardMarketing)
-                    .filter_by(
-                        usuario_id=user.id,
-                        titulo=card["titulo"],
-                        mes_referencia=mes,
-                    )
-                    .first()
-                )
+    db = SessionLocal()
+    inicio = time.perf_counter()
+    execucao = None
+    periodo = None
+    estado = {"gerados": {}, "total_cards": 0, "t_geracao": 0.0, "outra_instancia": 0, "em_maos": set()}
 
-                if existe:
-                    print(f"  • Já existe card com título: {card['titulo']}")
-                    continue
-
-                novo = CardMarketing(
-                    usuario_id=user.id,
-                    titulo=card["titulo"],
-                    descricao=card["descricao"],
-                    fonte=card["fonte"],
-                    ideias_conteudo=card["ideias_conteudo"],
-                    tipo=card["tipo"],
-                    mes_referencia=mes,
-                    favorito=False,
-                    eh_atualizacao=True,
-                    criado_em=datetime.now(),
-                    atualizado_em=datetime.now(),
-                )
-                db.add(novo)
-                novos_cards += 1
-                print(f"  ✅ Card criado: {card['titulo']}")
+    try:
+        periodo = date.today().isoformat()
+        if desde_checkpoint:
+            pendente = ultima_execucao_pendente(db, JOB_CARDS)
+            if pendente is None:
+                print("ℹ️ Nenhuma execução pendente para retomar.")
+                return
+            periodo = pendente.periodo
+        # 👉 Mês do período no formato YYYY-MM
+        mes = periodo[:7]
+
+        execucao = abrir_execucao(db, JOB_CARDS, periodo)
 
-            if novos_cards == 0:
-                print(f"ℹ️ Nenhum novo card foi criado para o usuário {user.id}.")
-            else:
-                print(f"🎉 Total de {novos_cards} novos cards para o usuário {user.id}.")
+        print("=======================================")
+        print(f"🗓  Gerando cards automáticos para o mês: {mes} (período {periodo})")
+        print("=======================================")
+
+        # cursor no servidor; só os ids ficam em memória (nos grupos)
+        grupos = _agrupar_por_nicho(iterar_usuarios_com_empresa(db))
 
+        ja_feitos = itens_concluidos(db, JOB_CARDS, periodo)
+        pendentes = [chave for chave in grupos if f"nicho:{chave}" not in ja_feitos]
+        if len(pendentes) < len(grupos):
+            print(f"⏭  {len(grupos) - len(pendentes)} nicho(s) já concluídos neste período.")
+
+        concluidos = itens_concluidos(db, JOB_CARDS, periodo)
+        # a sessão principal não segura conexão durante a geração
         db.commit()
+        asyncio.run(_processar_nichos(periodo, mes, grupos, pendentes, concluidos, estado))
+
         print("\n✅ Atualizações com IA finalizadas.\n")
+        processados = {chave: grupos[chave] for chave in estado["gerados"]}
+        _relatorio(mes, processados, estado["gerados"], estado["total_cards"], estado["t_geracao"], time.perf_counter() - inicio)
+        if estado["outra_instancia"]:
+            print(f"- Com outra instância: {estado['outra_instancia']} nicho(s)")
+
+        faltando = [c for c in grupos if f"nicho:{c}" not in itens_concluidos(db, JOB_CARDS, periodo)]
+        finalizar_execucao(db, execucao, "concluido" if not faltando else "parcial", {
+            "nichos": len(grupos),
+            "processados": len(processados),
+            "faltando": len(faltando),
+            "cards": estado["total_cards"],
+            "segundos": round(time.perf_counter() - inicio, 1),
+        })
 
     except Exception as e:
         db.rollback()
         print("❌ Erro geral ao gerar atualizações:", e)
+        # lotes já gravados ficam; nichos em andamento voltam para a fila
+        try:
+            liberar_itens(db, JOB_CARDS, periodo, estado["em_maos"], erro=str(e))
+            if execucao is not None:
+                finalizar_execucao(db, execucao, "falhou", {"erro": str(e)[:500], "cards": estado["total_cards"]})
+        except Exception as e2:
+            db.rollback()
+            print(f"[ERRO] Não foi possível registrar a falha da execução: {e2}")
 
     finally:
         db.close()
 
 
 if __name__ == "__main__":
-    gerar_atualizacoes()
+    parser = argparse.ArgumentParser(description="Gera os cards diários de marketing por nicho.")
+    parser.add_argument(
+        "--since-checkpoint",
+        action="store_true",
+        help="retoma a última execução que não terminou, pulando nichos/usuários já concluídos",
+    )
+    args = parser.parse_args()
+
+    gerar_atualizacoes(desde_checkpoint=args.since_checkpoint)
@@ -0,0 +1,114 @@
+# backend/comandos/gerar_sites_todos.py
+"""
+Regera o site de TODAS as empresas (ex.: depois de mudar
+templates_html/modelo_site_cliente.html).
+
+- Lê `empresas` em lotes por cursor no servidor (yield_per), sem carregar tudo.
+- Renderiza em um pool de processos; cada processo carrega o template
+  compilado uma vez (bytecode em data/cache_jinja, gerado aqui antes do pool).
+- Escrita atômica e incremental (mesma lógica do site_cliente: sites sem
+  mudança são pulados, a não ser com --forcar).
+
+Uso:
+    python backend/comandos/gerar_sites_todos.py [--workers 8] [--lote 500] [--forcar]
+"""
+import sys
+import os
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend.database import SessionLocal
+from backend.models import Empresa
+from backend.models.projecoes import perfil_empresa_site
+from backend.api.site_cliente import (
+    DadosSiteCliente,
+    montar_dados_render,
+    obter_template,
+    renderizar_site,
+)
+
+
+def _renderizar(item):
+    usuario_id, dados_render, forcar = item
+    try:
+        resultado = renderizar_site(dados_render, forcar=forcar)
+        return usuario_id, resultado["alterado"], None
+    except Exception as e:
+        return usuario_id, False, str(getattr(e, "detail", e))
+
+
+def _lotes(db, tamanho: int, forcar: bool):
+    """Gera listas de (usuario_id, dados_render, forcar) sem segurar o banco todo."""
+    consulta = (
+        db.query(Empresa)
+        .options(perfil_empresa_site())
+        .order_by(Empresa.id)
+        .execution_options(stream_results=True)
+        .yield_per(tamanho)
+    )
+    lote = []
+    for empresa in consulta:
+        if not empresa.slug:
+            print(f"[ERRO] usuario_id={empresa.usuario_id}: empresa sem slug (rode gerar_slugs_empresas.py)")
+            continue
+        dados = DadosSiteCliente(
+            usuario_id=empresa.usuario_id,
+            informacoes_adicionais=empresa.informacoes_adicionais,
+        )
+        lote.append((empresa.usuario_id, montar_dados_render(empresa, dados), forcar))
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def gerar_sites_todos(workers: int, tamanho_lote: int, forcar: bool = False):
+    # compila no processo pai: os filhos só leem o bytecode do disco
+    obter_template()
+
+    total = alterados = 0
+    falhas = []
+    inicio = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=obter_template) as pool:
+            for lote in _lotes(db, tamanho_lote, forcar):
+                for usuario_id, alterado, erro in pool.map(_renderizar, lote, chunksize=32):
+                    total += 1
+                    if erro:
+                        falhas.append((usuario_id, erro))
+                    elif alterado:
+                        alterados += 1
+                decorrido = time.perf_counter() - inicio
+                print(f"… {total} sites ({total / decorrido:.1f} sites/s)")
+    finally:
+        db.close()
+
+    decorrido = time.perf_counter() - inicio
+    print("\n📊 Relatório")
+    print(f"- Empresas processadas: {total}")
+    print(f"- Sites regravados:     {alterados}")
+    print(f"- Sem alteração:        {total - alterados - len(falhas)}")
+    print(f"- Falhas:               {len(falhas)}")
+    print(f"- Tempo:                {decorrido:.1f}s ({(total / decorrido) if decorrido else 0:.1f} sites/s)")
+    for usuario_id, erro in falhas[:20]:
+        print(f"  [ERRO] usuario_id={usuario_id}: {erro}")
+    if len(falhas) > 20:
+        print(f"  ... e mais {len(falhas) - 20} falhas")
+
+    return {"total": total, "alterados": alterados, "falhas": len(falhas), "segundos": decorrido}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regera o site de todas as empresas.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--lote", type=int, default=500)
+    parser.add_argument("--forcar", action="store_true", help="regrava mesmo sem mudança")
+    args = parser.parse_args()
+
+    gerar_sites_todos(args.workers, args.lote, args.forcar)
@@ -0,0 +1,49 @@
+import sys
+import os
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from sqlalchemy import text
+
+from backend.database import SessionLocal, engine
+from backend.models import Empresa, gerar_slug_empresa
+from backend.comandos.gerar_sites_todos import gerar_sites_todos
+
+
+def gerar_slugs_empresas(regerar_sites: bool = True, workers: int = 1):
+    """
+    Prepara bancos já existentes para a busca do chat público por slug:
+    cria a coluna/índice único (create_all não altera tabelas), preenche o
+    slug das empresas antigas e regera todos os sites, porque o chat público
+    só aceita o slug gravado e widgets antigos ainda mandam o nome da
+    empresa. Pode rodar mais de uma vez.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE empresas ADD COLUMN IF NOT EXISTS slug VARCHAR"))
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_empresas_slug ON empresas (slug)"))
+
+    db = SessionLocal()
+    try:
+        empresas = db.query(Empresa).filter(Empresa.slug.is_(None)).order_by(Empresa.id).all()
+        for empresa in empresas:
+            # flush a cada empresa: o próximo slug já enxerga os anteriores
+            empresa.slug = gerar_slug_empresa(db.connection(), empresa)
+            db.flush()
+        db.commit()
+        print(f"✅ Slugs gerados: {len(empresas)}")
+    finally:
+        db.close()
+
+    if regerar_sites:
+        # --forcar: todo widget passa a mandar o slug, mesmo sem outra mudança
+        gerar_sites_todos(workers, 500, forcar=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preenche empresas.slug e regera os sites com o slug.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--sem-sites", action="store_true", help="só preenche os slugs (rode gerar_sites_todos depois)")
+    args = parser.parse_args()
+
+    gerar_slugs_empresas(regerar_sites=not args.sem_sites, workers=args.workers)
@@ -7,7 +7,8 @@ from datetime import datetime
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
 from backend.database import engine
-from backend.models import CardMarketing, Usuario
+from backend.models import CardMarketing
+from backend.utils.lotes import iterar_em_lotes
 from sqlalchemy.orm import sessionmaker
 
 SessionLocal = sessionmaker(bind=engine)
@@ -16,22 +17,22 @@ def listar_cards(usuario_id: int, mes: str):
     db = SessionLocal()
     try:
         print(f"📋 Listando cards do usuário {usuario_id} para o mês {mes}...\n")
-        cards = (
-            db.query(CardMarketing)
+        consulta = (
+            db.query(CardMarketing.id, CardMarketing.titulo, CardMarketing.tipo, CardMarketing.favorito)
             .filter(
                 CardMarketing.usuario_id == usuario_id,
                 CardMarketing.mes_referencia == mes
             )
             .order_by(CardMarketing.criado_em.asc())
-            .all()
         )
 
-        if not cards:
-            print("⚠️ Nenhum card encontrado.")
-            return
-
-        for c in cards:
+        total = 0
+        for c in iterar_em_lotes(consulta):
+            total += 1
             print(f"- [{c.id}] {c.titulo} | tipo={c.tipo} | favorito={c.favorito}")
+
+        if not total:
+            print("⚠️ Nenhum card encontrado.")
     finally:
         db.close()
 
@@ -1,8 +1,18 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
 import os
+import time
+import uuid
+import logging
+import threading
+import traceback
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,10 +31,70 @@ engine = create_engine(
 # Sessão para ser usada nas rotas do FastAPI
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _async_database_url(url: str) -> str:
+    """
+    Converte a DATABASE_URL (psycopg2) para o driver assíncrono (asyncpg).
+    Aceita também ASYNC_DATABASE_URL já pronta no ambiente.
+    """
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    if url.startswith("postgresql+psycopg2://"):
+        url = "postgresql://" + url[len("postgresql+psycopg2://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    return url
+
+
+def _parametros_asyncpg(url: str) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Tira da URL os parâmetros da libpq que o asyncpg recusa na conexão
+    (URLs de Postgres gerenciado costumam vir com ?sslmode=require).
+    O sslmode vira connect_args={"ssl": ...}: o asyncpg aceita os mesmos
+    modos (disable, allow, prefer, require, verify-ca, verify-full).
+    """
+    url_obj = make_url(url)
+    if url_obj.get_backend_name() != "postgresql":
+        return url_obj, {}
+
+    connect_args: Dict[str, Any] = {}
+    sslmode = url_obj.query.get("sslmode")
+    if sslmode:
+        connect_args["ssl"] = sslmode if isinstance(sslmode, str) else sslmode[-1]
+    # channel_binding: só libpq; o asyncpg negocia o SCRAM sozinho
+    url_obj = url_obj.difference_update_query(["sslmode", "channel_binding"])
+    return url_obj, connect_args
+
+
+ASYNC_DATABASE_URL, _ASYNC_CONNECT_ARGS = _parametros_asyncpg(
+    os.getenv("ASYNC_DATABASE_URL") or _async_database_url(DATABASE_URL)
+)
+
+# Engine assíncrono para rotas `async def` (não bloqueia o event loop)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args=_ASYNC_CONNECT_ARGS,
+    pool_size=10,
+    max_overflow=20,
+    pool_timeout=30,
+    pool_pre_ping=True,
+)
+
+# expire_on_commit=False: os objetos continuam legíveis após o commit sem novo SELECT
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # Base para modelos ORM
 Base = declarative_base()
 
-# Dependência para injetar sessão no FastAPI
+# Dependência para injetar sessão no FastAPI.
+# O FastAPI reaproveita o resultado de Depends(get_db) dentro do mesmo request,
+# então get_current_user/get_usuario_logado e a rota compartilham UMA sessão,
+# que é fechada (e a conexão devolvida ao pool) ao final do request.
 def get_db():
     db = SessionLocal()
     try:
@@ -33,5 +103,92 @@ def get_db():
         db.close()
 
 
+# Dependência assíncrona (usar em rotas `async def`)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# =====================================================================
+# 🔎 Detector de vazamento de conexões do pool
+# ---------------------------------------------------------------------
+# Cada checkout do pool é marcado com o request atual e o ponto do código
+# que pegou a conexão. Ao final do request, qualquer conexão desse request
+# que ainda não voltou ao pool é registrada no log com a origem.
+# Desligue com DB_LEAK_DETECTOR=0.
+# =====================================================================
+logger = logging.getLogger("backend.database")
+
+DB_LEAK_DETECTOR = os.getenv("DB_LEAK_DETECTOR", "1").strip().lower() not in ("0", "false", "off", "")
+
+_request_atual: ContextVar[Optional[str]] = ContextVar("_request_atual", default=None)
+_conexoes_em_uso: Dict[int, Dict[str, Any]] = {}
+_conexoes_lock = threading.Lock()
+
+_RAIZ_BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+
+def _origem_checkout() -> str:
+    """Últimos frames do backend que levaram ao checkout (ignora SQLAlchemy/Starlette)."""
+    frames = [
+        f for f in traceback.extract_stack(limit=40)[:-2]
+        if f.filename.startswith(_RAIZ_BACKEND) and not f.filename.endswith("database.py")
+    ]
+    return "".join(traceback.format_list(frames[-3:])).rstrip() or "(origem fora do backend)"
+
+
+def _registrar_checkout(dbapi_conn, connection_record, connection_proxy) -> None:
+    with _conexoes_lock:
+        _conexoes_em_uso[id(connection_record)] = {
+            "request": _request_atual.get(),
+            "inicio": time.monotonic(),
+            "origem": _origem_checkout(),
+        }
+
+
+def _registrar_checkin(dbapi_conn, connection_record) -> None:
+    with _conexoes_lock:
+        _conexoes_em_uso.pop(id(connection_record), None)
+
+
+def conexoes_presas(request_id: str) -> list:
+    """Conexões que foram pegas durante `request_id` e ainda não voltaram ao pool."""
+    with _conexoes_lock:
+        return [dict(info) for info in _conexoes_em_uso.values() if info["request"] == request_id]
+
+
+if DB_LEAK_DETECTOR:
+    for _pool_engine in (engine, async_engine.sync_engine):
+        event.listen(_pool_engine, "checkout", _registrar_checkout)
+        event.listen(_pool_engine, "checkin", _registrar_checkin)
+
+
+class DetectorVazamentoConexoes:
+    """
+    Middleware ASGI: marca o request atual e, quando ele termina (inclusive
+    respostas em streaming), loga as conexões que continuaram fora do pool.
+    """
+
+    def __init__(self, app):
+        self.app = app
 
+    async def __call__(self, scope, receive, send):
+        if not DB_LEAK_DETECTOR or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
+        request_id = uuid.uuid4().hex
+        token = _request_atual.set(request_id)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_atual.reset(token)
+            agora = time.monotonic()
+            for info in conexoes_presas(request_id):
+                logger.warning(
+                    "[POOL] Conexão presa após o fim do request %s %s (%.1fs em uso). Origem:\n%s",
+                    scope.get("method"),
+                    scope.get("path"),
+                    agora - info["inicio"],
+                    info["origem"],
+                )
@@ -3,14 +3,15 @@
 import os
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
 
-from backend.database import Base, engine
+from backend.database import Base, engine, DetectorVazamentoConexoes
 from backend import models  # garante que os models sejam registrados (não remover)
+from backend.services.llm import cliente_async, metricas_llm, LLMIndisponivel
+from backend.services.cache_respostas import metricas_respostas
+from backend.services.sites_estaticos import SitesPrecomprimidos, AssetsCacheLongo, CABECALHOS_UPLOAD
 
 
 
@@ -26,6 +27,9 @@ if env_path.exists():
 
 DIR_SITES = RAIZ_PROJETO / "data" / "sites_gerados"
 DIR_SITES.mkdir(parents=True, exist_ok=True)
+DIR_ASSETS = RAIZ_PROJETO / "templates_html" / "assets"
+DIR_LOGOS = RAIZ_PROJETO / "data" / "logos"
+DIR_LOGOS.mkdir(parents=True, exist_ok=True)
 
 
 # ============================================
@@ -45,21 +49,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Loga conexões do pool que continuam presas após o fim do request
+app.add_middleware(DetectorVazamentoConexoes)
+
 
 # ============================================
 # 🔹 Servir arquivos estáticos
 # ============================================
-app.mount("/sites", StaticFiles(directory=str(DIR_SITES), html=True), name="sites")
+# .html com ETag forte (hash do conteúdo), 304 e .br/.gz gerados no build
+app.mount("/sites", SitesPrecomprimidos(directory=str(DIR_SITES), html=True), name="sites")
+# assets vendorizados do modelo de site, com Cache-Control longo
+app.mount("/assets", AssetsCacheLongo(directory=str(DIR_ASSETS), check_dir=False), name="assets")
+# logos endereçadas por conteúdo (services/logos.py): nunca mudam
+app.mount("/logos", AssetsCacheLongo(directory=str(DIR_LOGOS), max_age=31536000, imutavel=True, cabecalhos=CABECALHOS_UPLOAD), name="logos")
 
 
 # ============================================
-# 🔹 Cliente OPENAI (usado em mark_ia / chat_publico)
+# 🔹 Cliente OPENAI (compartilhado pelo gateway backend/services/llm.py)
 # ============================================
-def get_openai_client():
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
+async def get_openai_client():
+    # o cliente async é por event loop: pegar de dentro do loop do servidor
+    try:
+        return cliente_async()
+    except LLMIndisponivel:
         return None
-    return AsyncOpenAI(api_key=api_key)
 
 
 # ============================================
@@ -92,6 +105,7 @@ from backend.api import (  # noqa: E402
 
 from backend.api.ideias import router as ideias_router  # noqa: E402
 from backend.api.consultor_mensal import router as consultor_mensal_router  # noqa: E402
+from backend.api.auth import get_usuario_admin  # noqa: E402
 from backend.api.aplicativo import router as aplicativo_router  # noqa: E402
 from backend.api.planos import router as planos_router  # noqa: E402
 from backend.api.cupons import router as cupons_router  # noqa: E402
@@ -149,3 +163,13 @@ app.include_router(consultor_mensal_router)
 @app.get("/")
 def home():
     return {"mensagem": "MARK backend rodando!"}
+
+
+@app.get("/metricas/llm", dependencies=[Depends(get_usuario_admin)])
+def metricas_llm_endpoint():
+    return metricas_llm()
+
+
+@app.get("/metricas/respostas", dependencies=[Depends(get_usuario_admin)])
+def metricas_respostas_endpoint():
+    return metricas_respostas()
@@ -1,15 +1,23 @@
 from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, Boolean, ForeignKey, Numeric, JSON, DateTime
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.attributes import get_history
 from ..database import Base
 from .tokens import TokenAtivacao
 from .demo import CadastroDemo
 from .historico_mark import HistoricoMark
+from .memoria_mark import MemoriaMark
 from .marketing import CardMarketing
 from datetime import datetime
 from .ideias_mensais import IdeiasMensais
+from .ideias_card_estado import IdeiasCardEstado
 from .consultor_mensal import ConsultorMensal
+from .execucao_job import ExecucaoJob, ProgressoJob
+from .job_site import JobSite as JobSiteStatus
 from .cupom import CupomDesconto
 from backend.models.senha_reset import SenhaResetToken
+from backend.utils.slug import slug_nome
 
 class Diagnostico(Base):
     __tablename__ = "diagnosticos"
@@ -65,10 +73,62 @@ class Empresa(Base):
     redes_sociais = Column(JSON)
     informacoes_adicionais = Column(Text)
     atualizado_em = Column(TIMESTAMP)
+    # 🔗 Identificador público (site e chat público): único e indexado
+    slug = Column(String, unique=True, index=True, nullable=True)
 
     usuario = relationship("Usuario", back_populates="empresa")
 
 
+def gerar_slug_empresa(connection, empresa: "Empresa") -> str:
+    """
+    Slug a partir do nome (mesma regra do nome do arquivo do site).
+    Em caso de nome repetido, acrescenta _2, _3...
+    """
+    base = slug_nome(empresa.nome_empresa or "")
+    tabela = Empresa.__table__
+    consulta = select(tabela.c.slug).where(tabela.c.slug.like(f"{base}%"))
+    if empresa.id is not None:
+        consulta = consulta.where(tabela.c.id != empresa.id)
+    ocupados = set(connection.execute(consulta).scalars())
+    candidato, n = base, 2
+    while candidato in ocupados:
+        candidato = f"{base}_{n}"
+        n += 1
+    return candidato
+
+
+# Gravações concorrentes com o mesmo nome calculam o mesmo slug; a perdedora
+# bate no índice único e é refeita (o slug novo já enxerga o da outra)
+TENTATIVAS_SLUG = 3
+
+
+def salvar_com_slug_unico(db, aplicar):
+    """
+    Roda `aplicar()` (busca/cria a Empresa e aplica as mudanças na sessão) e
+    faz commit. Se o commit falhar no índice único do slug, desfaz e repete
+    `aplicar()` + commit, até TENTATIVAS_SLUG vezes. Retorna o que `aplicar`
+    retornou na tentativa que gravou.
+    """
+    for tentativa in range(1, TENTATIVAS_SLUG + 1):
+        resultado = aplicar()
+        try:
+            db.commit()
+            return resultado
+        except IntegrityError as e:
+            db.rollback()
+            if tentativa == TENTATIVAS_SLUG or "slug" not in str(e.orig):
+                raise
+            print(f"[AVISO] Slug em uso por outra gravação simultânea; tentativa {tentativa + 1}.")
+
+
+@event.listens_for(Empresa, "before_insert")
+@event.listens_for(Empresa, "before_update")
+def _preencher_slug(mapper, connection, target: "Empresa") -> None:
+    if target.slug and not get_history(target, "nome_empresa").added:
+        return
+    target.slug = gerar_slug_empresa(connection, target)
+
+
 class Arquivo(Base):
     __tablename__ = "arquivos"
 
@@ -1,5 +1,5 @@
 # backend/models/consultor_mensal.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -22,3 +22,12 @@ class ConsultorMensal(Base):
     # se você já tem relationship em Usuario/Empresa, ok.
     # usuario = relationship("Usuario")
     # empresa = relationship("Empresa")
+
+    # um pacote por usuário+empresa+mês (as rotas tratam o IntegrityError dele);
+    # o INSERT ... ON CONFLICT da pré-geração mensal depende dele. Bancos
+    # criados antes dele NÃO o ganham pelo create_all (não altera tabela que
+    # já existe): rode antes backend/comandos/deduplicar_consultor_mensal.py,
+    # que remove as duplicatas e cria o índice
+    __table_args__ = (
+        UniqueConstraint("usuario_id", "empresa_id", "mes_ano", name="uq_consultor_mensal"),
+    )
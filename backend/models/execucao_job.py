@@ -0,0 +1,55 @@
+# backend/models/execucao_job.py
+
+from sqlalchemy import Column, Integer, String, DateTime, JSON, UniqueConstraint, Index
+from datetime import datetime
+
+from backend.database import Base
+
+
+class ExecucaoJob(Base):
+    """
+    Uma execução de job agendado (ex.: cards diários de um dia).
+    `periodo` identifica o trabalho: rodar de novo no mesmo período retoma
+    de onde parou (ver ProgressoJob).
+    """
+    __tablename__ = "execucoes_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job = Column(String, nullable=False)
+    periodo = Column(String, nullable=False)  # ex.: "2025-12-01"
+    dono = Column(String, nullable=True)  # host:pid da instância que abriu
+    status = Column(String, nullable=False, default="em_andamento")  # em_andamento | concluido | falhou
+    resumo = Column(JSON, nullable=True)
+
+    iniciado_em = Column(DateTime, default=datetime.utcnow)
+    finalizado_em = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_execucoes_jobs_job_periodo", "job", "periodo"),
+    )
+
+
+class ProgressoJob(Base):
+    """
+    Checkpoint de um item (nicho, usuário...) dentro de job+período.
+    `dono` + `lease_ate` = reserva: outra instância só pega o item depois
+    que a reserva vence.
+    """
+    __tablename__ = "progresso_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job = Column(String, nullable=False)
+    periodo = Column(String, nullable=False)
+    item = Column(String, nullable=False)  # ex.: "nicho:pet shop", "usuario:42"
+
+    status = Column(String, nullable=False, default="em_andamento")  # em_andamento | concluido | falhou
+    dono = Column(String, nullable=True)
+    lease_ate = Column(DateTime, nullable=True)
+    tentativas = Column(Integer, nullable=False, default=0)
+    detalhe = Column(String, nullable=True)
+
+    atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("job", "periodo", "item", name="uq_progresso_job_item"),
+    )
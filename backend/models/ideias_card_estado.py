@@ -0,0 +1,29 @@
+# backend/models/ideias_card_estado.py
+
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, UniqueConstraint
+from datetime import datetime
+
+from backend.database import Base
+
+
+class IdeiasCardEstado(Base):
+    """
+    Estado de UM card da Central de Ideias (favorito + lotes extras).
+    O pacote em IdeiasMensais.conteudo fica imutável depois de gerado;
+    favoritar / gerar-mais gravam só aqui (linha pequena, por card).
+    """
+    __tablename__ = "ideias_card_estado"
+
+    id = Column(Integer, primary_key=True, index=True)
+    ideias_id = Column(Integer, ForeignKey("ideias_mensais.id", ondelete="CASCADE"), nullable=False)
+    card_id = Column(String, nullable=False)
+
+    favorito = Column(Boolean, nullable=True)  # None = usa o valor do pacote
+    conteudos_extra = Column(JSON, nullable=False, default=list)  # lotes além dos do pacote
+    branding_extra = Column(JSON, nullable=False, default=list)
+
+    atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("ideias_id", "card_id", name="uq_ideias_card"),
+    )
@@ -0,0 +1,27 @@
+# backend/models/job_site.py
+
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Float
+from datetime import datetime
+
+from backend.database import Base
+
+
+class JobSite(Base):
+    """
+    Status dos jobs da fila de sites (services/fila_sites.py).
+    A fila roda no worker que recebeu o save; o status fica no banco para
+    GET /site_cliente/status/{job_id} responder em qualquer worker.
+    """
+    __tablename__ = "jobs_sites"
+
+    id = Column(String, primary_key=True)  # uuid hex
+    usuario_id = Column(Integer, nullable=False, index=True)
+    estado = Column(String, nullable=False, default="na_fila")  # na_fila | executando | concluido | erro
+    coalescidos = Column(Integer, nullable=False, default=0)
+    fila_ms = Column(Float, nullable=True)
+    execucao_ms = Column(Float, nullable=True)
+    resultado = Column(JSON, nullable=True)
+    erro = Column(String, nullable=True)
+
+    criado_em = Column(DateTime, default=datetime.utcnow, index=True)
+    atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, TIMESTAMP, UniqueConstraint
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import relationship
 from backend.database import Base
 from datetime import datetime
@@ -20,3 +21,19 @@ class CardMarketing(Base):
     atualizado_em = Column(TIMESTAMP, default=datetime.utcnow)
 
     usuario = relationship("Usuario", backref="cards_marketing")
+
+    # Um título por usuário/mês (o job diário insere com ON CONFLICT DO NOTHING)
+    __table_args__ = (
+        UniqueConstraint("usuario_id", "mes_referencia", "titulo", name="uq_card_usuario_mes_titulo"),
+    )
+
+
+def stmt_inserir_cards(linhas):
+    """
+    INSERT multi-VALUES de cards que ignora título já existente no mesmo
+    usuário/mês (uq_card_usuario_mes_titulo). Use em todo lugar que cria cards.
+    Banco antigo (sem o índice): rode antes comandos/deduplicar_cards_marketing.py.
+    """
+    return insert(CardMarketing).values(linhas).on_conflict_do_nothing(
+        index_elements=["usuario_id", "mes_referencia", "titulo"]
+    )
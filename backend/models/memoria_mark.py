@@ -0,0 +1,25 @@
+# backend/models/memoria_mark.py
+
+from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, Index
+from datetime import datetime
+
+from backend.database import Base
+
+
+class MemoriaMark(Base):
+    """
+    Memória de conversa do MARK por usuário (substitui memory/mark.json).
+    Cada linha é um turno (pergunta + resposta). Só INSERT: append O(1),
+    e "últimos N turnos" é uma leitura pelo índice (usuario_id, id).
+    """
+    __tablename__ = "memoria_mark"
+
+    id = Column(Integer, primary_key=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    pergunta = Column(Text, nullable=False)
+    resposta = Column(Text, nullable=False)
+    criado_em = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_memoria_mark_usuario_id_id", "usuario_id", "id"),
+    )
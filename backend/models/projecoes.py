@@ -0,0 +1,97 @@
+# backend/models/projecoes.py
+"""
+Perfis de carga (load_only) para Empresa e Usuario.
+
+`funcionarios`, `produtos`, `redes_sociais` (JSON), `descricao`/
+`informacoes_adicionais` (Text) e `logo_url` (às vezes base64 legado) são as
+colunas pesadas. Cada perfil traz só o que a tela/rotina usa; o resto fica
+de fora do SELECT.
+
+Atenção: acessar uma coluna fora do perfil dispara um SELECT extra
+(e em AsyncSession dá erro). Use o perfil que cobre o que você lê.
+
+Uso:
+    db.query(Empresa).options(perfil_empresa_slim()).filter(...)
+    select(Empresa).options(perfil_empresa_mark()).where(...)
+"""
+from sqlalchemy.orm import load_only
+
+from backend.models import Empresa, Usuario
+
+# id/nome/nicho: seleção de empresa, listas, cabeçalhos
+EMPRESA_SLIM = (
+    Empresa.id,
+    Empresa.usuario_id,
+    Empresa.nome_empresa,
+    Empresa.nicho,
+    Empresa.slug,
+)
+
+# contexto do MARK: tudo menos a logo
+EMPRESA_MARK = EMPRESA_SLIM + (
+    Empresa.descricao,
+    Empresa.funcionarios,
+    Empresa.produtos,
+    Empresa.redes_sociais,
+    Empresa.informacoes_adicionais,
+    Empresa.cnpj,
+    Empresa.rua,
+    Empresa.numero,
+    Empresa.bairro,
+    Empresa.cidade,
+    Empresa.cep,
+    Empresa.atualizado_em,
+)
+
+# render do site (site_cliente.montar_dados_render): sem as colunas JSON
+EMPRESA_SITE = EMPRESA_SLIM + (
+    Empresa.descricao,
+    Empresa.logo_url,
+    Empresa.informacoes_adicionais,
+    Empresa.cnpj,
+    Empresa.rua,
+    Empresa.numero,
+    Empresa.bairro,
+    Empresa.cidade,
+    Empresa.cep,
+)
+
+# atendente do chat público (chat_publico.montar_contexto)
+EMPRESA_CHAT_PUBLICO = EMPRESA_SLIM + (
+    Empresa.descricao,
+    Empresa.rua,
+    Empresa.numero,
+    Empresa.bairro,
+    Empresa.cidade,
+)
+
+# listagens de usuário: sem senha_hash e sem respostas_saude (JSON)
+USUARIO_SLIM = (
+    Usuario.id,
+    Usuario.nome,
+    Usuario.email,
+    Usuario.tipo_usuario,
+    Usuario.plano_atual,
+    Usuario.plano_expira_em,
+    Usuario.data_criacao,
+)
+
+
+def perfil_empresa_slim():
+    return load_only(*EMPRESA_SLIM)
+
+
+def perfil_empresa_mark():
+    return load_only(*EMPRESA_MARK)
+
+
+def perfil_empresa_site():
+    return load_only(*EMPRESA_SITE)
+
+
+def perfil_empresa_chat_publico():
+    return load_only(*EMPRESA_CHAT_PUBLICO)
+
+
+def perfil_usuario_slim():
+    return load_only(*USUARIO_SLIM)
@@ -0,0 +1,216 @@
+# backend/services/cache_respostas.py
+"""
+Cache de respostas por empresa (chat público dos sites e MARK simples).
+
+Visitantes repetem as mesmas perguntas ("horário?", "onde fica?", "whatsapp?")
+milhares de vezes. Antes de chamar o modelo procuramos uma resposta já dada
+para a MESMA empresa:
+
+1. exato:     pergunta normalizada (minúsculas, sem acento/pontuação/espaços extras)
+2. semântico: opcional (CACHE_RESPOSTAS_SEMANTICO=1 + sentence-transformers
+              instalado). Embedding local da pergunta e similaridade de cosseno
+              >= CACHE_RESPOSTAS_SIMILARIDADE contra as perguntas já respondidas.
+
+O escopo da empresa leva a versão do contexto (hash do perfil usado no
+prompt): quando o perfil muda — por este worker, outro worker, script ou
+agendador — o contexto relido do banco (chat_publico, TTL de minutos) gera
+outro escopo e as respostas antigas deixam de ser usadas. Alterações feitas
+pelo ORM neste processo ainda descartam o cache na hora (mapper events).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from backend.models import Empresa
+
+CACHE_RESPOSTAS_TTL = float(os.getenv("CACHE_RESPOSTAS_TTL", "21600"))  # 6 h
+CACHE_RESPOSTAS_MAX_POR_EMPRESA = int(os.getenv("CACHE_RESPOSTAS_MAX_POR_EMPRESA", "256"))
+CACHE_RESPOSTAS_MAX_EMPRESAS = int(os.getenv("CACHE_RESPOSTAS_MAX_EMPRESAS", "2000"))
+CACHE_RESPOSTAS_SEMANTICO = os.getenv("CACHE_RESPOSTAS_SEMANTICO", "0") == "1"
+CACHE_RESPOSTAS_MODELO_EMBED = os.getenv(
+    "CACHE_RESPOSTAS_MODELO_EMBED", "paraphrase-multilingual-MiniLM-L12-v2"
+)
+CACHE_RESPOSTAS_SIMILARIDADE = float(os.getenv("CACHE_RESPOSTAS_SIMILARIDADE", "0.92"))
+
+# escopo -> (pergunta normalizada -> (expira, resposta, embedding))
+_cache: "OrderedDict[str, OrderedDict[str, Tuple[float, str, Any]]]" = OrderedDict()
+_lock = threading.Lock()
+
+_metricas: Dict[str, int] = {
+    "consultas": 0,
+    "acertos_exatos": 0,
+    "acertos_semanticos": 0,
+    "gravacoes": 0,
+    "invalidacoes": 0,
+}
+
+_modelo_embed = None
+_modelo_embed_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------
+# Normalização / escopo
+# ---------------------------------------------------------------------
+def normalizar_pergunta(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    texto = "".join(ch for ch in texto if not unicodedata.combining(ch))
+    texto = re.sub(r"[^a-z0-9 ]+", " ", texto)
+    return " ".join(texto.split())
+
+
+def escopo_empresa(empresa_id: int, contexto: str = "") -> str:
+    """`empresa:<id>@<versão do contexto>`: perfil novo => escopo novo."""
+    versao = hashlib.blake2b(contexto.encode("utf-8"), digest_size=6).hexdigest()
+    return f"empresa:{empresa_id}@{versao}"
+
+
+def _base_escopo(escopo: str) -> str:
+    return escopo.split("@", 1)[0]
+
+
+# ---------------------------------------------------------------------
+# Embeddings (opcional)
+# ---------------------------------------------------------------------
+def _carregar_modelo_embed():
+    global _modelo_embed, CACHE_RESPOSTAS_SEMANTICO
+    if _modelo_embed is not None or not CACHE_RESPOSTAS_SEMANTICO:
+        return _modelo_embed
+    with _modelo_embed_lock:
+        if _modelo_embed is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+
+                _modelo_embed = SentenceTransformer(CACHE_RESPOSTAS_MODELO_EMBED)
+            except Exception as e:
+                print(f"[ERRO CACHE RESPOSTAS] Busca semântica desativada: {e}")
+                CACHE_RESPOSTAS_SEMANTICO = False
+    return _modelo_embed
+
+
+def _embedding(texto: str):
+    modelo = _carregar_modelo_embed()
+    if modelo is None:
+        return None
+    return modelo.encode(texto, normalize_embeddings=True)
+
+
+# ---------------------------------------------------------------------
+# Leitura / gravação
+# ---------------------------------------------------------------------
+def _entradas_validas(escopo: str) -> List[Tuple[str, str, Any]]:
+    agora = time.monotonic()
+    entradas = _cache.get(escopo)
+    if not entradas:
+        return []
+    for chave in [c for c, (expira, _, _) in entradas.items() if expira <= agora]:
+        entradas.pop(chave, None)
+    return [(chave, resposta, vetor) for chave, (_, resposta, vetor) in entradas.items()]
+
+
+def _buscar_exato(escopo: str, chave: str) -> Optional[str]:
+    with _lock:
+        _metricas["consultas"] += 1
+        entradas = _cache.get(escopo)
+        if not entradas or chave not in entradas:
+            return None
+        expira, resposta, _ = entradas[chave]
+        if expira <= time.monotonic():
+            entradas.pop(chave, None)
+            return None
+        entradas.move_to_end(chave)
+        _cache.move_to_end(escopo)
+        _metricas["acertos_exatos"] += 1
+        return resposta
+
+
+def _buscar_semantico(escopo: str, vetor) -> Optional[str]:
+    with _lock:
+        candidatos = [(r, v) for _, r, v in _entradas_validas(escopo) if v is not None]
+    melhor, melhor_score = None, CACHE_RESPOSTAS_SIMILARIDADE
+    for resposta, outro in candidatos:
+        score = float(vetor @ outro)
+        if score >= melhor_score:
+            melhor, melhor_score = resposta, score
+    if melhor is not None:
+        with _lock:
+            _metricas["acertos_semanticos"] += 1
+    return melhor
+
+
+async def buscar_resposta(escopo: str, pergunta: str) -> Optional[str]:
+    chave = normalizar_pergunta(pergunta)
+    if not chave:
+        return None
+
+    resposta = _buscar_exato(escopo, chave)
+    if resposta is not None or not CACHE_RESPOSTAS_SEMANTICO:
+        return resposta
+
+    vetor = await asyncio.to_thread(_embedding, chave)
+    if vetor is None:
+        return None
+    return _buscar_semantico(escopo, vetor)
+
+
+async def guardar_resposta(escopo: str, pergunta: str, resposta: str) -> None:
+    chave = normalizar_pergunta(pergunta)
+    if not chave or not (resposta or "").strip():
+        return
+
+    vetor = None
+    if CACHE_RESPOSTAS_SEMANTICO:
+        vetor = await asyncio.to_thread(_embedding, chave)
+
+    with _lock:
+        entradas = _cache.get(escopo)
+        if entradas is None:
+            # versão nova do contexto: as anteriores da mesma empresa não servem mais
+            base = _base_escopo(escopo)
+            for antigo in [e for e in _cache if e != escopo and _base_escopo(e) == base]:
+                _cache.pop(antigo, None)
+            entradas = _cache.setdefault(escopo, OrderedDict())
+        entradas[chave] = (time.monotonic() + CACHE_RESPOSTAS_TTL, resposta, vetor)
+        entradas.move_to_end(chave)
+        while len(entradas) > CACHE_RESPOSTAS_MAX_POR_EMPRESA:
+            entradas.popitem(last=False)
+        _cache.move_to_end(escopo)
+        while len(_cache) > CACHE_RESPOSTAS_MAX_EMPRESAS:
+            _cache.popitem(last=False)
+        _metricas["gravacoes"] += 1
+
+
+def invalidar_respostas(escopo: str) -> None:
+    """Descarta o escopo (todas as versões, se for de empresa)."""
+    base = _base_escopo(escopo)
+    with _lock:
+        for chave in [e for e in _cache if _base_escopo(e) == base]:
+            _cache.pop(chave, None)
+            _metricas["invalidacoes"] += 1
+
+
+def metricas_respostas() -> Dict[str, Any]:
+    with _lock:
+        dados: Dict[str, Any] = dict(_metricas)
+        dados["escopos"] = len(_cache)
+        dados["entradas"] = sum(len(e) for e in _cache.values())
+    acertos = dados["acertos_exatos"] + dados["acertos_semanticos"]
+    dados["chamadas_llm_evitadas"] = acertos
+    dados["taxa_acerto"] = round(acertos / dados["consultas"], 4) if dados["consultas"] else 0.0
+    dados["semantico_ativo"] = CACHE_RESPOSTAS_SEMANTICO
+    return dados
+
+
+@event.listens_for(Empresa, "after_update")
+@event.listens_for(Empresa, "after_delete")
+def _invalidar_ao_gravar(mapper, connection, target: Empresa) -> None:
+    invalidar_respostas(f"empresa:{target.id}")
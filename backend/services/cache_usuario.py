@@ -0,0 +1,106 @@
+# backend/services/cache_usuario.py
+"""
+Cache curto (em memória, por processo) do usuário autenticado.
+
+get_current_user / get_usuario_logado rodam em TODO request autenticado.
+Em vez de um SELECT (e às vezes UPDATE+COMMIT) por request, guardamos um
+snapshot das colunas de `Usuario` por alguns segundos, chaveado pelo `sub`
+do JWT, e reanexamos o objeto à sessão do request sem ir ao banco.
+
+- Qualquer UPDATE/DELETE em `usuarios` feito pelo ORM (webhook de pagamento,
+  /conta/me, planos, cupons...) invalida a entrada na hora (mapper events).
+- Planos vencidos são rebaixados só EM MEMÓRIA no caminho de leitura; quem
+  grava "Gratuito" no banco é a varredura agendada (tarefas/rebaixar_planos.py).
+- Com vários workers, cada um tem o seu cache: o TTL limita a defasagem.
+"""
+from __future__ import annotations
+
+import copy
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from backend.models import Usuario
+
+CACHE_USUARIO_TTL = float(os.getenv("CACHE_USUARIO_TTL", "30"))  # segundos
+
+_cache: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+_lock = threading.Lock()
+
+_COLUNAS = [attr.key for attr in inspect(Usuario).mapper.column_attrs]
+
+
+def plano_expirado(tipo_usuario: Optional[str], plano_expira_em: Optional[datetime]) -> bool:
+    return (
+        tipo_usuario != "admin"
+        and plano_expira_em is not None
+        and datetime.utcnow() > plano_expira_em
+    )
+
+
+def invalidar_usuario(usuario_id: Optional[int]) -> None:
+    if usuario_id is None:
+        return
+    with _lock:
+        _cache.pop(int(usuario_id), None)
+
+
+def limpar_cache_usuarios() -> None:
+    with _lock:
+        _cache.clear()
+
+
+def _guardar(usuario: Usuario) -> None:
+    snapshot = {chave: getattr(usuario, chave) for chave in _COLUNAS}
+    with _lock:
+        _cache[usuario.id] = (time.monotonic() + CACHE_USUARIO_TTL, copy.deepcopy(snapshot))
+
+
+def _ler(usuario_id: int) -> Optional[Dict[str, Any]]:
+    with _lock:
+        item = _cache.get(usuario_id)
+        if not item:
+            return None
+        expira, snapshot = item
+        if expira <= time.monotonic():
+            _cache.pop(usuario_id, None)
+            return None
+        # cópia: o objeto do request pode mexer em colunas JSON sem afetar o cache
+        return copy.deepcopy(snapshot)
+
+
+def obter_usuario(db: Session, usuario_id: int) -> Optional[Usuario]:
+    """
+    Retorna o `Usuario` anexado à sessão `db` (pronto para lazy-load de
+    relacionamentos e para updates normais), usando o cache quando possível.
+    O plano vencido já vem como "Gratuito", sem escrita no banco.
+    """
+    snapshot = _ler(usuario_id)
+
+    if snapshot is None:
+        usuario = db.get(Usuario, usuario_id)
+        if not usuario:
+            return None
+        _guardar(usuario)
+    else:
+        usuario = Usuario(**snapshot)
+        make_transient_to_detached(usuario)
+        usuario = db.merge(usuario, load=False)
+
+    if plano_expirado(usuario.tipo_usuario, usuario.plano_expira_em):
+        # valor "commitado": não marca o objeto como sujo, não gera UPDATE
+        set_committed_value(usuario, "plano_atual", "Gratuito")
+
+    return usuario
+
+
+@event.listens_for(Usuario, "after_update")
+@event.listens_for(Usuario, "after_delete")
+def _invalidar_ao_gravar(mapper, connection, target: Usuario) -> None:
+    invalidar_usuario(target.id)
@@ -0,0 +1,189 @@
+# backend/services/checkpoints.py
+"""
+Checkpoints e reservas (lease) para jobs agendados em lote.
+
+Cada job trabalha em (job, periodo) e divide o trabalho em itens
+("nicho:pet shop", "usuario:42"...). Em `progresso_jobs`:
+- item `concluido` não é refeito quando o job roda de novo no mesmo período;
+- item `em_andamento` tem dono + lease_ate: outra instância só o pega depois
+  que a reserva vence (instância que caiu não trava o item para sempre).
+
+A reserva é um único INSERT ... ON CONFLICT DO UPDATE ... WHERE ... RETURNING:
+o banco decide quem ganhou, sem SELECT + UPDATE separados.
+"""
+from __future__ import annotations
+
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from backend.models import ExecucaoJob, ProgressoJob
+
+# Identifica esta instância nas reservas (dá para fixar via env em containers)
+ID_INSTANCIA = os.getenv("INSTANCIA_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ---------------------------------------------------------------------
+# Execuções
+# ---------------------------------------------------------------------
+def abrir_execucao(db: Session, job: str, periodo: str) -> ExecucaoJob:
+    execucao = ExecucaoJob(job=job, periodo=periodo, dono=ID_INSTANCIA, status="em_andamento")
+    db.add(execucao)
+    db.commit()
+    db.refresh(execucao)
+    return execucao
+
+
+def finalizar_execucao(db: Session, execucao: ExecucaoJob, status: str, resumo: Optional[dict] = None) -> None:
+    execucao.status = status
+    execucao.resumo = resumo
+    execucao.finalizado_em = datetime.utcnow()
+    db.commit()
+
+
+def ultima_execucao_pendente(db: Session, job: str) -> Optional[ExecucaoJob]:
+    """Execução mais recente do job que não terminou como `concluido`."""
+    ultima = (
+        db.query(ExecucaoJob)
+        .filter(ExecucaoJob.job == job)
+        .order_by(ExecucaoJob.iniciado_em.desc())
+        .first()
+    )
+    if ultima is None or ultima.status == "concluido":
+        return None
+    return ultima
+
+
+# ---------------------------------------------------------------------
+# Itens
+# ---------------------------------------------------------------------
+def itens_concluidos(db: Session, job: str, periodo: str) -> Set[str]:
+    linhas = db.query(ProgressoJob.item).filter(
+        ProgressoJob.job == job,
+        ProgressoJob.periodo == periodo,
+        ProgressoJob.status == "concluido",
+    )
+    return {item for (item,) in linhas}
+
+
+def reservar_itens(db: Session, job: str, periodo: str, itens: Iterable[str], lease_segundos: int) -> List[str]:
+    """
+    Tenta reservar `itens` para esta instância. Devolve só os que ficaram
+    com ela (não concluídos e sem reserva válida de outra instância).
+    """
+    itens = list(itens)
+    if not itens:
+        return []
+
+    agora = datetime.utcnow()
+    lease_ate = agora + timedelta(seconds=lease_segundos)
+    stmt = insert(ProgressoJob).values([
+        {
+            "job": job,
+            "periodo": periodo,
+            "item": item,
+            "status": "em_andamento",
+            "dono": ID_INSTANCIA,
+            "lease_ate": lease_ate,
+            "tentativas": 1,
+            "atualizado_em": agora,
+        }
+        for item in itens
+    ])
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_progresso_job_item",
+        set_={
+            "status": "em_andamento",
+            "dono": ID_INSTANCIA,
+            "lease_ate": lease_ate,
+            "tentativas": ProgressoJob.tentativas + 1,
+            "atualizado_em": agora,
+        },
+        where=and_(
+            ProgressoJob.status != "concluido",
+            or_(
+                ProgressoJob.lease_ate.is_(None),
+                ProgressoJob.lease_ate < agora,
+                ProgressoJob.dono == ID_INSTANCIA,
+            ),
+        ),
+    ).returning(ProgressoJob.item)
+
+    reservados = [item for (item,) in db.execute(stmt)]
+    db.commit()
+    return reservados
+
+
+def renovar_lease(db: Session, job: str, periodo: str, item: str, lease_segundos: int) -> bool:
+    """
+    Estende a reserva de `item` desta instância. False = o item não é mais
+    nosso (outra instância pegou depois que a lease venceu) ou já foi concluído.
+    """
+    agora = datetime.utcnow()
+    renovados = db.query(ProgressoJob).filter(
+        ProgressoJob.job == job,
+        ProgressoJob.periodo == periodo,
+        ProgressoJob.item == item,
+        ProgressoJob.dono == ID_INSTANCIA,
+        ProgressoJob.status == "em_andamento",
+    ).update(
+        {"lease_ate": agora + timedelta(seconds=lease_segundos), "atualizado_em": agora},
+        synchronize_session=False,
+    )
+    db.commit()
+    return renovados > 0
+
+
+def concluir_itens(db: Session, job: str, periodo: str, itens: Iterable[str], commit: bool = True) -> None:
+    """
+    Marca itens como concluídos (cria a linha se não existir). Com
+    commit=False entra na mesma transação do trabalho do item.
+    """
+    itens = list(itens)
+    if not itens:
+        return
+
+    agora = datetime.utcnow()
+    stmt = insert(ProgressoJob).values([
+        {
+            "job": job,
+            "periodo": periodo,
+            "item": item,
+            "status": "concluido",
+            "dono": ID_INSTANCIA,
+            "lease_ate": None,
+            "tentativas": 1,
+            "atualizado_em": agora,
+        }
+        for item in itens
+    ])
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_progresso_job_item",
+        set_={"status": "concluido", "lease_ate": None, "detalhe": None, "atualizado_em": agora},
+    )
+    db.execute(stmt)
+    if commit:
+        db.commit()
+
+
+def liberar_itens(db: Session, job: str, periodo: str, itens: Iterable[str], erro: Optional[str] = None) -> None:
+    """Devolve itens reservados (falha): ficam disponíveis na próxima rodada."""
+    itens = list(itens)
+    if not itens:
+        return
+    db.query(ProgressoJob).filter(
+        ProgressoJob.job == job,
+        ProgressoJob.periodo == periodo,
+        ProgressoJob.item.in_(itens),
+        ProgressoJob.dono == ID_INSTANCIA,
+        ProgressoJob.status != "concluido",
+    ).update(
+        {"status": "falhou", "lease_ate": None, "detalhe": (erro or "")[:500], "atualizado_em": datetime.utcnow()},
+        synchronize_session=False,
+    )
+    db.commit()
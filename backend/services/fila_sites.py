@@ -0,0 +1,248 @@
+# backend/services/fila_sites.py
+"""
+Fila local de geração dos sites dos clientes.
+
+POST /empresa só grava a empresa e ENFILEIRA o site; quem renderiza é um
+pool de threads (SITES_WORKERS). Cada job espera SITES_DEBOUNCE segundos antes
+de rodar: salvamentos seguidos do mesmo usuário nesse intervalo caem no MESMO
+job (coalescência), então N saves => 1 build, sempre com os dados mais novos.
+
+Fila por processo (sem broker): o job roda no worker que recebeu o save.
+O status é gravado na tabela jobs_sites, então /site_cliente/status/{job_id}
+responde em qualquer worker; os últimos SITES_HISTORICO_MAX ficam também em
+memória (leitura sem banco no worker dono). Linhas com mais de
+SITES_HISTORICO_DIAS são apagadas quando os workers sobem.
+"""
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from backend.database import SessionLocal
+from backend.models import JobSiteStatus
+
+SITES_WORKERS = int(os.getenv("SITES_WORKERS", "2"))
+SITES_DEBOUNCE = float(os.getenv("SITES_DEBOUNCE", "2"))  # segundos
+SITES_HISTORICO_MAX = int(os.getenv("SITES_HISTORICO_MAX", "1000"))
+SITES_HISTORICO_DIAS = int(os.getenv("SITES_HISTORICO_DIAS", "7"))
+
+
+@dataclass
+class JobSite:
+    id: str
+    usuario_id: int
+    dados: Any                      # DadosSiteCliente
+    estado: str = "na_fila"         # na_fila | executando | concluido | erro
+    coalescidos: int = 0            # saves extras absorvidos por este job
+    criado_em: float = field(default_factory=time.time)
+    iniciado_em: Optional[float] = None
+    concluido_em: Optional[float] = None
+    resultado: Optional[Dict[str, Any]] = None
+    erro: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        fila_ms = execucao_ms = None
+        if self.iniciado_em:
+            fila_ms = round((self.iniciado_em - self.criado_em) * 1000, 1)
+            if self.concluido_em:
+                execucao_ms = round((self.concluido_em - self.iniciado_em) * 1000, 1)
+        return {
+            "job_id": self.id,
+            "usuario_id": self.usuario_id,
+            "estado": self.estado,
+            "coalescidos": self.coalescidos,
+            "fila_ms": fila_ms,
+            "execucao_ms": execucao_ms,
+            "resultado": self.resultado,
+            "erro": self.erro,
+        }
+
+
+_fila: "queue.Queue[JobSite]" = queue.Queue()
+_pendentes: Dict[int, JobSite] = {}                 # usuario_id -> job ainda na fila
+_jobs: "OrderedDict[str, JobSite]" = OrderedDict()  # histórico (status)
+_lock = threading.Lock()
+_workers: list = []
+
+_metricas: Dict[str, Any] = {
+    "enfileirados": 0,
+    "coalescidos": 0,
+    "concluidos": 0,
+    "erros": 0,
+    "sem_alteracao": 0,     # render pulado pelo hash (site já atualizado)
+    "fila_ms_total": 0.0,
+    "execucao_ms_total": 0.0,
+}
+
+
+# ---------------------------------------------------------------------
+# Status no banco (compartilhado entre workers)
+# ---------------------------------------------------------------------
+def _gravar_status(job_id: str, criar: bool = False, **valores) -> None:
+    """Falha no banco não derruba a fila: o status só fica desatualizado."""
+    db = SessionLocal()
+    try:
+        if criar:
+            db.add(JobSiteStatus(id=job_id, **valores))
+        else:
+            db.query(JobSiteStatus).filter(JobSiteStatus.id == job_id).update(
+                {**valores, "atualizado_em": datetime.utcnow()}, synchronize_session=False
+            )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[ERRO SITE] Não foi possível gravar status do job {job_id}: {e}")
+    finally:
+        db.close()
+
+
+def _limpar_historico() -> None:
+    db = SessionLocal()
+    try:
+        limite = datetime.utcnow() - timedelta(days=SITES_HISTORICO_DIAS)
+        db.query(JobSiteStatus).filter(JobSiteStatus.criado_em < limite).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[ERRO SITE] Não foi possível limpar jobs antigos: {e}")
+    finally:
+        db.close()
+
+
+def _status_do_banco(job_id: str) -> Optional[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        linha = db.get(JobSiteStatus, job_id)
+        if linha is None:
+            return None
+        return {
+            "job_id": linha.id,
+            "usuario_id": linha.usuario_id,
+            "estado": linha.estado,
+            "coalescidos": linha.coalescidos,
+            "fila_ms": linha.fila_ms,
+            "execucao_ms": linha.execucao_ms,
+            "resultado": linha.resultado,
+            "erro": linha.erro,
+        }
+    finally:
+        db.close()
+
+
+def _iniciar_workers() -> None:
+    with _lock:
+        if _workers:
+            return
+        for i in range(max(1, SITES_WORKERS)):
+            t = threading.Thread(target=_worker, name=f"site-worker-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+    threading.Thread(target=_limpar_historico, name="site-historico", daemon=True).start()
+
+
+def enfileirar_site(dados) -> str:
+    """
+    Agenda a geração do site de `dados.usuario_id` e devolve o id do job.
+    Se já existe job esperando para o mesmo usuário, reaproveita (coalesce).
+    """
+    _iniciar_workers()
+    with _lock:
+        job = _pendentes.get(dados.usuario_id)
+        novo = job is None
+        if novo:
+            job = JobSite(id=uuid.uuid4().hex, usuario_id=dados.usuario_id, dados=dados)
+            _pendentes[dados.usuario_id] = job
+            _jobs[job.id] = job
+            while len(_jobs) > SITES_HISTORICO_MAX:
+                _jobs.popitem(last=False)
+            _metricas["enfileirados"] += 1
+        else:
+            job.dados = dados
+            job.coalescidos += 1
+            _metricas["coalescidos"] += 1
+        coalescidos = job.coalescidos
+
+    if not novo:
+        _gravar_status(job.id, coalescidos=coalescidos)
+        return job.id
+
+    # grava antes de enfileirar: o worker só faz UPDATE
+    _gravar_status(job.id, criar=True, usuario_id=job.usuario_id, estado="na_fila")
+    _fila.put(job)
+    return job.id
+
+
+def status_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Status do job: memória deste worker ou, se foi outro worker, o banco."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job:
+            return job.to_dict()
+    return _status_do_banco(job_id)
+
+
+def metricas_fila_sites() -> Dict[str, Any]:
+    with _lock:
+        dados = dict(_metricas)
+        dados["pendentes"] = len(_pendentes)
+    executados = (dados["concluidos"] + dados["erros"]) or 1
+    dados["fila_ms_medio"] = round(dados.pop("fila_ms_total") / executados, 1)
+    dados["execucao_ms_medio"] = round(dados.pop("execucao_ms_total") / executados, 1)
+    dados["workers"] = SITES_WORKERS
+    dados["debounce_s"] = SITES_DEBOUNCE
+    return dados
+
+
+def _worker() -> None:
+    # import tardio: site_cliente importa este módulo para as rotas de status
+    from backend.api.site_cliente import gerar_site_cliente
+
+    while True:
+        job = _fila.get()
+        try:
+            espera = job.criado_em + SITES_DEBOUNCE - time.time()
+            if espera > 0:
+                time.sleep(espera)
+
+            with _lock:
+                # a partir daqui, novos saves abrem outro job
+                _pendentes.pop(job.usuario_id, None)
+                job.estado = "executando"
+                job.iniciado_em = time.time()
+                dados = job.dados
+            _gravar_status(job.id, estado="executando", fila_ms=job.to_dict()["fila_ms"])
+
+            try:
+                resultado = gerar_site_cliente(dados)
+                erro = None
+            except Exception as e:
+                resultado, erro = None, str(getattr(e, "detail", e))
+                print(f"[ERRO SITE] Falha ao gerar site do usuário {job.usuario_id}: {erro}")
+
+            with _lock:
+                job.concluido_em = time.time()
+                job.resultado = resultado
+                job.erro = erro
+                job.estado = "erro" if erro else "concluido"
+                _metricas["erros" if erro else "concluidos"] += 1
+                if resultado and not resultado.get("alterado"):
+                    _metricas["sem_alteracao"] += 1
+                _metricas["fila_ms_total"] += (job.iniciado_em - job.criado_em) * 1000
+                _metricas["execucao_ms_total"] += (job.concluido_em - job.iniciado_em) * 1000
+                final = job.to_dict()
+            _gravar_status(
+                job.id,
+                estado=final["estado"],
+                execucao_ms=final["execucao_ms"],
+                resultado=final["resultado"],
+                erro=final["erro"],
+            )
+        finally:
+            _fila.task_done()
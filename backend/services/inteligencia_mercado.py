@@ -1,10 +1,14 @@
 # backend/services/inteligencia_mercado.py
 from __future__ import annotations
 
+from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import json
+import os
+import threading
+import time
 
 
 # Onde você pode guardar insumos “reais/curados” por mês e nicho.
@@ -12,6 +16,13 @@ import json
 BASE_DIR = Path(__file__).resolve().parents[1]  # backend/
 INSUMOS_DIR = BASE_DIR / "data" / "insumos"
 
+# Cache em processo: arquivo do mês já parseado + índice por nicho normalizado,
+# recarregado quando o mtime muda (checado no máximo a cada N segundos)
+INSUMOS_RECHECAGEM = float(os.getenv("INSUMOS_RECHECAGEM", "2"))
+INSUMOS_MEMO_MAX = int(os.getenv("INSUMOS_MEMO_MAX", "4096"))
+# suba ao mudar _fallback_por_mes: muda a chave dos pacotes gerados sem arquivo
+VERSAO_FALLBACK = 1
+
 
 @dataclass
 class MarketIntel:
@@ -34,6 +45,19 @@ def _normalizar_nicho(nicho: str) -> str:
     return (nicho or "").strip().lower()
 
 
+@dataclass
+class _InsumosMes:
+    versao: Optional[int]  # mtime_ns do arquivo (None = sem arquivo / inválido)
+    default: Dict[str, Any]
+    nichos: Dict[str, Dict[str, Any]]  # nicho normalizado -> bloco
+    checado_em: float
+
+
+_meses: Dict[str, _InsumosMes] = {}
+_memo: "OrderedDict[Tuple[str, str, str], MarketIntel]" = OrderedDict()
+_lock = threading.Lock()
+
+
 def _carregar_json_mes(mes_ano: str) -> Optional[Dict[str, Any]]:
     """
     Tenta carregar insumos curados do disco:
@@ -49,6 +73,65 @@ def _carregar_json_mes(mes_ano: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+def _indexar_mes(mes_ano: str, versao: Optional[int]) -> _InsumosMes:
+    data_mes = _carregar_json_mes(mes_ano) if versao is not None else None
+    if not isinstance(data_mes, dict):
+        return _InsumosMes(versao=None, default={}, nichos={}, checado_em=time.monotonic())
+
+    # Estrutura esperada:
+    # {
+    #   "default": {...},
+    #   "nichos": {
+    #       "alimentos veganos": {...}
+    #   }
+    # }
+    bloco_default = data_mes.get("default") or {}
+    bloco_nichos = data_mes.get("nichos") or {}
+
+    nichos: Dict[str, Dict[str, Any]] = {}
+    if isinstance(bloco_nichos, dict):
+        for k, v in bloco_nichos.items():
+            # primeira chave vence (igual ao match simples de antes)
+            if isinstance(v, dict):
+                nichos.setdefault(_normalizar_nicho(k), v)
+
+    return _InsumosMes(
+        versao=versao,
+        default=bloco_default if isinstance(bloco_default, dict) else {},
+        nichos=nichos,
+        checado_em=time.monotonic(),
+    )
+
+
+def _insumos_mes(mes_ano: str) -> _InsumosMes:
+    """Arquivo do mês já indexado; relê só se o mtime mudou."""
+    with _lock:
+        atual = _meses.get(mes_ano)
+    if atual is not None and time.monotonic() - atual.checado_em < INSUMOS_RECHECAGEM:
+        return atual
+
+    try:
+        versao: Optional[int] = (INSUMOS_DIR / f"{mes_ano}.json").stat().st_mtime_ns
+    except OSError:
+        versao = None
+
+    if atual is not None and atual.versao == versao:
+        atual.checado_em = time.monotonic()
+        return atual
+
+    novo = _indexar_mes(mes_ano, versao)
+    with _lock:
+        _meses[mes_ano] = novo
+    return novo
+
+
+def limpar_cache_insumos() -> None:
+    """Esquece arquivos e MarketIntel memorizados (ex.: depois de editar insumos em massa)."""
+    with _lock:
+        _meses.clear()
+        _memo.clear()
+
+
 def _get_mes(mes_ano: str) -> str:
     if "-" in mes_ano:
         return mes_ano.split("-")[1]
@@ -171,45 +254,55 @@ def obter_insumos(mes_ano: str, nicho: str) -> MarketIntel:
     Prioridade:
     1) JSON curado (backend/data/insumos/<mes_ano>.json)
     2) fallback por mês + nicho (heurística)
+
+    O resultado é memorizado por (mês, nicho, versão do arquivo) e é o MESMO
+    objeto nas chamadas seguintes: trate como somente leitura.
     """
-    nicho_norm = _normalizar_nicho(nicho)
-    data_mes = _carregar_json_mes(mes_ano)
-
-    if isinstance(data_mes, dict):
-        # Estrutura esperada:
-        # {
-        #   "default": {...},
-        #   "nichos": {
-        #       "alimentos veganos": {...}
-        #   }
-        # }
-        bloco_default = data_mes.get("default") or {}
-        bloco_nichos = data_mes.get("nichos") or {}
-
-        escolhido = None
-        if isinstance(bloco_nichos, dict):
-            # tenta match simples por chave
-            for k, v in bloco_nichos.items():
-                if _normalizar_nicho(k) == nicho_norm:
-                    escolhido = v
-                    break
-
-        # merge: nicho sobrepõe default
-        merged = dict(bloco_default)
-        if isinstance(escolhido, dict):
-            merged.update(escolhido)
-
-        return MarketIntel(
-            mes_ano=mes_ano,
-            nicho=nicho,
-            tendencias=list(merged.get("tendencias", []) or []),
-            dados_estatisticas=list(merged.get("dados_estatisticas", []) or []),
-            produtos_em_alta=list(merged.get("produtos_em_alta", []) or []),
-            promocoes_ofertas=list(merged.get("promocoes_ofertas", []) or []),
-            branding_posicionamento=list(merged.get("branding_posicionamento", []) or []),
-            prova_social_autoridade=list(merged.get("prova_social_autoridade", []) or []),
-            relacionamento_comunidade=list(merged.get("relacionamento_comunidade", []) or []),
-            observacoes=list(merged.get("observacoes", []) or []),
-        )
-
-    return _fallback_por_mes(mes_ano, nicho)
+    return obter_insumos_com_chave(mes_ano, nicho)[0]
+
+
+def obter_insumos_com_chave(mes_ano: str, nicho: str) -> Tuple[MarketIntel, Tuple[str, str, str]]:
+    """
+    Igual a obter_insumos, mais a chave (mês, nicho, versão) que identifica o
+    conteúdo: mesma chave => mesmos insumos. Serve de assinatura barata para
+    caches de quem consome (sem serializar o MarketIntel).
+    """
+    mes = _insumos_mes(mes_ano)
+    versao = f"arquivo:{mes.versao}" if mes.versao is not None else f"fallback:{VERSAO_FALLBACK}"
+    chave = (mes_ano, nicho, versao)
+    with _lock:
+        intel = _memo.get(chave)
+        if intel is not None:
+            _memo.move_to_end(chave)
+            return intel, chave
+
+    intel = _montar_insumos(mes_ano, nicho, mes)
+    with _lock:
+        _memo[chave] = intel
+        while len(_memo) > INSUMOS_MEMO_MAX:
+            _memo.popitem(last=False)
+    return intel, chave
+
+
+def _montar_insumos(mes_ano: str, nicho: str, mes: _InsumosMes) -> MarketIntel:
+    if mes.versao is None:
+        return _fallback_por_mes(mes_ano, nicho)
+
+    # merge: nicho sobrepõe default
+    merged = dict(mes.default)
+    escolhido = mes.nichos.get(_normalizar_nicho(nicho))
+    if escolhido:
+        merged.update(escolhido)
+
+    return MarketIntel(
+        mes_ano=mes_ano,
+        nicho=nicho,
+        tendencias=list(merged.get("tendencias", []) or []),
+        dados_estatisticas=list(merged.get("dados_estatisticas", []) or []),
+        produtos_em_alta=list(merged.get("produtos_em_alta", []) or []),
+        promocoes_ofertas=list(merged.get("promocoes_ofertas", []) or []),
+        branding_posicionamento=list(merged.get("branding_posicionamento", []) or []),
+        prova_social_autoridade=list(merged.get("prova_social_autoridade", []) or []),
+        relacionamento_comunidade=list(merged.get("relacionamento_comunidade", []) or []),
+        observacoes=list(merged.get("observacoes", []) or []),
+    )
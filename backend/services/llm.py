@@ -0,0 +1,436 @@
+# backend/services/llm.py
+"""
+Gateway único para chamadas de LLM (OpenAI).
+
+Todo o backend (MARK, chat público dos sites, geração de cards) passa por aqui:
+
+- UM cliente síncrono por processo e UM assíncrono por event loop, com pool
+  de conexões HTTP e keep-alive (nada de criar cliente por chamada). O
+  cliente e os semáforos async ficam presos ao loop que os criou; por isso
+  jobs que chamam asyncio.run várias vezes no mesmo processo (agendador
+  in-process) ganham um conjunto novo a cada loop.
+- Limite de concorrência global (LLM_CONCORRENCIA_GLOBAL) e por tenant
+  (LLM_CONCORRENCIA_TENANT), para um cliente barulhento não tomar tudo.
+- Retry com backoff exponencial + jitter em erros transitórios (429, 5xx,
+  timeout, conexão), limitado por um orçamento de retries: cada chamada
+  deposita LLM_RETRY_RATIO de ficha e cada retry gasta 1. Se o provedor
+  cair, não multiplicamos a carga em cima dele.
+- Métricas de latência, erros, retries e tokens por modelo (metricas_llm()).
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+LLM_MODELO_PADRAO = os.getenv("LLM_MODELO_PADRAO", "gpt-4o-mini")
+
+LLM_MAX_CONEXOES = int(os.getenv("LLM_MAX_CONEXOES", "100"))
+LLM_KEEPALIVE = int(os.getenv("LLM_KEEPALIVE", "20"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+LLM_CONCORRENCIA_GLOBAL = int(os.getenv("LLM_CONCORRENCIA_GLOBAL", "64"))
+LLM_CONCORRENCIA_TENANT = int(os.getenv("LLM_CONCORRENCIA_TENANT", "4"))
+# Semáforos de tenant guardados (LRU); os ociosos mais antigos saem primeiro
+LLM_TENANTS_MAX = int(os.getenv("LLM_TENANTS_MAX", "1024"))
+
+LLM_MAX_TENTATIVAS = int(os.getenv("LLM_MAX_TENTATIVAS", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_RETRY_RATIO = float(os.getenv("LLM_RETRY_RATIO", "0.2"))
+LLM_RETRY_FICHAS_MAX = float(os.getenv("LLM_RETRY_FICHAS_MAX", "20"))
+
+ERROS_TRANSITORIOS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,  # inclui APITimeoutError
+    openai.InternalServerError,
+)
+
+
+class LLMIndisponivel(RuntimeError):
+    """OPENAI_API_KEY ausente: o recurso de IA está desligado neste ambiente."""
+
+
+# ---------------------------------------------------------------------
+# Clientes (criados uma vez, sob demanda; o async, uma vez por event loop)
+# ---------------------------------------------------------------------
+_clientes: Dict[str, Any] = {}
+_clientes_lock = threading.Lock()
+
+
+class _EstadoLoop:
+    """Cliente e semáforos async de um event loop (não servem em outro loop)."""
+
+    __slots__ = ("cliente", "sem_global", "sem_tenant", "__weakref__")
+
+    def __init__(self):
+        self.cliente: Optional[AsyncOpenAI] = None
+        self.sem_global = asyncio.Semaphore(LLM_CONCORRENCIA_GLOBAL)
+        self.sem_tenant: "OrderedDict[str, _VagasTenant]" = OrderedDict()
+
+
+# loop morto sai sozinho (chave fraca); fechar_cliente_async fecha antes disso
+_por_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _EstadoLoop]" = weakref.WeakKeyDictionary()
+
+
+def _estado_loop() -> _EstadoLoop:
+    loop = asyncio.get_running_loop()
+    with _clientes_lock:
+        estado = _por_loop.get(loop)
+        if estado is None:
+            estado = _por_loop[loop] = _EstadoLoop()
+        return estado
+
+
+def _limites() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONEXOES,
+        max_keepalive_connections=LLM_KEEPALIVE,
+        keepalive_expiry=60,
+    )
+
+
+def _api_key() -> str:
+    chave = os.getenv("OPENAI_API_KEY")
+    if not chave:
+        raise LLMIndisponivel("Variável de ambiente OPENAI_API_KEY não definida.")
+    return chave
+
+
+def _http_async() -> httpx.AsyncClient:
+    return httpx.AsyncClient(limits=_limites(), timeout=LLM_TIMEOUT)
+
+
+def cliente_async() -> AsyncOpenAI:
+    """Cliente do event loop atual (chamar de dentro de uma coroutine)."""
+    estado = _estado_loop()
+    if estado.cliente is None:
+        estado.cliente = AsyncOpenAI(
+            api_key=_api_key(),
+            max_retries=0,  # retries ficam com o gateway (orçamento + jitter)
+            timeout=LLM_TIMEOUT,
+            http_client=_http_async(),
+        )
+    return estado.cliente
+
+
+async def fechar_cliente_async() -> None:
+    """
+    Fecha o cliente do loop atual e esquece seus semáforos. Chamar no fim da
+    coroutine passada a asyncio.run (jobs), antes de o loop ser fechado.
+    """
+    loop = asyncio.get_running_loop()
+    with _clientes_lock:
+        estado = _por_loop.pop(loop, None)
+    if estado is not None and estado.cliente is not None:
+        await estado.cliente.close()
+
+
+def cliente_sync() -> OpenAI:
+    with _clientes_lock:
+        if "sync" not in _clientes:
+            _clientes["sync"] = OpenAI(
+                api_key=_api_key(),
+                max_retries=0,
+                timeout=LLM_TIMEOUT,
+                http_client=httpx.Client(limits=_limites(), timeout=LLM_TIMEOUT),
+            )
+        return _clientes["sync"]
+
+
+# ---------------------------------------------------------------------
+# Métricas
+# ---------------------------------------------------------------------
+_metricas_lock = threading.Lock()
+_metricas: Dict[str, Dict[str, float]] = defaultdict(
+    lambda: {
+        "chamadas": 0,
+        "erros": 0,
+        "retries": 0,
+        "em_andamento": 0,
+        "latencia_total_ms": 0.0,
+        "latencia_max_ms": 0.0,
+        "tokens_prompt": 0,
+        "tokens_resposta": 0,
+    }
+)
+_retry_fichas = LLM_RETRY_FICHAS_MAX
+_retries_negados = 0
+
+
+def _registrar(modelo: str, **valores: float) -> None:
+    with _metricas_lock:
+        m = _metricas[modelo]
+        for chave, valor in valores.items():
+            if chave == "latencia_ms":
+                m["latencia_total_ms"] += valor
+                m["latencia_max_ms"] = max(m["latencia_max_ms"], valor)
+            else:
+                m[chave] += valor
+
+
+def _registrar_uso(modelo: str, uso: Any) -> None:
+    if uso is None:
+        return
+    _registrar(
+        modelo,
+        tokens_prompt=getattr(uso, "prompt_tokens", 0) or 0,
+        tokens_resposta=getattr(uso, "completion_tokens", 0) or 0,
+    )
+
+
+def metricas_llm() -> Dict[str, Any]:
+    with _metricas_lock:
+        por_modelo = {}
+        for modelo, m in _metricas.items():
+            dados = dict(m)
+            concluidas = max(dados["chamadas"] - dados["em_andamento"], 1)
+            dados["latencia_media_ms"] = round(dados.pop("latencia_total_ms") / concluidas, 1)
+            por_modelo[modelo] = dados
+        return {
+            "modelos": por_modelo,
+            "retry_fichas": round(_retry_fichas, 2),
+            "retries_negados": _retries_negados,
+            "concorrencia_global": LLM_CONCORRENCIA_GLOBAL,
+            "concorrencia_tenant": LLM_CONCORRENCIA_TENANT,
+        }
+
+
+# ---------------------------------------------------------------------
+# Orçamento de retries + backoff
+# ---------------------------------------------------------------------
+def _depositar_ficha() -> None:
+    global _retry_fichas
+    with _metricas_lock:
+        _retry_fichas = min(LLM_RETRY_FICHAS_MAX, _retry_fichas + LLM_RETRY_RATIO)
+
+
+def _pode_tentar_de_novo(tentativa: int, erro: Exception) -> bool:
+    global _retry_fichas, _retries_negados
+    if tentativa >= LLM_MAX_TENTATIVAS or not isinstance(erro, ERROS_TRANSITORIOS):
+        return False
+    with _metricas_lock:
+        if _retry_fichas < 1:
+            _retries_negados += 1
+            return False
+        _retry_fichas -= 1
+        return True
+
+
+def _espera(tentativa: int) -> float:
+    # "full jitter": aleatório entre 0 e o teto exponencial
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** tentativa)))
+
+
+# ---------------------------------------------------------------------
+# Semáforos (global + por tenant)
+# ---------------------------------------------------------------------
+class _VagasTenant:
+    """Semáforo de um tenant + quantos estão usando/esperando (0 = pode sair do LRU)."""
+
+    __slots__ = ("semaforo", "em_uso")
+
+    def __init__(self, semaforo):
+        self.semaforo = semaforo
+        self.em_uso = 0
+
+
+_sem_sync_global = threading.BoundedSemaphore(LLM_CONCORRENCIA_GLOBAL)
+_sem_sync_tenant: "OrderedDict[str, _VagasTenant]" = OrderedDict()
+_sem_sync_lock = threading.Lock()
+
+
+def _reservar_tenant(tabela: "OrderedDict[str, _VagasTenant]", tenant: str, criar) -> _VagasTenant:
+    """Pega (ou cria) as vagas do tenant e descarta ociosos além de LLM_TENANTS_MAX."""
+    vagas = tabela.get(tenant)
+    if vagas is None:
+        vagas = tabela[tenant] = _VagasTenant(criar())
+        if len(tabela) > LLM_TENANTS_MAX:
+            for antigo in [t for t, v in tabela.items() if v.em_uso == 0 and t != tenant]:
+                del tabela[antigo]
+                if len(tabela) <= LLM_TENANTS_MAX:
+                    break
+    tabela.move_to_end(tenant)
+    vagas.em_uso += 1
+    return vagas
+
+
+@asynccontextmanager
+async def _vaga_async(tenant: Optional[str]):
+    estado = _estado_loop()
+
+    # sem await entre reservar e incrementar: seguro no event loop
+    vagas = None
+    if tenant is not None:
+        vagas = _reservar_tenant(
+            estado.sem_tenant, tenant, lambda: asyncio.Semaphore(LLM_CONCORRENCIA_TENANT)
+        )
+
+    try:
+        if vagas is not None:
+            await vagas.semaforo.acquire()
+        try:
+            async with estado.sem_global:
+                yield
+        finally:
+            if vagas is not None:
+                vagas.semaforo.release()
+    finally:
+        if vagas is not None:
+            vagas.em_uso -= 1
+
+
+@contextmanager
+def _vaga_sync(tenant: Optional[str]):
+    vagas = None
+    if tenant is not None:
+        with _sem_sync_lock:
+            vagas = _reservar_tenant(
+                _sem_sync_tenant, tenant, lambda: threading.BoundedSemaphore(LLM_CONCORRENCIA_TENANT)
+            )
+
+    try:
+        if vagas is not None:
+            vagas.semaforo.acquire()
+        try:
+            with _sem_sync_global:
+                yield
+        finally:
+            if vagas is not None:
+                vagas.semaforo.release()
+    finally:
+        if vagas is not None:
+            with _sem_sync_lock:
+                vagas.em_uso -= 1
+
+
+# ---------------------------------------------------------------------
+# API pública
+# ---------------------------------------------------------------------
+async def chat(
+    mensagens: List[Dict[str, str]],
+    modelo: Optional[str] = None,
+    tenant: Optional[Any] = None,
+    **parametros: Any,
+) -> str:
+    """Chat completion (async). Retorna só o texto da resposta."""
+    modelo = modelo or LLM_MODELO_PADRAO
+    chave_tenant = None if tenant is None else str(tenant)
+    _depositar_ficha()
+
+    async with _vaga_async(chave_tenant):
+        tentativa = 0
+        while True:
+            tentativa += 1
+            inicio = time.perf_counter()
+            _registrar(modelo, chamadas=1, em_andamento=1)
+            try:
+                resposta = await cliente_async().chat.completions.create(
+                    model=modelo, messages=mensagens, **parametros
+                )
+            except Exception as e:
+                _registrar(modelo, em_andamento=-1, erros=1, latencia_ms=(time.perf_counter() - inicio) * 1000)
+                if not _pode_tentar_de_novo(tentativa, e):
+                    raise
+                _registrar(modelo, retries=1)
+                await asyncio.sleep(_espera(tentativa))
+                continue
+
+            _registrar(modelo, em_andamento=-1, latencia_ms=(time.perf_counter() - inicio) * 1000)
+            _registrar_uso(modelo, getattr(resposta, "usage", None))
+            return (resposta.choices[0].message.content or "").strip()
+
+
+async def chat_stream(
+    mensagens: List[Dict[str, str]],
+    modelo: Optional[str] = None,
+    tenant: Optional[Any] = None,
+    **parametros: Any,
+) -> AsyncIterator[str]:
+    """
+    Chat completion em streaming (async). Gera os pedaços de texto.
+    Retry só antes do primeiro token; depois disso o erro sobe para o chamador.
+    """
+    modelo = modelo or LLM_MODELO_PADRAO
+    chave_tenant = None if tenant is None else str(tenant)
+    _depositar_ficha()
+
+    async with _vaga_async(chave_tenant):
+        tentativa = 0
+        while True:
+            tentativa += 1
+            inicio = time.perf_counter()
+            _registrar(modelo, chamadas=1, em_andamento=1)
+            try:
+                stream = await cliente_async().chat.completions.create(
+                    model=modelo,
+                    messages=mensagens,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **parametros,
+                )
+            except Exception as e:
+                _registrar(modelo, em_andamento=-1, erros=1, latencia_ms=(time.perf_counter() - inicio) * 1000)
+                if not _pode_tentar_de_novo(tentativa, e):
+                    raise
+                _registrar(modelo, retries=1)
+                await asyncio.sleep(_espera(tentativa))
+                continue
+            break
+
+        try:
+            async for chunk in stream:
+                if chunk.choices:
+                    delta = chunk.choices[0].delta.content or ""
+                    if delta:
+                        yield delta
+                _registrar_uso(modelo, getattr(chunk, "usage", None))
+        except Exception:
+            _registrar(modelo, erros=1)
+            raise
+        finally:
+            _registrar(modelo, em_andamento=-1, latencia_ms=(time.perf_counter() - inicio) * 1000)
+
+
+def chat_sync(
+    mensagens: List[Dict[str, str]],
+    modelo: Optional[str] = None,
+    tenant: Optional[Any] = None,
+    **parametros: Any,
+) -> str:
+    """Mesmo contrato de `chat`, para código síncrono (scripts, jobs)."""
+    modelo = modelo or LLM_MODELO_PADRAO
+    chave_tenant = None if tenant is None else str(tenant)
+    _depositar_ficha()
+
+    with _vaga_sync(chave_tenant):
+        tentativa = 0
+        while True:
+            tentativa += 1
+            inicio = time.perf_counter()
+            _registrar(modelo, chamadas=1, em_andamento=1)
+            try:
+                resposta = cliente_sync().chat.completions.create(
+                    model=modelo, messages=mensagens, **parametros
+                )
+            except Exception as e:
+                _registrar(modelo, em_andamento=-1, erros=1, latencia_ms=(time.perf_counter() - inicio) * 1000)
+                if not _pode_tentar_de_novo(tentativa, e):
+                    raise
+                _registrar(modelo, retries=1)
+                time.sleep(_espera(tentativa))
+                continue
+
+            _registrar(modelo, em_andamento=-1, latencia_ms=(time.perf_counter() - inicio) * 1000)
+            _registrar_uso(modelo, getattr(resposta, "usage", None))
+            return (resposta.choices[0].message.content or "").strip()
@@ -0,0 +1,124 @@
+# backend/services/logos.py
+"""
+Logos das empresas fora do banco, endereçadas por conteúdo.
+
+O frontend manda a logo como `data:image/...;base64,...` (centenas de KB).
+Guardar isso em `empresas.logo_url` faz o blob ir em todo SELECT da empresa,
+em todo JSON de /empresa e /minha-conta e dentro de cada HTML de site.
+
+Aqui o upload é decodificado UMA vez e gravado em data/logos/ pelo sha256:
+- `<sha>_original.<ext>`  original, como veio
+- `<sha>.webp`             até LOGO_LARGURA px (é o que vai para logo_url)
+- `<sha>_thumb.webp`       até LOGO_LARGURA_THUMB px
+
+`logo_url` passa a ser uma URL curta (/logos/<sha>.webp). O mesmo arquivo
+enviado de novo não gera nada (mesmo hash). Sem Pillow instalado, só o
+original é salvo e a URL aponta para ele.
+
+Sem LOGOS_BASE_URL a URL fica relativa à API: os sites (/sites, mesma
+origem) resolvem direto e o Streamlit completa com API_URL (url_logo).
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException
+
+from backend.utils.arquivos import escrever_atomico
+
+try:
+    from PIL import Image
+except ImportError:  # opcional: sem Pillow não há variantes WebP
+    Image = None
+
+RAIZ_PROJETO = Path(__file__).resolve().parents[2]
+PASTA_LOGOS = RAIZ_PROJETO / "data" / "logos"
+
+# Ex.: LOGOS_BASE_URL=https://cdn.exemplo.com/logos (opcional; padrão /logos/...,
+# que o frontend completa com API_URL)
+LOGOS_BASE_URL = os.getenv("LOGOS_BASE_URL", "/logos").rstrip("/")
+LOGO_MAX_BYTES = int(os.getenv("LOGO_MAX_BYTES", str(5 * 1024 * 1024)))
+LOGO_LARGURA = int(os.getenv("LOGO_LARGURA", "512"))
+LOGO_LARGURA_THUMB = int(os.getenv("LOGO_LARGURA_THUMB", "128"))
+
+_DATA_URL = re.compile(r"^data:(image/[a-zA-Z0-9.+-]+)?(;[^,]*)?;base64,(.*)$", re.DOTALL)
+# SVG fica de fora: é documento (pode ter <script>) e seria servido pela
+# origem da API em /logos
+_EXTENSOES = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+
+
+def eh_logo_inline(valor: Optional[str]) -> bool:
+    return isinstance(valor, str) and valor.startswith("data:image")
+
+
+def _variante_webp(original: bytes, largura: int) -> bytes:
+    with Image.open(io.BytesIO(original)) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+        img.thumbnail((largura, largura))
+        saida = io.BytesIO()
+        img.save(saida, format="WEBP", quality=85, method=6)
+        return saida.getvalue()
+
+
+def armazenar_logo(valor: Optional[str]) -> Optional[str]:
+    """
+    Converte uma logo inline (data URL) em arquivo + URL curta.
+    URLs normais (ou vazio) voltam sem alteração.
+    """
+    if not eh_logo_inline(valor):
+        return valor
+
+    encontrado = _DATA_URL.match(valor)
+    if not encontrado:
+        raise HTTPException(status_code=400, detail="Logo inválida.")
+    mime = (encontrado.group(1) or "image/png").lower()
+    if mime not in _EXTENSOES:
+        raise HTTPException(status_code=415, detail="Formato de logo não suportado. Use PNG, JPG, GIF ou WebP.")
+
+    try:
+        original = base64.b64decode(encontrado.group(3), validate=False)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Logo inválida (base64).")
+    if not original:
+        return None
+    if len(original) > LOGO_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Logo muito grande.")
+
+    sha = hashlib.sha256(original).hexdigest()
+    extensao = _EXTENSOES[mime]
+
+    caminho_original = PASTA_LOGOS / f"{sha}_original.{extensao}"
+    if not caminho_original.exists():
+        escrever_atomico(caminho_original, original)
+
+    # animados ficam só no original
+    if Image is None or extensao == "gif":
+        return f"{LOGOS_BASE_URL}/{caminho_original.name}"
+
+    caminho_webp = PASTA_LOGOS / f"{sha}.webp"
+    try:
+        if not caminho_webp.exists():
+            escrever_atomico(caminho_webp, _variante_webp(original, LOGO_LARGURA))
+        caminho_thumb = PASTA_LOGOS / f"{sha}_thumb.webp"
+        if not caminho_thumb.exists():
+            escrever_atomico(caminho_thumb, _variante_webp(original, LOGO_LARGURA_THUMB))
+    except Exception as e:
+        print(f"[ERRO LOGO] Não foi possível gerar WebP ({sha}): {e}")
+        return f"{LOGOS_BASE_URL}/{caminho_original.name}"
+
+    return f"{LOGOS_BASE_URL}/{caminho_webp.name}"
@@ -0,0 +1,81 @@
+# backend/services/memo_pacotes.py
+"""
+Memo em disco (compartilhado entre workers e restarts) dos pacotes gerados
+pela Central de Ideias e pelo Consultor Mensal.
+
+Os geradores são determinísticos (utils/seeds.seed_estavel): a mesma chave
+gera sempre o mesmo pacote. Então a 2ª geração em qualquer worker vira uma
+leitura de arquivo:
+
+    data/cache_pacotes/<tipo>/<mes_ano>/<chave>.json
+
+Só ficam em disco o mês atual e o seguinte (mais o mês que acabou de ser
+gravado): na primeira gravação de cada mês, em cada processo, as pastas de
+meses fora disso são apagadas. O pacote de cada empresa também fica na sua
+linha do banco; o memo só evita regerar. A chave deve incluir tudo que muda
+o resultado (seed, versão do gerador, insumos...).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import shutil
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, Set
+
+from backend.utils.arquivos import escrever_atomico
+
+RAIZ_PROJETO = Path(__file__).resolve().parents[2]
+PASTA_MEMO = RAIZ_PROJETO / "data" / "cache_pacotes"
+
+_MES = re.compile(r"^\d{4}-\d{2}$")
+# tipo -> mês atual em que a poda já rodou neste processo
+_podados: Dict[str, str] = {}
+_poda_lock = threading.Lock()
+
+def chave_memo(*partes) -> str:
+    base = "|".join(str(p) for p in partes).encode("utf-8")
+    return hashlib.blake2b(base, digest_size=16).hexdigest()
+
+
+def _meses_mantidos(mes_ano: str) -> Set[str]:
+    hoje = date.today()
+    seguinte = date(hoje.year + hoje.month // 12, hoje.month % 12 + 1, 1)
+    return {hoje.strftime("%Y-%m"), seguinte.strftime("%Y-%m"), mes_ano}
+
+
+def _podar_meses_antigos(tipo: str, mes_ano: str) -> None:
+    """Apaga as pastas de meses que não são o atual/seguinte (uma vez por mês)."""
+    mes_atual = date.today().strftime("%Y-%m")
+    with _poda_lock:
+        if _podados.get(tipo) == mes_atual:
+            return
+        _podados[tipo] = mes_atual
+
+    mantidos = _meses_mantidos(mes_ano)
+
+    pasta_tipo = PASTA_MEMO / tipo
+    if not pasta_tipo.is_dir():
+        return
+    for pasta in pasta_tipo.iterdir():
+        if pasta.is_dir() and _MES.match(pasta.name) and pasta.name not in mantidos:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+
+def obter_ou_gerar(tipo: str, mes_ano: str, chave: str, gerar: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    caminho = PASTA_MEMO / tipo / mes_ano / f"{chave}.json"
+    try:
+        return json.loads(caminho.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        pass
+
+    pacote = gerar()
+    try:
+        _podar_meses_antigos(tipo, mes_ano)
+        escrever_atomico(caminho, json.dumps(pacote, ensure_ascii=False).encode("utf-8"))
+    except OSError as e:
+        print(f"[ERRO MEMO PACOTES] Não foi possível gravar {caminho}: {e}")
+    return pacote
@@ -0,0 +1,127 @@
+# backend/services/senhas.py
+"""
+Hash/verificação de senha (bcrypt) fora da threadpool compartilhada.
+
+Cada bcrypt custa ~250 ms de CPU. Rodar isso direto nas rotas ocupa a mesma
+threadpool que atende todas as rotas síncronas; um pico de logins trava o resto.
+Aqui o trabalho vai para um executor PRÓPRIO e limitado:
+
+- SENHA_WORKERS:   threads dedicadas ao bcrypt (a lib solta o GIL durante o hash)
+- SENHA_FILA_MAX:  máximo de pedidos aguardando; acima disso responde 503
+- BCRYPT_ROUNDS:   custo do bcrypt por ambiente (ex.: 4 em testes, 12 em produção)
+
+Quando BCRYPT_ROUNDS muda, o login refaz o hash da senha automaticamente
+(verificar_senha devolve o hash novo para ser gravado).
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+SENHA_WORKERS = int(os.getenv("SENHA_WORKERS", str(min(4, os.cpu_count() or 1))))
+SENHA_FILA_MAX = int(os.getenv("SENHA_FILA_MAX", "64"))
+
+# min/max iguais ao default: hash com outro custo => needs_update => rehash no login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_executor = ThreadPoolExecutor(max_workers=SENHA_WORKERS, thread_name_prefix="bcrypt")
+
+_lock = threading.Lock()
+_metricas: Dict[str, Any] = {
+    "na_fila": 0,          # aguardando uma thread livre
+    "em_execucao": 0,
+    "pico_fila": 0,
+    "concluidos": 0,
+    "rejeitados": 0,       # recusados por fila cheia (503)
+    "rehash": 0,           # senhas regravadas por mudança de BCRYPT_ROUNDS
+    "tempo_total_ms": 0.0,
+}
+
+
+def metricas_senha() -> Dict[str, Any]:
+    with _lock:
+        dados = dict(_metricas)
+    concluidos = dados["concluidos"] or 1
+    dados["tempo_medio_ms"] = round(dados.pop("tempo_total_ms") / concluidos, 1)
+    dados["workers"] = SENHA_WORKERS
+    dados["fila_max"] = SENHA_FILA_MAX
+    dados["bcrypt_rounds"] = BCRYPT_ROUNDS
+    return dados
+
+
+def _executar(funcao: Callable, *args) -> Any:
+    with _lock:
+        _metricas["na_fila"] -= 1
+        _metricas["em_execucao"] += 1
+    inicio = time.perf_counter()
+    try:
+        return funcao(*args)
+    finally:
+        with _lock:
+            _metricas["em_execucao"] -= 1
+            _metricas["concluidos"] += 1
+            _metricas["tempo_total_ms"] += (time.perf_counter() - inicio) * 1000
+
+
+def _enviar(funcao: Callable, *args) -> Future:
+    with _lock:
+        if _metricas["na_fila"] >= SENHA_FILA_MAX:
+            _metricas["rejeitados"] += 1
+            raise HTTPException(status_code=503, detail="Servidor ocupado. Tente novamente em instantes.")
+        _metricas["na_fila"] += 1
+        _metricas["pico_fila"] = max(_metricas["pico_fila"], _metricas["na_fila"])
+    futuro = _executor.submit(_executar, funcao, *args)
+    futuro.add_done_callback(_liberar_se_cancelado)
+    return futuro
+
+
+def _liberar_se_cancelado(futuro: Future) -> None:
+    # request cancelado (cliente desconectou) antes de pegar uma thread:
+    # wrap_future cancela o futuro e _executar nunca roda para descontar a fila
+    if futuro.cancelled():
+        with _lock:
+            _metricas["na_fila"] -= 1
+
+
+def _verificar(senha: str, senha_hash: Optional[str]) -> Tuple[bool, Optional[str]]:
+    if not senha_hash:
+        return False, None
+    try:
+        return pwd_context.verify_and_update(senha, senha_hash)
+    except ValueError:
+        # hash corrompido / formato desconhecido
+        return False, None
+
+
+# ---------------------------------------------------------------------
+# API assíncrona (rotas async def): não ocupa thread nem event loop
+# ---------------------------------------------------------------------
+async def gerar_hash(senha: str) -> str:
+    return await asyncio.wrap_future(_enviar(pwd_context.hash, senha))
+
+
+async def verificar_senha(senha: str, senha_hash: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Retorna (ok, novo_hash). `novo_hash` vem preenchido quando o hash salvo
+    usa um custo diferente de BCRYPT_ROUNDS e deve ser regravado.
+    """
+    ok, novo_hash = await asyncio.wrap_future(_enviar(_verificar, senha, senha_hash))
+    if ok and novo_hash:
+        with _lock:
+            _metricas["rehash"] += 1
+    return ok, novo_hash
+
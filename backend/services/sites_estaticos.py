@@ -0,0 +1,179 @@
+# backend/services/sites_estaticos.py
+"""
+Entrega dos sites gerados (/sites) e dos assets do modelo (/assets).
+
+Na geração (site_cliente.renderizar_site) cada página ganha:
+- `<pagina>.html.gz` e `<pagina>.html.br` (br só com o pacote `brotli` instalado)
+- `.<pagina>.html.etag`: sha256 do HTML, usado como ETag FORTE
+
+Na entrega, SitesPrecomprimidos responde 304 quando o If-None-Match bate e,
+se o navegador aceita, devolve o arquivo já comprimido (zero CPU de compressão
+por request). Assets do modelo vão com Cache-Control longo.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+
+from backend.utils.arquivos import escrever_atomico
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele só geramos .gz
+    brotli = None
+
+SITES_CACHE_CONTROL = os.getenv("SITES_CACHE_CONTROL", "public, max-age=0, must-revalidate")
+ASSETS_MAX_AGE = int(os.getenv("ASSETS_MAX_AGE", str(30 * 24 * 3600)))  # 30 dias
+
+# (encoding aceito, sufixo do arquivo) em ordem de preferência
+_CODIFICACOES: Tuple[Tuple[str, str], ...] = (("br", ".br"), ("gzip", ".gz"))
+
+_etags: Dict[str, Tuple[int, str]] = {}   # caminho -> (mtime_ns do html, etag)
+_etags_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------
+# Geração
+# ---------------------------------------------------------------------
+def _caminho_etag(caminho: Path) -> Path:
+    return caminho.with_name(f".{caminho.name}.etag")
+
+
+def gravar_versoes_estaticas(caminho: Path, conteudo: bytes) -> None:
+    """
+    Grava .gz/.br e o ETag de `caminho` (já escrito). Rodar DEPOIS do HTML:
+    a entrega só usa irmãos com mtime >= ao do HTML.
+    """
+    escrever_atomico(caminho.with_name(caminho.name + ".gz"), gzip.compress(conteudo, compresslevel=9, mtime=0))
+    if brotli is not None:
+        escrever_atomico(caminho.with_name(caminho.name + ".br"), brotli.compress(conteudo, quality=11))
+    escrever_atomico(_caminho_etag(caminho), hashlib.sha256(conteudo).hexdigest()[:32].encode())
+
+
+def versoes_estaticas_ok(caminho: Path) -> bool:
+    """True se .gz/.etag (e .br, quando disponível) existem e não estão defasados."""
+    try:
+        mtime = caminho.stat().st_mtime_ns
+        irmaos = [caminho.with_name(caminho.name + ".gz"), _caminho_etag(caminho)]
+        if brotli is not None:
+            irmaos.append(caminho.with_name(caminho.name + ".br"))
+        return all(p.stat().st_mtime_ns >= mtime for p in irmaos)
+    except OSError:
+        return False
+
+
+# ---------------------------------------------------------------------
+# Entrega
+# ---------------------------------------------------------------------
+def _etag_de(caminho: Path, mtime_ns: int) -> Optional[str]:
+    chave = str(caminho)
+    with _etags_lock:
+        item = _etags.get(chave)
+    if item and item[0] == mtime_ns:
+        return item[1]
+
+    valor = None
+    arquivo_etag = _caminho_etag(caminho)
+    try:
+        if arquivo_etag.stat().st_mtime_ns >= mtime_ns:
+            valor = arquivo_etag.read_text(encoding="utf-8").strip()
+    except OSError:
+        pass
+    if not valor:
+        # site gerado antes dos ETags: calcula uma vez por versão do arquivo
+        try:
+            valor = hashlib.sha256(caminho.read_bytes()).hexdigest()[:32]
+        except OSError:
+            return None
+
+    etag = f'"{valor}"'
+    with _etags_lock:
+        _etags[chave] = (mtime_ns, etag)
+    return etag
+
+
+class SitesPrecomprimidos(StaticFiles):
+    """StaticFiles com ETag forte, 304 e corpo pré-comprimido para .html."""
+
+    async def get_response(self, path: str, scope) -> Response:
+        resposta = await super().get_response(path, scope)
+        if resposta.status_code != 200 or not isinstance(resposta, FileResponse):
+            return resposta
+
+        caminho = Path(resposta.path)
+        if caminho.suffix != ".html":
+            return resposta
+
+        mtime_ns = os.stat(caminho).st_mtime_ns
+        etag = _etag_de(caminho, mtime_ns)
+        if etag is None:
+            return resposta
+
+        cabecalhos = {"ETag": etag, "Cache-Control": SITES_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        pedido = Headers(scope=scope)
+
+        if_none_match = pedido.get("if-none-match", "")
+        if etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=cabecalhos)
+
+        aceitas = pedido.get("accept-encoding", "")
+        if "range" not in pedido:
+            for codificacao, sufixo in _CODIFICACOES:
+                if codificacao not in aceitas:
+                    continue
+                irmao = caminho.with_name(caminho.name + sufixo)
+                try:
+                    if irmao.stat().st_mtime_ns < mtime_ns:
+                        continue  # defasado (HTML novo ainda sem versão comprimida)
+                except OSError:
+                    continue
+                return FileResponse(
+                    irmao,
+                    media_type="text/html; charset=utf-8",
+                    headers={**cabecalhos, "Content-Encoding": codificacao},
+                )
+
+        resposta.headers.update(cabecalhos)
+        return resposta
+
+
+class AssetsCacheLongo(StaticFiles):
+    """
+    Assets com cache longo: vendorizados do modelo (templates_html/assets) e
+    arquivos endereçados por conteúdo (/logos, `imutavel=True`).
+    """
+
+    def __init__(
+        self,
+        *args,
+        max_age: int = ASSETS_MAX_AGE,
+        imutavel: bool = False,
+        cabecalhos: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.cache_control = f"public, max-age={max_age}" + (", immutable" if imutavel else "")
+        self.cabecalhos = cabecalhos or {}
+
+    async def get_response(self, path: str, scope) -> Response:
+        resposta = await super().get_response(path, scope)
+        if resposta.status_code in (200, 304):
+            resposta.headers["Cache-Control"] = self.cache_control
+            resposta.headers.update(self.cabecalhos)
+        return resposta
+
+
+# Arquivos enviados por usuários (/logos): mesmo que algo ativo (SVG/HTML
+# antigo) esteja na pasta, o navegador não executa nem adivinha o tipo
+CABECALHOS_UPLOAD = {
+    "X-Content-Type-Options": "nosniff",
+    "Content-Security-Policy": "default-src 'none'; img-src 'self'; style-src 'unsafe-inline'; sandbox",
+}
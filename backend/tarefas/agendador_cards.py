@@ -3,17 +3,14 @@ import os
 import random
 from datetime import datetime, timedelta
 
-import openai
-
-openai.api_key = os.getenv("OPENAI_API_KEY")  # ou defina diretamente se preferir
-
-
 
 # Garante que o diretório raiz esteja no caminho
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
 from backend.database import engine
-from backend.models import Usuario, CardMarketing
+from backend.models.marketing import stmt_inserir_cards
+from backend.utils.lotes import iterar_usuarios_com_empresa
+from backend.services.llm import chat_sync
 from sqlalchemy.orm import sessionmaker
 
 SessionLocal = sessionmaker(bind=engine)
@@ -31,14 +28,12 @@ def buscar_novidades_do_nicho(nicho: str, mes: str):
     Responda em JSON com uma lista de dicionários.
     """
 
-    resposta = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}],
+    texto = chat_sync(
+        [{"role": "user", "content": prompt}],
+        modelo="gpt-4",
         temperature=0.7
     )
 
-    texto = resposta.choices[0].message.content
-
     # Convertendo resposta JSON em lista Python
     try:
         import json
@@ -49,44 +44,53 @@ def buscar_novidades_do_nicho(nicho: str, mes: str):
         return []
 
 
+def _usuarios_com_nicho():
+    """(id, nicho) de todos os usuários com nicho. O cursor fecha antes das chamadas à IA."""
+    leitura = SessionLocal()
+    try:
+        return [
+            (user.id, user.empresa.nicho)
+            for user in iterar_usuarios_com_empresa(leitura)
+            if user.empresa and user.empresa.nicho
+        ]
+    finally:
+        leitura.close()
+
+
 def gerar_atualizacoes():
-    db = SessionLocal()
-    usuarios = db.query(Usuario).all()
+    usuarios = _usuarios_com_nicho()
 
     # Gera para o mês atual ou próximo (dependendo da data)
     hoje = datetime.now()
     mes = (hoje + timedelta(days=3)).strftime("%Y-%m")
 
-    for user in usuarios:
-        if not user.empresa or not user.empresa.nicho:
-            continue
-
-        novidades = buscar_novidades_do_nicho(user.empresa.nicho)
-
-        for n in novidades:
-            existe = db.query(CardMarketing).filter_by(
-                usuario_id=user.id,
-                titulo=n["titulo"],
-                mes_referencia=mes
-            ).first()
-
-            if not existe:
-                novo_card = CardMarketing(
-                    usuario_id=user.id,
-                    titulo=n["titulo"],
-                    descricao=n["descricao"],
-                    fonte=n["fonte"],
-                    ideias_conteudo=n["ideias_conteudo"],
-                    tipo=n["tipo"],
-                    mes_referencia=mes,
-                    eh_atualizacao=True,
-                    criado_em=datetime.now(),
-                    atualizado_em=datetime.now()
-                )
-                db.add(novo_card)
-
-    db.commit()
-    db.close()
+    db = SessionLocal()
+    try:
+        for usuario_id, nicho in usuarios:
+            novidades = buscar_novidades_do_nicho(nicho, mes)
+
+            linhas = [
+                {
+                    "usuario_id": usuario_id,
+                    "titulo": n["titulo"],
+                    "descricao": n["descricao"],
+                    "fonte": n["fonte"],
+                    "ideias_conteudo": n["ideias_conteudo"],
+                    "tipo": n["tipo"],
+                    "mes_referencia": mes,
+                    "eh_atualizacao": True,
+                    "criado_em": datetime.now(),
+                    "atualizado_em": datetime.now(),
+                }
+                for n in novidades
+            ]
+            if linhas:
+                # título já existente no mês é ignorado pelo índice único
+                db.execute(stmt_inserir_cards(linhas))
+
+        db.commit()
+    finally:
+        db.close()
     print("✅ Atualizações diárias finalizadas.")
 
 if __name__ == "__main__":
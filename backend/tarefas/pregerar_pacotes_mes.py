@@ -0,0 +1,178 @@
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+# Garante que o diretório raiz esteja no caminho
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from sqlalchemy import and_, exists, or_, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import load_only
+
+from backend.database import SessionLocal, engine
+from backend.models import Empresa, IdeiasMensais, Usuario
+from backend.models.consultor_mensal import ConsultorMensal
+from backend.models.projecoes import EMPRESA_SLIM
+from backend.api.ideias import _gerar_pacote_mes
+from backend.api.consultor_mensal import _gerar_pacote
+
+TAMANHO_LOTE = int(os.getenv("PREGERAR_LOTE", "200"))
+# o mês seguinte só é pré-gerado nos últimos N dias do mês (perto da virada,
+# com nome/nicho já estáveis)
+PREGERAR_DIAS_ANTES = int(os.getenv("PREGERAR_DIAS_ANTES", "3"))
+
+
+def _proximo_mes() -> str:
+    hoje = datetime.now()
+    return (hoje.replace(day=1) + timedelta(days=32)).strftime("%Y-%m")
+
+
+def _meses_a_pregerar() -> list:
+    """
+    Mês atual sempre (recupera execução perdida: só entra quem ainda não tem
+    pacote) + o próximo quando faltam até PREGERAR_DIAS_ANTES dias.
+    """
+    hoje = datetime.now()
+    meses = [hoje.strftime("%Y-%m")]
+    inicio_proximo = datetime.strptime(_proximo_mes(), "%Y-%m")
+    if (inicio_proximo - hoje.replace(hour=0, minute=0, second=0, microsecond=0)).days <= PREGERAR_DIAS_ANTES:
+        meses.append(_proximo_mes())
+    return meses
+
+
+def _indice_consultor_existe() -> bool:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT to_regclass('uq_consultor_mensal')")).scalar() is not None
+
+
+def _empresas_sem_pacote(db, mes_ano: str, tabela_existente):
+    """
+    Empresas de usuários ativos (plano sem vencimento ou vencendo depois do
+    início de `mes_ano`) que ainda NÃO têm linha em `tabela_existente`.
+    """
+    inicio_mes = datetime.strptime(mes_ano, "%Y-%m")
+    ja_tem = exists().where(
+        and_(tabela_existente.empresa_id == Empresa.id, tabela_existente.mes_ano == mes_ano)
+    )
+    return (
+        db.query(Empresa)
+        # slim + cidade (lida por ideias._get_empresa_dados)
+        .options(load_only(*EMPRESA_SLIM, Empresa.cidade))
+        .join(Usuario, Usuario.id == Empresa.usuario_id)
+        .filter(
+            or_(Usuario.plano_expira_em.is_(None), Usuario.plano_expira_em >= inicio_mes),
+            ~ja_tem,
+        )
+        .order_by(Empresa.id)
+        .execution_options(stream_results=True)
+        .yield_per(TAMANHO_LOTE)
+    )
+
+
+def _inserir_lote(db, stmt_base, linhas) -> int:
+    """Um INSERT multi-VALUES ... ON CONFLICT DO NOTHING por lote."""
+    if not linhas:
+        return 0
+    resultado = db.execute(stmt_base.values(linhas))
+    db.commit()
+    return resultado.rowcount or 0
+
+
+def _pregerar(nome: str, mes_ano: str, tabela, montar_linha, stmt_base):
+    inicio = time.perf_counter()
+    processadas = inseridas = falhas = 0
+    agora = datetime.utcnow()
+
+    # sessão de leitura (cursor no servidor) separada da de escrita
+    leitura = SessionLocal()
+    escrita = SessionLocal()
+    try:
+        lote = []
+        for empresa in _empresas_sem_pacote(leitura, mes_ano, tabela):
+            processadas += 1
+            try:
+                lote.append(montar_linha(empresa, agora))
+            except Exception as e:
+                falhas += 1
+                print(f"[ERRO] {nome} empresa {empresa.id}: {e}")
+            if len(lote) >= TAMANHO_LOTE:
+                inseridas += _inserir_lote(escrita, stmt_base, lote)
+                lote = []
+        inseridas += _inserir_lote(escrita, stmt_base, lote)
+    finally:
+        escrita.close()
+        leitura.close()
+
+    decorrido = time.perf_counter() - inicio
+    taxa = inseridas / decorrido if decorrido else 0.0
+    print(
+        f"✅ {nome} {mes_ano}: {processadas} empresas, {inseridas} inseridas, "
+        f"{processadas - inseridas - falhas} já existiam, {falhas} falhas "
+        f"em {decorrido:.1f}s ({taxa:.1f} linhas/s)"
+    )
+    return {"empresas": processadas, "inseridas": inseridas, "falhas": falhas, "segundos": decorrido}
+
+
+def _linha_ideias(mes_ano: str):
+    def montar(empresa, agora):
+        return {
+            "empresa_id": empresa.id,
+            "mes_ano": mes_ano,
+            "setor": None,
+            "conteudo": _gerar_pacote_mes(empresa, mes_ano, None),
+            "criado_em": agora,
+            "atualizado_em": agora,
+        }
+    return montar
+
+
+def _linha_consultor(mes_ano: str):
+    def montar(empresa, agora):
+        return {
+            "usuario_id": empresa.usuario_id,
+            "empresa_id": empresa.id,
+            "mes_ano": mes_ano,
+            "conteudo": _gerar_pacote(
+                empresa_id=empresa.id,
+                mes_ano=mes_ano,
+                empresa_nome=empresa.nome_empresa or "Sua Empresa",
+                nicho=empresa.nicho or "Negócio",
+                versao=1,
+            ),
+            "criado_em": agora,
+            "atualizado_em": agora,
+        }
+    return montar
+
+
+def pregerar_pacotes_mes(mes_ano: str | None = None):
+    """
+    Pré-gera Central de Ideias + Consultor Mensal de todas as empresas ativas
+    para `mes_ano`. Sem `mes_ano`, roda para _meses_a_pregerar() (o agendador
+    chama todo dia). Quem já tem pacote é pulado na consulta (NOT EXISTS) e o
+    INSERT é ON CONFLICT DO NOTHING: rodar de novo custa pouco.
+    """
+    if mes_ano is None:
+        return [pregerar_pacotes_mes(mes) for mes in _meses_a_pregerar()]
+
+    ideias = _pregerar(
+        "ideias_mensais", mes_ano, IdeiasMensais, _linha_ideias(mes_ano),
+        insert(IdeiasMensais).on_conflict_do_nothing(constraint="uq_empresa_mes"),
+    )
+    # bancos antigos sem o índice único: o ON CONFLICT não teria alvo
+    if not _indice_consultor_existe():
+        print("[ERRO] consultor_mensal sem índice uq_consultor_mensal: rode comandos/deduplicar_consultor_mensal.py")
+        consultor = None
+    else:
+        consultor = _pregerar(
+            "consultor_mensal", mes_ano, ConsultorMensal, _linha_consultor(mes_ano),
+            insert(ConsultorMensal).on_conflict_do_nothing(
+                index_elements=["usuario_id", "empresa_id", "mes_ano"]
+            ),
+        )
+    return {"mes_ano": mes_ano, "ideias_mensais": ideias, "consultor_mensal": consultor}
+
+
+if __name__ == "__main__":
+    pregerar_pacotes_mes(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,49 @@
+import sys
+import os
+from datetime import datetime
+
+# Garante que o diretório raiz esteja no caminho
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from sqlalchemy import or_, update
+
+from backend.database import SessionLocal
+from backend.models import Usuario
+
+
+def rebaixar_planos_expirados() -> int:
+    """
+    Grava "Gratuito" para todo usuário (não admin) com plano vencido.
+    Substitui o UPDATE que antes acontecia dentro de get_current_user /
+    get_usuario_logado a cada request. Um único UPDATE ... RETURNING.
+
+    Roda no processo do agendador, que não enxerga o cache de usuários dos
+    workers da API; lá o plano vencido já é tratado como "Gratuito" na leitura
+    (cache_usuario.plano_expirado) e o snapshot expira em CACHE_USUARIO_TTL.
+    """
+    db = SessionLocal()
+    try:
+        ids = db.execute(
+            update(Usuario)
+            .where(
+                or_(Usuario.tipo_usuario.is_(None), Usuario.tipo_usuario != "admin"),
+                Usuario.plano_expira_em.isnot(None),
+                Usuario.plano_expira_em < datetime.utcnow(),
+                Usuario.plano_atual.is_distinct_from("Gratuito"),
+            )
+            .values(plano_atual="Gratuito")
+            .returning(Usuario.id)
+        ).scalars().all()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print(f"✅ Planos vencidos rebaixados: {len(ids)}")
+    return len(ids)
+
+
+if __name__ == "__main__":
+    rebaixar_planos_expirados()
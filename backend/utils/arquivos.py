@@ -0,0 +1,38 @@
+# backend/utils/arquivos.py
+import os
+import tempfile
+from pathlib import Path
+
+
+def _modo_padrao() -> int:
+    """0o666 com a umask do processo (o que open() daria); lê sem alterar de fato."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+_MODO_ARQUIVO = _modo_padrao()
+
+
+def escrever_atomico(caminho: Path, conteudo: bytes) -> None:
+    """
+    Escreve num arquivo temporário na MESMA pasta e troca com os.replace
+    (rename atômico): quem lê o arquivo (ex.: /sites) vê a versão antiga ou a
+    nova, nunca metade.
+    """
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporario = tempfile.mkstemp(dir=str(caminho.parent), prefix=f".{caminho.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(conteudo)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp cria 0600; arquivos publicados (/sites, /logos) precisam de leitura geral
+        os.chmod(temporario, _MODO_ARQUIVO)
+        os.replace(temporario, caminho)
+    except BaseException:
+        try:
+            os.unlink(temporario)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,46 @@
+# backend/utils/lotes.py
+"""
+Iteração em lotes para comandos/tarefas que varrem tabelas inteiras.
+
+`yield_per` + `stream_results` usam cursor no servidor: o Postgres manda
+`tamanho` linhas por vez e a memória fica estável, seja qual for o número de
+usuários. Empresa vem no MESMO SELECT (outer join), só com id/usuario_id/nicho,
+então `usuario.empresa` não dispara um SELECT por linha.
+
+Uso:
+    for usuario in iterar_usuarios_com_empresa(db):
+        nicho = usuario.empresa.nicho if usuario.empresa else None
+"""
+import os
+
+from sqlalchemy.orm import Query, Session, contains_eager, load_only
+
+from backend.models import Empresa, Usuario
+
+TAMANHO_LOTE = int(os.getenv("LOTE_ITERACAO", "500"))
+
+# o que os jobs de cards leem da empresa
+EMPRESA_NICHO = (Empresa.id, Empresa.usuario_id, Empresa.nicho)
+
+
+def iterar_em_lotes(consulta: Query, tamanho: int = TAMANHO_LOTE):
+    """Itera qualquer Query por cursor no servidor, `tamanho` linhas por vez."""
+    return consulta.execution_options(stream_results=True).yield_per(tamanho)
+
+
+def iterar_usuarios_com_empresa(db: Session, *filtros, tamanho: int = TAMANHO_LOTE):
+    """
+    Usuários (só id) com `empresa` já carregada (id, usuario_id, nicho),
+    em ordem de id. Usuário sem empresa vem com `empresa = None`.
+    """
+    consulta = (
+        db.query(Usuario)
+        .outerjoin(Usuario.empresa)
+        .options(
+            load_only(Usuario.id),
+            contains_eager(Usuario.empresa).load_only(*EMPRESA_NICHO),
+        )
+        .filter(*filtros)
+        .order_by(Usuario.id)
+    )
+    return iterar_em_lotes(consulta, tamanho)
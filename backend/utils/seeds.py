@@ -0,0 +1,12 @@
+# backend/utils/seeds.py
+import hashlib
+
+
+def seed_estavel(*partes) -> int:
+    """
+    Seed determinística a partir das partes (BLAKE2b), igual em qualquer
+    processo/worker/restart. Substitui abs(hash(...)), que o Python
+    randomiza por processo (PYTHONHASHSEED).
+    """
+    base = "|".join(str(p) for p in partes).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(base, digest_size=8).digest(), "big") % (10**9)
@@ -0,0 +1,12 @@
+# backend/utils/slug.py
+
+
+def slug_nome(nome: str) -> str:
+    """
+    Gera um slug simples: tudo minúsculo, espaços viram underscore.
+    Ex.: 'Restaurante do Judas' -> 'restaurante_do_judas'
+    """
+    nome = (nome or "").strip().lower().replace(" ", "_")
+    # Evita caracteres estranhos em nome de arquivo
+    permitidos = "abcdefghijklmnopqrstuvwxyz0123456789_-"
+    return "".join(ch for ch in nome if ch in permitidos) or "site"
@@ -43,6 +43,18 @@ if "API_URL" not in st.session_state:
 
 
 
+def url_logo(logo_url: str | None) -> str | None:
+    """
+    O backend guarda logos enviadas como caminho do próprio backend
+    (/logos/<sha>.webp). O st.image não sabe o host da API: completa aqui.
+    URLs absolutas e data URLs antigas passam direto.
+    """
+    if logo_url and logo_url.startswith("/"):
+        base = (st.session_state.get("API_URL") or API_URL).rstrip("/")
+        return f"{base}{logo_url}"
+    return logo_url
+
+
 def usuario_tem_acesso(modulo: str) -> bool:
     usuario = st.session_state.get("dados_usuario", {}) or {}
     plano = usuario.get("plano_atual")
@@ -931,7 +943,7 @@ def tela_empresa():
         conteudo = logo_upload.read()
         logo_url = f"data:image/png;base64,{base64.b64encode(conteudo).decode()}"
     if logo_url:
-        st.image(logo_url, caption="Pré-visualização da Logo", width=150)
+        st.image(url_logo(logo_url), caption="Pré-visualização da Logo", width=150)
 
     # 🗺 Endereço
     st.markdown("#### 🗺 Endereço Completo")
@@ -4402,7 +4414,7 @@ def main():
 
         logo_url = usuario.get("logo_url")
         if logo_url:
-            st.sidebar.image(logo_url, use_container_width=True)
+            st.sidebar.image(url_logo(logo_url), use_container_width=True)
         else:
             st.sidebar.markdown("📌 Sua logo aparecerá aqui")
 